@@ -1,13 +1,111 @@
+import asyncio
+import atexit
+import importlib
+import inspect
+import math
+import os
+import queue
+import threading
+import time
 import traceback
-from typing import List, Dict, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
 
+from core.breaker import get_breaker
+from core.cache import ResultCache, cache_key
+from core.singleflight import SingleFlight
+from scrapers.rate_limit import get_rate_limiter
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+# Known scrapers in the order their results are merged. Each entry maps the
+# source name used by the UI to (module, function, accepts `headless`).
+SOURCES = {
+    "Amazon": ("scrapers.amazon_scraper", "scrape_amazon", False),
+    "Flipkart": ("scrapers.flipkart_scraper", "scrape_flipkart", True),
+    "JioMart": ("scrapers.jiomart_scraper", "scrape_jiomart", True),
+    "Snapdeal": ("scrapers.snapdeal_scraper", "scrape_snapdeal", True),
+}
+
+COLUMNS = ["title", "description", "price", "currency", "link", "image", "source", "fetched_via", "status"]
+
+# Per-source outcome of a search, reported in the `status` column and in
+# `df.attrs["source_status"]`:
+#   ok       scraper finished normally
+#   cached   served from the result cache
+#   partial  deadline hit while scraping; rows are what was collected so far
+#   timeout  deadline hit before the source produced anything
+#   empty    scraper finished but found nothing
+#   error    scraper (or its import) raised
+#   skipped  circuit breaker open for this source
+STATUS_OK = "ok"
+STATUS_CACHED = "cached"
+STATUS_PARTIAL = "partial"
+STATUS_TIMEOUT = "timeout"
+STATUS_EMPTY = "empty"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+
+# Upper bound (seconds) for a scraper's network/page waits; the circuit
+# breaker lowers it per source once it has seen enough latencies.
+SOURCE_TIMEOUT = 10.0
+
+# Per-source result cache shared by all searches in this process. Configure
+# with PRODUCT_AGG_CACHE_TTL (seconds, default 300), PRODUCT_AGG_CACHE_SIZE
+# (entries, default 256) and PRODUCT_AGG_CACHE_DB (path of an optional SQLite
+# file that keeps entries across restarts).
+result_cache = ResultCache(
+    max_entries=int(os.getenv("PRODUCT_AGG_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("PRODUCT_AGG_CACHE_TTL", "300")),
+    disk_path=os.getenv("PRODUCT_AGG_CACHE_DB") or None,
+)
+
+# Identical (query, source, limit) scrapes running at the same time share one
+# in-flight call instead of each launching its own browser session.
+inflight = SingleFlight()
+
+# Worker processes for HTML parsing, used by searches that pass
+# `parse_in_processes=True`. PRODUCT_AGG_PARSE_WORKERS sets the size
+# (default: one per CPU). Created on first use.
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Return the shared parse process pool, creating it on first use."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            workers = int(os.getenv("PRODUCT_AGG_PARSE_WORKERS", "0")) or None
+            _parse_pool = ProcessPoolExecutor(max_workers=workers)
+        return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    """Stop the parse worker processes; the next use starts a fresh pool."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=True, cancel_futures=True)
+            _parse_pool = None
+
+
+atexit.register(shutdown_parse_pool)
+
+# Default for `background_save`: when true, snapshots are handed to the
+# database's background writer instead of being written before returning.
+BACKGROUND_SNAPSHOTS = os.getenv("PRODUCT_AGG_BACKGROUND_SNAPSHOTS", "0") == "1"
+
 
 def _normalize(item: Dict) -> Dict:
     """Normalize scraper result dicts to a common schema.
 
-    Schema: title, description, price, currency, link, image, source
+    Schema: title, description, price, currency, link, image, source,
+    fetched_via ("http" or "selenium" when the scraper reports it)
     """
     return {
         "title": item.get("title") or item.get("name") or "",
@@ -17,111 +115,597 @@ def _normalize(item: Dict) -> Dict:
         "link": item.get("link") or item.get("url") or "",
         "image": item.get("image") or item.get("img") or None,
         "source": item.get("source") or "unknown",
+        "fetched_via": item.get("fetched_via"),
     }
 
 
+def _selected_sources(sources: Optional[List[str]]) -> List[str]:
+    """Return the known source names to query, in merge order."""
+    return [name for name in SOURCES if sources is None or name in sources]
+
+
+def _supported_kwargs(func, kwargs: Dict) -> Dict:
+    """Drop keyword arguments `func` doesn't accept (older/third-party scrapers)."""
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return kwargs
+    if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        return kwargs
+    return {k: v for k, v in kwargs.items() if k in params}
+
+
+def _as_deadline(deadline: Union[None, float, Deadline]) -> Optional[Deadline]:
+    """Accept a budget in seconds or an existing Deadline (None = no limit)."""
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
+
+
+def _run_source(
+    name: str,
+    query: str,
+    max_per_site: int,
+    headless: bool,
+    deadline: Optional[Deadline] = None,
+    parse_in_processes: bool = False,
+) -> Tuple[List[Dict], str]:
+    """Import and call a single scraper; returns (normalized rows, status).
+
+    Failures (missing module, driver errors, parsing errors) are logged and
+    result in an empty list so one source never brings down the others.
+
+    Each call goes through the source's circuit breaker: while a site is
+    failing repeatedly it is skipped for a cool-down instead of launching a
+    browser and waiting out its timeouts. Scrapers that accept a `timeout`
+    get one derived from the site's recent p95 latency, clamped to the time
+    left on `deadline`; scrapers that accept `deadline` get the token itself
+    so their waits and scroll loops stop when it runs out. With
+    `parse_in_processes`, scrapers that accept `parse_executor` parse their
+    HTML on the shared process pool.
+    """
+    module_name, func_name, uses_headless = SOURCES[name]
+    try:
+        module = importlib.import_module(module_name)
+        func = getattr(module, func_name)
+    except Exception:
+        print(f"[aggregator] Could not import {module_name.split('.')[-1]}:\n", traceback.format_exc())
+        return [], STATUS_ERROR
+
+    if deadline is not None and deadline.expired():
+        return [], STATUS_TIMEOUT
+
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        print(f"[aggregator] {name} circuit open after repeated failures; skipping")
+        return [], STATUS_SKIPPED
+
+    kwargs = {"max_results": max_per_site}
+    if uses_headless:
+        kwargs["headless"] = headless
+    kwargs["timeout"] = breaker.timeout(SOURCE_TIMEOUT)
+    if deadline is not None:
+        kwargs["timeout"] = deadline.clamp(kwargs["timeout"])
+        kwargs["deadline"] = deadline
+    if parse_in_processes:
+        kwargs["parse_executor"] = get_parse_pool()
+    limiter = get_rate_limiter(name)
+    penalties = limiter.penalties
+    start = time.monotonic()
+    try:
+        items = func(query, **_supported_kwargs(func, kwargs))
+    except Exception as e:
+        # Running out of budget says nothing about the site's health, but a
+        # half-open probe must still be released or the breaker never closes.
+        if isinstance(e, DeadlineExceeded) or (deadline is not None and deadline.expired()):
+            breaker.release_probe()
+            return [], STATUS_TIMEOUT
+        breaker.record_failure(time.monotonic() - start)
+        print(f"[aggregator] {name} scraper failed:\n", traceback.format_exc())
+        return [], STATUS_ERROR
+
+    results = [_normalize(it) for it in items or []]
+    if deadline is not None and deadline.expired():
+        breaker.release_probe()
+        return results, STATUS_PARTIAL if results else STATUS_TIMEOUT
+    if results:
+        breaker.record_success(time.monotonic() - start)
+        return results, STATUS_OK
+    # No results counts against the breaker only if the scraper hit a bot
+    # wall / 429 on the way (it penalized the site's limiter); a clean empty
+    # results page is a legitimate answer for a rare product.
+    if limiter.penalties > penalties:
+        breaker.record_failure(time.monotonic() - start)
+    else:
+        breaker.record_success(time.monotonic() - start)
+    return results, STATUS_EMPTY
+
+
+# Outcomes tied to the call that scraped (its deadline ran out, or it hit an
+# error); a caller that joined it with its own budget scrapes for itself.
+_UNSHAREABLE = (STATUS_TIMEOUT, STATUS_PARTIAL, STATUS_ERROR)
+
+
+def _fetch_source(
+    name: str,
+    query: str,
+    max_per_site: int,
+    headless: bool,
+    use_cache: bool = True,
+    refresh: bool = False,
+    deadline: Optional[Deadline] = None,
+    parse_in_processes: bool = False,
+) -> Tuple[List[Dict], str]:
+    """`_run_source` behind the result cache and in-flight coalescing.
+
+    `use_cache=False` bypasses the cache entirely; `refresh=True` skips the
+    lookup but stores the fresh result. Only complete (status "ok") results
+    are cached. Concurrent calls with the same key share one scrape; a call
+    joining another's scrape waits no longer than its own `deadline`, and
+    doesn't take a result that the other call's deadline cut short or that
+    failed (it scrapes for itself instead).
+    """
+    key = cache_key(query, name, max_per_site)
+    if use_cache and not refresh:
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached, STATUS_CACHED
+
+    def _scrape() -> Tuple[List[Dict], str]:
+        results, status = _run_source(name, query, max_per_site, headless, deadline, parse_in_processes)
+        if use_cache and status == STATUS_OK:
+            result_cache.set(key, results)
+        return results, status
+
+    try:
+        results, status = inflight.do(
+            key,
+            _scrape,
+            follower_timeout=deadline.remaining() if deadline is not None else None,
+            shareable=lambda outcome: outcome[1] not in _UNSHAREABLE,
+        )
+    except TimeoutError:
+        return [], STATUS_TIMEOUT
+    # Callers sharing one scrape each get their own row dicts.
+    return [dict(r) for r in results], status
+
+
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss counters and size of the per-source result cache, plus how
+    many calls were coalesced onto an identical in-flight scrape."""
+    stats = result_cache.stats()
+    stats["coalesced"] = inflight.coalesced
+    return stats
+
+
+def _build_dataframe(results: List[Dict]) -> pd.DataFrame:
+    """Build the combined DataFrame with consistent columns and deduplication."""
+    if not results:
+        return pd.DataFrame(columns=COLUMNS)
+
+    df = pd.DataFrame(results)
+
+    # Deduplicate by link when possible, otherwise by title.
+    if "link" in df.columns:
+        df = df.drop_duplicates(subset=["link"])
+    df = df.drop_duplicates(subset=["title"])  # fallback
+
+    # Reorder columns
+    df = df[[c for c in COLUMNS if c in df.columns]]
+    return df
+
+
+def combine_batches(batches: Iterable[Dict]) -> pd.DataFrame:
+    """Merge batches yielded by `iter_combined` into the combined DataFrame.
+
+    Batches are merged in `SOURCES` order (not arrival order) so the result,
+    including which duplicate survives deduplication, doesn't depend on which
+    site happened to finish first.
+    """
+    per_source: Dict[str, List[Dict]] = {}
+    for batch in batches:
+        status = batch.get("status", STATUS_OK)
+        per_source.setdefault(batch["source"], []).extend(dict(r, status=status) for r in batch["results"])
+
+    results: List[Dict] = []
+    for name in list(SOURCES) + [n for n in per_source if n not in SOURCES]:
+        results.extend(per_source.get(name, []))
+    return _build_dataframe(results)
+
+
+def persist_snapshot(df: pd.DataFrame, query: str, background: Optional[bool] = None) -> None:
+    """Save `df` as a snapshot via db_helper, logging (not raising) failures.
+
+    With `background=True` (default: BACKGROUND_SNAPSHOTS) the snapshot is
+    queued on the shared snapshot writer and this returns immediately, unless
+    the writer's queue is full.
+    """
+    if background is None:
+        background = BACKGROUND_SNAPSHOTS
+    try:
+        if background:
+            from database.snapshot_writer import get_snapshot_writer
+        else:
+            from database.db_helper import save_snapshot
+
+        try:
+            if background:
+                get_snapshot_writer().submit(df, query)
+            else:
+                save_snapshot(df, query)
+        except Exception:
+            print("[aggregator] failed to save snapshot:\n", traceback.format_exc())
+    except Exception:
+        # db_helper missing or import failed; continue silently
+        print("[aggregator] db_helper not available (skipping save):\n", traceback.format_exc())
+
+
+def iter_combined(
+    query: str,
+    max_per_site: int = 10,
+    sources: Optional[List[str]] = None,
+    headless: bool = True,
+    concurrent: bool = True,
+    max_workers: int = 4,
+    use_cache: bool = True,
+    refresh: bool = False,
+    deadline: Union[None, float, Deadline] = None,
+    parse_in_processes: bool = False,
+) -> Iterator[Dict]:
+    """Yield normalized results per source as soon as each scraper finishes.
+
+    Each item is a dict {source, results, status} where `results` is the
+    list of normalized rows for that source (empty if the scraper failed)
+    and `status` is one of the STATUS_* values. With `concurrent=True`
+    batches arrive in completion order, so quick requests-based sources show
+    up while Selenium sites are still loading; otherwise sources run one
+    after another in `SOURCES` order.
+
+    `deadline` (seconds, or a `Deadline`) bounds the whole search: it is
+    passed down to the scrapers, and when it runs out the remaining sources
+    are cancelled and reported with status "timeout". `parse_in_processes`
+    runs the scrapers' HTML parsing on a process pool (`get_parse_pool`).
+
+    Use `combine_batches` to turn the collected batches into the same
+    DataFrame `fetch_combined` returns. `use_cache`/`refresh` control the
+    per-source result cache (see `_fetch_source`).
+    """
+    names = _selected_sources(sources)
+    token = _as_deadline(deadline)
+
+    if not concurrent or len(names) <= 1:
+        for name in names:
+            if token is not None and token.expired():
+                yield {"source": name, "results": [], "status": STATUS_TIMEOUT}
+                continue
+            results, status = _fetch_source(name, query, max_per_site, headless, use_cache, refresh, token, parse_in_processes)
+            yield {"source": name, "results": results, "status": status}
+        return
+
+    workers = max(1, min(max_workers, len(names)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aggregator")
+    reported = set()
+    try:
+        futures = {
+            pool.submit(
+                _fetch_source, name, query, max_per_site, headless, use_cache, refresh, token, parse_in_processes
+            ): name
+            for name in names
+        }
+        try:
+            for fut in as_completed(futures, timeout=token.remaining() if token is not None else None):
+                results, status = fut.result()
+                reported.add(futures[fut])
+                yield {"source": futures[fut], "results": results, "status": status}
+        except FuturesTimeout:
+            # Out of time: tell running scrapers to stop and report the rest.
+            token.cancel()
+            for fut, name in futures.items():
+                if name in reported:
+                    continue
+                if fut.done() and not fut.cancelled():
+                    results, status = fut.result()
+                    yield {"source": name, "results": results, "status": status}
+                else:
+                    yield {"source": name, "results": [], "status": STATUS_TIMEOUT}
+    finally:
+        # If the consumer stops early, don't block on the remaining scrapers.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_combined(
+    query: str,
+    max_per_site: int = 10,
+    sources: Optional[List[str]] = None,
+    headless: bool = True,
+    max_workers: int = 4,
+    use_cache: bool = True,
+    refresh: bool = False,
+    deadline: Union[None, float, Deadline] = None,
+    parse_in_processes: bool = False,
+) -> AsyncIterator[Dict]:
+    """Async variant of `iter_combined` for use inside an asyncio event loop.
+
+    Scrapers are blocking, so they run on a bounded thread pool; batches are
+    yielded in completion order without blocking the event loop.
+    """
+    names = _selected_sources(sources)
+    if not names:
+        return
+
+    token = _as_deadline(deadline)
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names))), thread_name_prefix="aggregator")
+
+    async def _one(name: str) -> Dict:
+        results, status = await loop.run_in_executor(
+            pool, _fetch_source, name, query, max_per_site, headless, use_cache, refresh, token, parse_in_processes
+        )
+        return {"source": name, "results": results, "status": status}
+
+    reported = set()
+    try:
+        timeout = token.remaining() if token is not None else None
+        for coro in asyncio.as_completed([_one(name) for name in names], timeout=timeout):
+            batch = await coro
+            reported.add(batch["source"])
+            yield batch
+    except asyncio.TimeoutError:
+        token.cancel()
+        for name in names:
+            if name not in reported:
+                yield {"source": name, "results": [], "status": STATUS_TIMEOUT}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 def fetch_combined(
     query: str,
     max_per_site: int = 10,
     sources: Optional[List[str]] = None,
     headless: bool = True,
     save_snapshot_to_db: bool = True,
+    concurrent: bool = False,
+    max_workers: int = 4,
+    use_cache: bool = True,
+    refresh: bool = False,
+    deadline: Optional[float] = None,
+    parse_in_processes: bool = False,
+    background_save: Optional[bool] = None,
 ) -> pd.DataFrame:
     """Fetch results from available scrapers and return a combined DataFrame.
 
     - Calls scrapers found in the `scrapers` package.
     - If a scraper fails, it is skipped and the error is logged.
     - Results are normalized into a simple schema.
+    - With `concurrent=True` the selected sources run in parallel on a pool of
+      at most `max_workers` threads, so total time follows the slowest site
+      instead of the sum of all sites. Results are still merged in source
+      order, so deduplication is the same as in sequential mode.
+    - Per-source results are cached for a few minutes, keyed on the
+      normalized query, source and `max_per_site`. Pass `use_cache=False` to
+      bypass the cache or `refresh=True` to re-scrape and update it.
+    - `deadline` (seconds) is an end-to-end budget: whatever has been
+      collected when it runs out is returned. Rows carry a `status` column
+      and `df.attrs["source_status"]` maps every selected source to its
+      status ("ok", "cached", "partial", "timeout", "empty", "error",
+      "skipped").
+    - `parse_in_processes=True` parses fetched HTML on a process pool, so
+      CPU-heavy parsing uses every core instead of queueing on the GIL.
+    - `background_save=True` queues the snapshot on the background writer
+      and returns without waiting for SQLite (default:
+      PRODUCT_AGG_BACKGROUND_SNAPSHOTS).
     """
-    results: List[Dict] = []
+    batches = list(
+        iter_combined(
+            query,
+            max_per_site=max_per_site,
+            sources=sources,
+            headless=headless,
+            concurrent=concurrent,
+            max_workers=max_workers,
+            use_cache=use_cache,
+            refresh=refresh,
+            deadline=deadline,
+            parse_in_processes=parse_in_processes,
+        )
+    )
 
-    # Try to import and call each scraper. Each call is isolated so failures
-    # don't bring down the whole aggregator.
-    # Amazon (requests-based) - call only if sources is None or contains "Amazon"
-    try:
-        if sources is None or "Amazon" in sources:
-            from scrapers import amazon_scraper
+    # Build DataFrame. Keep columns consistent.
+    df = combine_batches(batches)
+    df.attrs["source_status"] = {b["source"]: b.get("status", STATUS_OK) for b in batches}
+    if df.empty:
+        return df
 
-            try:
-                a = amazon_scraper.scrape_amazon(query, max_results=max_per_site)
-                for it in a:
-                    results.append(_normalize(it))
-            except Exception:
-                print("[aggregator] Amazon scraper failed:\n", traceback.format_exc())
-    except Exception:
-        # Amazon scraper missing / import failed
-        print("[aggregator] Could not import amazon_scraper:\n", traceback.format_exc())
+    # Optionally persist snapshot
+    if save_snapshot_to_db:
+        persist_snapshot(df, query, background=background_save)
 
-    # Selenium-based scrapers: attempt to call if available. They may require
-    # undetected_chromedriver + Chrome; failures are caught and reported.
-    try:
-        if sources is None or "Flipkart" in sources:
-            from scrapers import flipkart_scraper
+    return df
 
-            try:
-                f = flipkart_scraper.scrape_flipkart(query, max_results=max_per_site, headless=headless)
-                for it in f:
-                    results.append(_normalize(it))
-            except Exception:
-                print("[aggregator] Flipkart scraper failed:\n", traceback.format_exc())
-    except Exception:
-        print("[aggregator] Could not import flipkart_scraper (ok if not installed):\n", traceback.format_exc())
 
-    try:
-        if sources is None or "JioMart" in sources:
-            from scrapers import jiomart_scraper
+class _BatchScheduler:
+    """Hands out (source, query) jobs for a batch run.
 
-            try:
-                j = jiomart_scraper.scrape_jiomart(query, max_results=max_per_site, headless=headless)
-                for it in j:
-                    results.append(_normalize(it))
-            except Exception:
-                print("[aggregator] JioMart scraper failed:\n", traceback.format_exc())
-    except Exception:
-        print("[aggregator] Could not import jiomart_scraper (ok if not installed):\n", traceback.format_exc())
+    Sources are visited round-robin so consecutive jobs go to different
+    domains, and at most `per_site_limit` jobs run against one source at a
+    time. Queries for a source are handed out in input order. Browsers come
+    from the shared pool used by every Selenium site, so a job gets whichever
+    warm driver is free (reset between uses), not the one that served the
+    site's previous query.
+    """
+
+    def __init__(self, queries: List[str], names: List[str], per_site_limit: int):
+        self._queues = {name: deque(queries) for name in names}
+        self._active = {name: 0 for name in names}
+        self._order = deque(names)
+        self._limit = max(1, per_site_limit)
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    def next_job(self) -> Optional[Tuple[str, str]]:
+        """Block until a job is available; None when there is nothing left."""
+        with self._cond:
+            while True:
+                if self._stopped or not any(self._queues.values()):
+                    return None
+                for _ in range(len(self._order)):
+                    name = self._order[0]
+                    self._order.rotate(-1)
+                    if self._queues[name] and self._active[name] < self._limit:
+                        self._active[name] += 1
+                        return name, self._queues[name].popleft()
+                self._cond.wait()
 
+    def done(self, name: str) -> None:
+        with self._cond:
+            self._active[name] -= 1
+            self._cond.notify_all()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+def _reserve_drivers(headless: bool, count: int) -> Callable[[], None]:
+    """Grow the shared Chrome pool so `count` Selenium jobs can run at once.
+
+    Returns a callable that gives the capacity back, so a large batch doesn't
+    leave that many idle browsers running after it ends.
+    """
     try:
-        if sources is None or "Snapdeal" in sources:
-            from scrapers import snapdeal_scraper
+        from scrapers.base_scraper import get_driver_pool
 
-            try:
-                s = snapdeal_scraper.scrape_snapdeal(query, max_results=max_per_site, headless=headless)
-                for it in s:
-                    results.append(_normalize(it))
-            except Exception:
-                print("[aggregator] Snapdeal scraper failed:\n", traceback.format_exc())
+        pool = get_driver_pool(headless=headless)
+        token = pool.reserve(count)
+        return lambda: pool.release(token)
     except Exception:
-        print("[aggregator] Could not import snapdeal_scraper (ok if not installed):\n", traceback.format_exc())
+        # Selenium stack not installed; the Selenium sources will just fail.
+        return lambda: None
 
-    # Build DataFrame. Keep columns consistent.
-    if not results:
-        return pd.DataFrame(columns=["title", "description", "price", "currency", "link", "image", "source"]) 
 
-    df = pd.DataFrame(results)
+def iter_combined_many(
+    queries: Iterable[str],
+    max_per_site: int = 10,
+    sources: Optional[List[str]] = None,
+    headless: bool = True,
+    save_snapshot_to_db: bool = False,
+    max_workers: int = 4,
+    per_site_limit: Optional[int] = None,
+    use_cache: bool = True,
+    refresh: bool = False,
+    parse_in_processes: bool = False,
+    background_save: Optional[bool] = None,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Run many searches and yield (query, DataFrame) as each one completes.
 
-    # Deduplicate by link when possible, otherwise by title.
-    if "link" in df.columns:
-        df = df.drop_duplicates(subset=["link"])
-    df = df.drop_duplicates(subset=["title"])  # fallback
+    All (query, source) jobs are planned up front and executed by
+    `max_workers` threads. Sites are interleaved so no single domain gets
+    every request, and each site runs at most `per_site_limit` jobs at once
+    (default: the workers spread evenly over the selected sites). Selenium
+    sites draw from the shared warm driver pool, which is grown to match
+    while the batch runs and shrunk back afterwards, so browsers are reused
+    across queries instead of being started per search. Each DataFrame is built exactly as `fetch_combined` would.
+    With `parse_in_processes=True` the pages are parsed on the shared
+    process pool, which is where large batches spend their CPU time.
+    `background_save=True` hands snapshots to the background writer, which
+    commits many queries' snapshots per transaction.
+    """
+    queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+    names = _selected_sources(sources)
+    if not queries or not names:
+        return
 
-    # Reorder columns
-    cols = ["title", "description", "price", "currency", "link", "image", "source"]
-    df = df[[c for c in cols if c in df.columns]]
+    workers = max(1, min(max_workers, len(queries) * len(names)))
+    if per_site_limit is None:
+        per_site_limit = math.ceil(workers / len(names))
+    release_drivers = lambda: None  # noqa: E731
+    if any(SOURCES[n][2] for n in names):
+        release_drivers = _reserve_drivers(
+            headless, min(workers, per_site_limit * sum(1 for n in names if SOURCES[n][2]))
+        )
 
-    # Optionally persist snapshot
-    if save_snapshot_to_db:
-        try:
-            from database.db_helper import save_snapshot
+    scheduler = _BatchScheduler(queries, names, per_site_limit)
+    pending = {q: len(names) for q in queries}
+    batches: Dict[str, List[Dict]] = {q: [] for q in queries}
+    state_lock = threading.Lock()
+    finished: "queue.Queue[Tuple[str, pd.DataFrame]]" = queue.Queue()
 
+    def worker() -> None:
+        while True:
+            job = scheduler.next_job()
+            if job is None:
+                return
+            name, q = job
             try:
-                save_snapshot(df, query)
+                rows, status = _fetch_source(
+                    name, q, max_per_site, headless, use_cache, refresh, parse_in_processes=parse_in_processes
+                )
             except Exception:
-                print("[aggregator] failed to save snapshot:\n", traceback.format_exc())
-        except Exception:
-            # db_helper missing or import failed; continue silently
-            print("[aggregator] db_helper not available (skipping save):\n", traceback.format_exc())
+                print(f"[aggregator] batch job {name}/{q!r} failed:\n", traceback.format_exc())
+                rows, status = [], STATUS_ERROR
+            finally:
+                scheduler.done(name)
+            with state_lock:
+                batches[q].append({"source": name, "results": rows, "status": status})
+                pending[q] -= 1
+                complete = pending[q] == 0
+            if complete:
+                df = combine_batches(batches.pop(q))
+                if save_snapshot_to_db and not df.empty:
+                    persist_snapshot(df, q, background=background_save)
+                finished.put((q, df))
 
-    return df
+    threads = [
+        threading.Thread(target=worker, name=f"aggregator-batch-{i}", daemon=True) for i in range(workers)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        for _ in range(len(queries)):
+            yield finished.get()
+    finally:
+        # Stop handing out new jobs if the consumer stops early.
+        scheduler.stop()
+        release_drivers()
+
+
+def fetch_combined_many(
+    queries: Iterable[str],
+    max_per_site: int = 10,
+    sources: Optional[List[str]] = None,
+    headless: bool = True,
+    save_snapshot_to_db: bool = False,
+    max_workers: int = 4,
+    per_site_limit: Optional[int] = None,
+    use_cache: bool = True,
+    refresh: bool = False,
+    parse_in_processes: bool = False,
+    background_save: Optional[bool] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Batch version of `fetch_combined`: returns {query: DataFrame}.
+
+    See `iter_combined_many` for scheduling; results are returned in the
+    order the queries were given.
+    """
+    queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+    done = dict(
+        iter_combined_many(
+            queries,
+            max_per_site=max_per_site,
+            sources=sources,
+            headless=headless,
+            save_snapshot_to_db=save_snapshot_to_db,
+            max_workers=max_workers,
+            per_site_limit=per_site_limit,
+            use_cache=use_cache,
+            refresh=refresh,
+            parse_in_processes=parse_in_processes,
+            background_save=background_save,
+        )
+    )
+    return {q: done[q] for q in queries if q in done}
 
 
 if __name__ == "__main__":
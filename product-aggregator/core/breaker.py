@@ -0,0 +1,123 @@
+"""Per-source circuit breakers with latency-driven timeouts.
+
+A breaker trips (opens) after `failure_threshold` consecutive failures and
+then rejects calls for `cooldown` seconds, so a site that is down or
+blocking us isn't retried on every search. After the cool-down one probe
+call is let through (half-open): success closes the breaker, failure opens
+it again for another cool-down.
+
+Breakers also keep a window of recent call latencies; `timeout()` derives a
+per-source timeout from their p95 so a healthy site's waits shrink to what
+it actually needs and a sick one fails fast.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0,
+        latency_window: int = 50,
+        min_samples: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. In half-open state only a single
+        probe is allowed until its outcome is recorded."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.cooldown:
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._failures = 0
+            self._state = CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self, latency: Optional[float] = None) -> None:
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """End a call without recording an outcome (e.g. it ran out of search
+        budget). In half-open state the next call may probe again."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of recent latencies, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+
+    def timeout(self, default: float, minimum: float = 3.0, factor: float = 1.5) -> float:
+        """Timeout to use for the next call: `factor` x p95 latency, kept
+        between `minimum` and `default` (which is used until enough samples
+        have been collected)."""
+        p95 = self.p95()
+        if p95 is None:
+            return default
+        return max(minimum, min(default, p95 * factor))
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(source: str) -> CircuitBreaker:
+    """Return the process-wide breaker for `source`."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(source)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _BREAKERS[source] = breaker
+        return breaker
+
+
+def reset_breakers() -> None:
+    """Forget all breaker state (closes every circuit)."""
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
@@ -0,0 +1,146 @@
+"""Two-tier TTL cache for per-source scraper results.
+
+Tier 1 is an in-process LRU with a TTL; tier 2 is an optional SQLite file
+that survives restarts. Entries are keyed on (normalized query, source,
+max_per_site) and hold the normalized result rows for that source.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+CacheKey = Tuple[str, str, int]
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a search query."""
+    return " ".join((query or "").lower().split())
+
+
+def cache_key(query: str, source: str, max_per_site: int) -> CacheKey:
+    return (normalize_query(query), source, int(max_per_site))
+
+
+class ResultCache:
+    """LRU + TTL cache with an optional on-disk tier.
+
+    `get` checks memory first, then disk (promoting disk hits into memory).
+    Expired entries count as misses. Hit/miss counters are available from
+    `stats()`.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0, disk_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self._mem: "OrderedDict[CacheKey, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0}
+        if disk_path:
+            self._init_disk()
+
+    def _init_disk(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.disk_path)), exist_ok=True)
+        conn = sqlite3.connect(self.disk_path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY,
+                created_at REAL,
+                data_json TEXT
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_result_cache_created ON result_cache(created_at)")
+        conn.commit()
+        conn.close()
+
+    def get(self, key: CacheKey) -> Optional[List[Dict]]:
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                expires_at, rows = entry
+                if expires_at > now:
+                    self._mem.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return [dict(r) for r in rows]
+                del self._mem[key]
+
+        rows = self._disk_get(key, now)
+        with self._lock:
+            if rows is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+        return [dict(r) for r in rows]
+
+    def set(self, key: CacheKey, rows: List[Dict]) -> None:
+        now = time.time()
+        self._mem_set(key, now + self.ttl, rows)
+        if self.disk_path:
+            disk_key = json.dumps(list(key))
+            conn = sqlite3.connect(self.disk_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, created_at, data_json) VALUES (?, ?, ?)",
+                (disk_key, now, json.dumps(rows, ensure_ascii=False)),
+            )
+            # prune expired rows so keys that are never read again don't
+            # accumulate on disk
+            conn.execute(
+                "DELETE FROM result_cache WHERE created_at <= ? AND key != ?", (now - self.ttl, disk_key)
+            )
+            conn.commit()
+            conn.close()
+
+    def _mem_set(self, key: CacheKey, expires_at: float, rows: List[Dict]) -> None:
+        with self._lock:
+            self._mem[key] = (expires_at, [dict(r) for r in rows])
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def _disk_get(self, key: CacheKey, now: float) -> Optional[List[Dict]]:
+        if not self.disk_path or not os.path.exists(self.disk_path):
+            return None
+        disk_key = json.dumps(list(key))
+        conn = sqlite3.connect(self.disk_path)
+        try:
+            row = conn.execute(
+                "SELECT created_at, data_json FROM result_cache WHERE key = ?", (disk_key,)
+            ).fetchone()
+            if row is not None and row[0] + self.ttl <= now:
+                conn.execute("DELETE FROM result_cache WHERE key = ? AND created_at = ?", (disk_key, row[0]))
+                conn.commit()
+                row = None
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        created_at, data_json = row
+        rows = json.loads(data_json)
+        self._mem_set(key, created_at + self.ttl, rows)
+        return rows
+
+    def clear(self) -> None:
+        """Drop all entries (both tiers) and reset the counters."""
+        with self._lock:
+            self._mem.clear()
+            for k in self._stats:
+                self._stats[k] = 0
+        if self.disk_path and os.path.exists(self.disk_path):
+            conn = sqlite3.connect(self.disk_path)
+            conn.execute("DELETE FROM result_cache")
+            conn.commit()
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._mem)
+        return out
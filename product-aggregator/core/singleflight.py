@@ -0,0 +1,79 @@
+"""Single-flight deduplication of identical concurrent calls.
+
+When several threads ask for the same key at once, only the first (the
+leader) runs the function; the others wait and receive the leader's result
+or exception. A follower can bound its wait, and can refuse a result that
+only made sense for the leader (e.g. one cut short by the leader's own
+deadline) and run the function itself instead. Used by the aggregator so simultaneous searches for the same
+(query, source, limit) share one scrape instead of each starting Chrome.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable,
+        *args,
+        follower_timeout: Optional[float] = None,
+        shareable: Optional[Callable[[Any], bool]] = None,
+        **kwargs,
+    ) -> Any:
+        """Run `func(*args, **kwargs)` unless a call for `key` is in flight,
+        in which case wait for it and return (or raise) its outcome.
+
+        A follower waits at most `follower_timeout` seconds and then raises
+        TimeoutError. When `shareable(result)` is false the follower runs
+        `func` itself rather than taking the leader's result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            if not call.done.wait(follower_timeout):
+                raise TimeoutError("in-flight call for %r did not finish in time" % (key,))
+            if call.error is not None:
+                raise call.error
+            if shareable is not None and not shareable(call.result):
+                return func(*args, **kwargs)
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
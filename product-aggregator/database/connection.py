@@ -0,0 +1,110 @@
+"""Shared SQLite connections for the snapshot database.
+
+Each thread gets one connection per database file, opened on first use and
+kept for the life of the thread (connections of threads that have exited are
+closed the next time a connection is opened). Every connection runs in WAL
+mode with the pragmas below, so the UI can read while scrape workers write.
+The schema hook passed to `get_connection` runs once per file per process
+instead of on every call.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# Applied to every new connection. WAL lets readers proceed during a write;
+# synchronous=NORMAL is durable across application crashes in WAL mode and
+# avoids an fsync per commit; busy_timeout waits for a competing writer
+# instead of failing with "database is locked".
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("busy_timeout", "5000"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", "-16000"),  # KiB
+    ("foreign_keys", "ON"),
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_initialized = set()
+_generation = 0  # bumped by close_all_connections so threads drop stale handles
+# (path, thread) -> connection, so connections can be closed at exit or once
+# their thread is gone.
+_open: Dict[Tuple[str, threading.Thread], sqlite3.Connection] = {}
+
+
+def _configure(conn: sqlite3.Connection) -> None:
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def _reap_dead_threads() -> None:
+    # Caller holds _lock.
+    for key in [k for k in _open if not k[1].is_alive()]:
+        try:
+            _open.pop(key).close()
+        except Exception:
+            pass
+
+
+def get_connection(db_path: str, init: Optional[Callable[[sqlite3.Connection], None]] = None) -> sqlite3.Connection:
+    """Return this thread's connection to `db_path`, opening it if needed.
+
+    `init(conn)` (e.g. creating tables) runs once per database file per
+    process, before the connection is handed out.
+    """
+    path = os.path.abspath(db_path)
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "generation", None) != _generation:
+        conns = _local.conns = {}
+        _local.generation = _generation
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # check_same_thread=False only so exit/reaping can close it; each
+        # connection is used by the thread that opened it.
+        conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        _configure(conn)
+        conns[path] = conn
+        with _lock:
+            _reap_dead_threads()
+            _open[(path, threading.current_thread())] = conn
+    if init is not None and path not in _initialized:
+        with _lock:
+            if path not in _initialized:
+                init(conn)
+                conn.commit()
+                _initialized.add(path)
+    return conn
+
+
+def close_connection(db_path: Optional[str] = None) -> None:
+    """Close this thread's connection to `db_path` (all of them if None)."""
+    conns = getattr(_local, "conns", {})
+    paths = [os.path.abspath(db_path)] if db_path else list(conns)
+    me = threading.current_thread()
+    for path in paths:
+        conn = conns.pop(path, None)
+        if conn is not None:
+            with _lock:
+                _open.pop((path, me), None)
+            conn.close()
+
+
+def close_all_connections() -> None:
+    """Close every connection and forget which schemas were initialized."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for conn in _open.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        _open.clear()
+        _initialized.clear()
+
+
+atexit.register(close_all_connections)
@@ -2,80 +2,439 @@ import os
 import sqlite3
 import json
 import datetime
+import hashlib
 import io
-from typing import List, Dict
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
 
+from database.connection import get_connection
+
+# Relational layout: one `queries` row per distinct search text, one `runs`
+# row per saved snapshot, one `products` row per distinct product (keyed on
+# source + link, or source + title when there is no link; it holds the
+# latest title/image seen) and one `offers` row per DataFrame row per run.
+# Offers carry everything that row had in that run (price, title,
+# description, link, image), so later runs never change an earlier
+# snapshot. Columns that aren't modelled (e.g. rating, status) go into
+# offers.extra_json so any DataFrame round-trips through
+# save_snapshot/load_snapshots.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query_id INTEGER NOT NULL REFERENCES queries(id),
+    created_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    columns_json TEXT,
+    blob_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_query_created ON runs (query_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_blob ON runs (blob_hash);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_key TEXT NOT NULL UNIQUE,
+    source TEXT,
+    title TEXT,
+    description TEXT,
+    link TEXT,
+    image TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_source ON products (source);
+CREATE TABLE IF NOT EXISTS offers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    position INTEGER NOT NULL,
+    source TEXT,
+    price REAL,
+    currency TEXT,
+    title TEXT,
+    description TEXT,
+    link TEXT,
+    image TEXT,
+    extra_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_offers_run ON offers (run_id, position);
+CREATE INDEX IF NOT EXISTS idx_offers_product ON offers (product_id);
+CREATE INDEX IF NOT EXISTS idx_offers_source_price ON offers (source, price);
+CREATE TABLE IF NOT EXISTS snapshot_blobs (
+    hash TEXT PRIMARY KEY,
+    format TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+# DataFrame columns stored in `products` / `offers` columns rather than extra_json.
+PRODUCT_FIELDS = ("title", "description", "link", "image")
+OFFER_FIELDS = ("source", "price", "currency")
+
+# How new snapshots are stored: "relational" (products/offers rows, the
+# default) or "parquet" (the whole DataFrame as one zstd-compressed Parquet
+# blob in snapshot_blobs, shared by every run with identical rows; needs
+# pyarrow). Set the default with PRODUCT_AGG_SNAPSHOT_STORAGE. Parquet runs
+# have no offers rows, so cheapest_offers and the `source` filter of
+# list_snapshots only see relational runs.
+STORAGE_BACKENDS = ("relational", "parquet")
+SNAPSHOT_STORAGE = os.getenv("PRODUCT_AGG_SNAPSHOT_STORAGE", "relational")
+PARQUET_COMPRESSION = "zstd"
+
+
+def default_db_path() -> str:
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "products.db")
+
+
+def _create_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(SCHEMA)
+    migrate_snapshots(conn)
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """This thread's shared connection; the schema is set up on first use per process."""
+    return get_connection(db_path, init=_create_schema)
+
 
 def init_db(db_path: str = None) -> str:
-    """Ensure DB exists and required table is created. Returns db_path."""
+    """Ensure DB exists and the schema is created (migrating old snapshots). Returns db_path."""
     if db_path is None:
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "products.db")
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+        db_path = default_db_path()
+    _connect(db_path)
+    return db_path
+
+
+def _clean(value):
+    """JSON/SQLite friendly scalar: NaN/NaT -> None, numpy scalars -> Python."""
+    if value is None:
+        return None
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        try:
+            value = value.item()
+        except (ValueError, AttributeError):
+            pass
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def product_key(row: Dict) -> str:
+    """Identity of a product across runs: source + link, else source + title."""
+    source = row.get("source") or ""
+    link = row.get("link")
+    if link:
+        return f"{source}|{link}"
+    return f"{source}|title:{' '.join(str(row.get('title') or '').lower().split())}"
+
+
+def _query_id(cur: sqlite3.Cursor, query: str) -> int:
+    cur.execute("INSERT OR IGNORE INTO queries (text) VALUES (?)", (query,))
+    cur.execute("SELECT id FROM queries WHERE text = ?", (query,))
+    return cur.fetchone()[0]
+
+
+def _insert_run(cur: sqlite3.Cursor, query: str, created_at: str, records: List[Dict], columns: List[str],
+                run_id: Optional[int] = None) -> int:
+    """Write one snapshot (run + products + offers) inside the caller's transaction."""
     cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS snapshots (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            query TEXT,
-            created_at TEXT,
-            data_json TEXT
+        "INSERT INTO runs (id, query_id, created_at, row_count, columns_json) VALUES (?, ?, ?, ?, ?)",
+        (run_id, _query_id(cur, query), created_at, len(records), json.dumps(columns)),
+    )
+    run_id = cur.lastrowid
+    for position, raw in enumerate(records):
+        row = {k: _clean(v) for k, v in raw.items()}
+        cur.execute(
+            """
+            INSERT INTO products (product_key, source, title, description, link, image)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (product_key) DO UPDATE SET
+                title = excluded.title,
+                description = excluded.description,
+                image = COALESCE(excluded.image, products.image)
+            """,
+            (product_key(row), row.get("source"), *(row.get(f) for f in PRODUCT_FIELDS)),
         )
+        cur.execute("SELECT id FROM products WHERE product_key = ?", (product_key(row),))
+        product_id = cur.fetchone()[0]
+
+        extra = {k: v for k, v in row.items() if k not in PRODUCT_FIELDS and k not in OFFER_FIELDS}
+        price = row.get("price")
+        if price is not None and not isinstance(price, (int, float)):
+            # keep non-numeric prices verbatim instead of losing them
+            extra["price"] = price
+            price = None
+        cur.execute(
+            "INSERT INTO offers (run_id, product_id, position, source, price, currency, "
+            "title, description, link, image, extra_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, product_id, position, row.get("source"), price, row.get("currency"),
+             *(row.get(f) for f in PRODUCT_FIELDS),
+             # default=str: Decimal, numpy arrays etc. were accepted by to_json too
+             json.dumps(extra, ensure_ascii=False, default=str) if extra else None),
+        )
+    return run_id
+
+
+def _parquet():
+    import pyarrow
+    import pyarrow.parquet
+
+    return pyarrow, pyarrow.parquet
+
+
+def _encode_parquet(df: pd.DataFrame) -> bytes:
+    pa, pq = _parquet()
+    sink = pa.BufferOutputStream()
+    # The pandas metadata and column statistics roughly double a small
+    # snapshot's size; plain column types round-trip without them.
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    pq.write_table(table, sink, compression=PARQUET_COMPRESSION, write_statistics=False)
+    return sink.getvalue().to_pybytes()
+
+
+def _decode_parquet(data: bytes) -> pd.DataFrame:
+    pa, pq = _parquet()
+    # Column buffers are handed to pandas block by block and Arrow frees its
+    # copy as it goes, instead of consolidating into a second full copy.
+    return pq.read_table(pa.py_buffer(data)).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _insert_blob_run(cur: sqlite3.Cursor, query: str, created_at: str, df: pd.DataFrame) -> int:
+    """Write one snapshot as a Parquet blob, reusing an identical stored blob.
+
+    The key is the hash of the encoded bytes, i.e. of exactly what would be
+    stored: frames that only look alike (1 vs "1" in an object column) get
+    different blobs.
+    """
+    data = _encode_parquet(df)
+    digest = hashlib.sha256(data).hexdigest()
+    cur.execute(
+        "INSERT OR IGNORE INTO snapshot_blobs (hash, format, row_count, size, data) VALUES (?, ?, ?, ?, ?)",
+        (digest, "parquet", len(df), len(data), data),
+    )
+    cur.execute(
+        "INSERT INTO runs (query_id, created_at, row_count, columns_json, blob_hash) VALUES (?, ?, ?, ?, ?)",
+        (_query_id(cur, query), created_at, len(df), json.dumps([str(c) for c in df.columns]), digest),
+    )
+    return cur.lastrowid
+
+
+def _run_dataframe(cur: sqlite3.Cursor, run_id: int, columns_json: Optional[str],
+                   blob_hash: Optional[str] = None) -> pd.DataFrame:
+    """Rebuild a snapshot's DataFrame from its blob or offers, in the saved row and column order."""
+    if blob_hash:
+        row = cur.execute("SELECT data FROM snapshot_blobs WHERE hash = ?", (blob_hash,)).fetchone()
+        return _decode_parquet(row[0])
+    columns = json.loads(columns_json) if columns_json else []
+    cur.execute(
         """
+        SELECT o.title, o.description, o.link, o.image, o.source, o.price, o.currency, o.extra_json
+        FROM offers o
+        WHERE o.run_id = ?
+        ORDER BY o.position
+        """,
+        (run_id,),
     )
-    conn.commit()
-    conn.close()
-    return db_path
+    records = []
+    for title, description, link, image, source, price, currency, extra_json in cur.fetchall():
+        row = {"title": title, "description": description, "link": link, "image": image,
+               "source": source, "price": price, "currency": currency}
+        if extra_json:
+            row.update(json.loads(extra_json))
+        records.append({c: row.get(c) for c in columns})
+    return pd.DataFrame(records, columns=columns)
+
+
+def migrate_snapshots(conn: sqlite3.Connection) -> int:
+    """Move rows from the old JSON-blob `snapshots` table into runs/offers.
+
+    Snapshot ids are kept as run ids. The old table is renamed to
+    `snapshots_migrated` (not dropped) so the step runs once. Returns the
+    number of snapshots migrated.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'snapshots'"
+    ).fetchone()
+    if not exists:
+        return 0
+    cur = conn.cursor()
+    count = 0
+    for id_, query, created_at, data_json in conn.execute(
+        "SELECT id, query, created_at, data_json FROM snapshots ORDER BY id"
+    ).fetchall():
+        try:
+            df = pd.read_json(io.StringIO(data_json), orient="records")
+        except Exception:
+            df = pd.DataFrame()
+        _insert_run(cur, query or "", created_at or "", df.to_dict("records"), list(df.columns), run_id=id_)
+        count += 1
+    conn.execute("ALTER TABLE snapshots RENAME TO snapshots_migrated")
+    return count
+
+
+def save_snapshot(df: pd.DataFrame, query: str, db_path: str = None, storage: str = None) -> int:
+    """Save a DataFrame snapshot as a run with one offer per row. Returns the run id.
+
+    `storage="parquet"` stores it as a compressed Parquet blob instead (see
+    SNAPSHOT_STORAGE).
+    """
+    return save_snapshots([(df, query)], db_path=db_path, storage=storage)[0]
+
+
+def _resolve_storage(storage: Optional[str]) -> str:
+    storage = storage or SNAPSHOT_STORAGE
+    if storage not in STORAGE_BACKENDS:
+        raise ValueError(f"unknown snapshot storage {storage!r}; choose from {', '.join(STORAGE_BACKENDS)}")
+    if storage == "parquet":
+        try:
+            _parquet()
+        except ImportError:
+            print("[db_helper] pyarrow not installed; saving snapshot with relational storage")
+            return "relational"
+    return storage
 
 
-def save_snapshot(df: pd.DataFrame, query: str, db_path: str = None) -> int:
-    """Save a DataFrame snapshot as a JSON blob. Returns the inserted row id."""
+def save_snapshots(items: Iterable[Tuple], db_path: str = None, storage: str = None) -> List[int]:
+    """Save several snapshots in one transaction. Returns their run ids.
+
+    Each item is (df, query) or (df, query, created_at); created_at (ISO
+    string) defaults to now. Either every snapshot is written or none is.
+    """
     if db_path is None:
-        db_path = init_db()
-    else:
-        init_db(db_path)
+        db_path = default_db_path()
+    storage = _resolve_storage(storage)
+
+    conn = _connect(db_path)
+    ids: List[int] = []
+    with conn:
+        cur = conn.cursor()
+        for item in items:
+            df, query = item[0], item[1]
+            created_at = item[2] if len(item) > 2 else None
+            if not created_at:
+                created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            if storage == "parquet":
+                try:
+                    ids.append(_insert_blob_run(cur, query, created_at, df))
+                    continue
+                except _parquet()[0].lib.ArrowException:
+                    # columns Arrow can't type (e.g. mixed str/float objects)
+                    print("[db_helper] snapshot not representable as Parquet; using relational storage")
+            ids.append(_insert_run(cur, query, created_at, df.to_dict("records"), [str(c) for c in df.columns]))
+    return ids
+
+
+def _snapshot_filters(query: str = None, source: str = None, since: str = None,
+                      until: str = None) -> Tuple[str, Tuple]:
+    clauses, params = [], ()
+    if query:
+        clauses.append("q.text = ?")
+        params += (query,)
+    if source:
+        clauses.append("EXISTS (SELECT 1 FROM offers o WHERE o.run_id = r.id AND o.source = ?)")
+        params += (source,)
+    if since:
+        clauses.append("r.created_at >= ?")
+        params += (since,)
+    if until:
+        clauses.append("r.created_at < ?")
+        params += (until,)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
 
-    data_json = df.to_json(orient="records", force_ascii=False)
-    conn = sqlite3.connect(db_path)
+
+def list_snapshots(query: str = None, source: str = None, since: str = None, until: str = None,
+                   limit: Optional[int] = 50, offset: int = 0, db_path: str = None) -> List[Dict]:
+    """List snapshot metadata, newest first, without loading any rows.
+
+    Returns dicts {id, query, created_at, row_count}. Filters: exact query
+    text, a source that appears in the snapshot, and a created_at range
+    (ISO strings, `until` exclusive). Page with limit/offset; limit=None
+    returns everything.
+    """
+    if db_path is None:
+        db_path = default_db_path()
+    if not os.path.exists(db_path):
+        return []
+    where, params = _snapshot_filters(query, source, since, until)
+    sql = ("SELECT r.id, q.text, r.created_at, r.row_count FROM runs r JOIN queries q ON q.id = r.query_id"
+           + where + " ORDER BY r.id DESC")
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += (limit, offset)
+    rows = _connect(db_path).execute(sql, params).fetchall()
+    return [{"id": id_, "query": q, "created_at": created_at, "row_count": row_count}
+            for id_, q, created_at, row_count in rows]
+
+
+def count_snapshots(query: str = None, source: str = None, since: str = None, until: str = None,
+                    db_path: str = None) -> int:
+    """Number of snapshots matching the same filters as list_snapshots."""
+    if db_path is None:
+        db_path = default_db_path()
+    if not os.path.exists(db_path):
+        return 0
+    where, params = _snapshot_filters(query, source, since, until)
+    count = _connect(db_path).execute(
+        "SELECT COUNT(*) FROM runs r JOIN queries q ON q.id = r.query_id" + where, params
+    ).fetchone()[0]
+    return count
+
+
+def load_snapshot(snapshot_id: int, db_path: str = None) -> Optional[Dict]:
+    """Load one snapshot {id, query, created_at, row_count, df} by id, or None if missing."""
+    if db_path is None:
+        db_path = default_db_path()
+    if not os.path.exists(db_path):
+        return None
+    conn = _connect(db_path)
     cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO snapshots (query, created_at, data_json) VALUES (?, ?, ?)",
-        (query, datetime.datetime.now(datetime.timezone.utc).isoformat(), data_json),
-    )
-    conn.commit()
-    rowid = cur.lastrowid
-    conn.close()
-    return rowid
+    row = cur.execute(
+        "SELECT r.id, q.text, r.created_at, r.row_count, r.columns_json, r.blob_hash "
+        "FROM runs r JOIN queries q ON q.id = r.query_id WHERE r.id = ?",
+        (snapshot_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    id_, q, created_at, row_count, columns_json, blob_hash = row
+    try:
+        df = _run_dataframe(cur, id_, columns_json, blob_hash)
+    except Exception:
+        df = pd.DataFrame()
+    return {"id": id_, "query": q, "created_at": created_at, "row_count": row_count, "df": df}
 
 
 def load_snapshots(query: str = None, db_path: str = None) -> List[Dict]:
     """Load snapshots. Returns list of dicts {id, query, created_at, df}.
     If query is provided, filters by it.
+
+    Builds a DataFrame for every snapshot; use list_snapshots + load_snapshot
+    when only the metadata (or a single snapshot) is needed.
     """
     if db_path is None:
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "products.db")
+        db_path = default_db_path()
     if not os.path.exists(db_path):
         return []
-    conn = sqlite3.connect(db_path)
+    where, params = _snapshot_filters(query)
+    conn = _connect(db_path)
     cur = conn.cursor()
-    if query:
-        cur.execute(
-            "SELECT id, query, created_at, data_json FROM snapshots WHERE query = ? ORDER BY id DESC",
-            (query,),
-        )
-    else:
-        cur.execute("SELECT id, query, created_at, data_json FROM snapshots ORDER BY id DESC")
-    rows = cur.fetchall()
-    conn.close()
+    rows = cur.execute(
+        "SELECT r.id, q.text, r.created_at, r.columns_json, r.blob_hash FROM runs r JOIN queries q ON q.id = r.query_id"
+        + where + " ORDER BY r.id DESC",
+        params,
+    ).fetchall()
 
     results: List[Dict] = []
-    for id_, q, created_at, data_json in rows:
+    for id_, q, created_at, columns_json, blob_hash in rows:
         try:
-            # pandas.read_json will deprecate passing a literal JSON string directly.
-            # Wrap in StringIO to keep compatibility and silence FutureWarning.
-            df = pd.read_json(io.StringIO(data_json), orient="records")
+            df = _run_dataframe(cur, id_, columns_json, blob_hash)
         except Exception:
             df = pd.DataFrame()
         results.append({"id": id_, "query": q, "created_at": created_at, "df": df})
@@ -83,20 +442,63 @@ def load_snapshots(query: str = None, db_path: str = None) -> List[Dict]:
 
 
 def delete_snapshot(snapshot_id: int, db_path: str = None) -> bool:
-    """Delete a snapshot row by id. Returns True if a row was deleted."""
+    """Delete a snapshot (run and its offers or blob) by id. Returns True if a run was deleted.
+
+    A Parquet blob is removed only once no other run shares it.
+    """
     if db_path is None:
-        db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "products.db")
+        db_path = default_db_path()
     if not os.path.exists(db_path):
         return False
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
-    conn.commit()
-    deleted = cur.rowcount
-    conn.close()
+    conn = _connect(db_path)
+    with conn:
+        cur = conn.cursor()
+        row = cur.execute("SELECT blob_hash FROM runs WHERE id = ?", (snapshot_id,)).fetchone()
+        cur.execute("DELETE FROM offers WHERE run_id = ?", (snapshot_id,))
+        cur.execute("DELETE FROM runs WHERE id = ?", (snapshot_id,))
+        deleted = cur.rowcount
+        if row is not None and row[0]:
+            cur.execute(
+                "DELETE FROM snapshot_blobs WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM runs WHERE blob_hash = ?)",
+                (row[0], row[0]),
+            )
     return deleted > 0
 
 
+def cheapest_offers(query: str, since: Optional[str] = None, limit: int = 10, db_path: str = None) -> pd.DataFrame:
+    """Lowest price seen per product for `query` (optionally since an ISO timestamp).
+
+    Answered from the indexed offers table without deserializing snapshots.
+    Columns: title, source, link, price, currency, seen_at.
+    """
+    if db_path is None:
+        db_path = default_db_path()
+    columns = ["title", "source", "link", "price", "currency", "seen_at"]
+    if not os.path.exists(db_path):
+        return pd.DataFrame(columns=columns)
+    conn = _connect(db_path)
+    params: Tuple = (query,)
+    where = "q.text = ? AND o.price IS NOT NULL"
+    if since:
+        where += " AND r.created_at >= ?"
+        params += (since,)
+    rows = conn.execute(
+        f"""
+        SELECT p.title, o.source, p.link, MIN(o.price), o.currency, r.created_at
+        FROM offers o
+        JOIN runs r ON r.id = o.run_id
+        JOIN queries q ON q.id = r.query_id
+        JOIN products p ON p.id = o.product_id
+        WHERE {where}
+        GROUP BY o.product_id
+        ORDER BY MIN(o.price)
+        LIMIT ?
+        """,
+        params + (limit,),
+    ).fetchall()
+    return pd.DataFrame(rows, columns=columns)
+
+
 if __name__ == "__main__":
     # quick manual check
     df = pd.DataFrame([{"title": "test", "price": 99}])
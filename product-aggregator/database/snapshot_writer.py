@@ -0,0 +1,159 @@
+"""Background writer that saves snapshots off the scraping path.
+
+`submit(df, query)` copies the DataFrame onto a bounded queue and returns;
+one writer thread drains the queue and saves whatever has accumulated (up to
+`batch_size` snapshots) in a single transaction via
+`db_helper.save_snapshots`. When the queue is full `submit` blocks, so a
+crawl that produces snapshots faster than SQLite can take them slows down
+instead of growing memory without bound. The shared writer is flushed and
+stopped at interpreter exit.
+"""
+import atexit
+import datetime
+import os
+import queue
+import threading
+import traceback
+from typing import Dict, Optional
+
+import pandas as pd
+
+from database import db_helper
+
+DEFAULT_QUEUE_SIZE = int(os.getenv("PRODUCT_AGG_DB_QUEUE_SIZE", "256"))
+DEFAULT_BATCH_SIZE = int(os.getenv("PRODUCT_AGG_DB_BATCH_SIZE", "64"))
+
+_STOP = object()
+
+
+class SnapshotWriter:
+    """Bounded queue plus one thread that writes snapshots in batches.
+
+    `flush()` waits until everything submitted so far is on disk and
+    `close()` flushes and stops the thread. When a batch fails its snapshots
+    are retried one by one, so a bad snapshot only loses itself; failures are
+    logged and counted in `stats()`, never raised to the submitter.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_queue: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, max_queue))
+        self._idle = threading.Condition()
+        self._unfinished = 0
+        self._closed = False
+        self._stats = {"submitted": 0, "written": 0, "batches": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, df: pd.DataFrame, query: str, timeout: Optional[float] = None) -> None:
+        """Queue a snapshot; blocks while the queue is full.
+
+        Raises queue.Full if `timeout` passes first, RuntimeError after close().
+        """
+        if self._closed:
+            raise RuntimeError("snapshot writer is closed")
+        created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self._idle:
+            self._unfinished += 1
+            self._stats["submitted"] += 1
+        try:
+            self._queue.put((df.copy(), query, created_at), timeout=timeout)
+        except queue.Full:
+            self._done(1)
+            raise
+
+    def _done(self, n: int) -> None:
+        with self._idle:
+            self._unfinished -= n
+            if self._unfinished <= 0:
+                self._idle.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch) -> None:
+        try:
+            self._save(batch)
+        finally:
+            self._done(len(batch))
+
+    def _save(self, batch) -> None:
+        try:
+            db_helper.save_snapshots(batch, db_path=self.db_path)
+            with self._idle:
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+        except Exception:
+            if len(batch) > 1:
+                # the batch transaction rolled back; retry one by one so a
+                # bad snapshot doesn't take the good ones with it
+                for item in batch:
+                    self._save([item])
+                return
+            print(f"[db_writer] failed to save snapshot for {batch[0][1]!r}:\n", traceback.format_exc())
+            with self._idle:
+                self._stats["failed"] += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted snapshot has been written (or failed)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished <= 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Flush pending snapshots and stop the writer thread."""
+        if self._closed:
+            return True
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stats(self) -> Dict[str, int]:
+        with self._idle:
+            out = dict(self._stats)
+        out["queued"] = self._queue.qsize()
+        return out
+
+
+_writer: Optional[SnapshotWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_snapshot_writer() -> SnapshotWriter:
+    """The shared writer for the default database, started on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SnapshotWriter()
+        return _writer
+
+
+def shutdown_snapshot_writer(timeout: Optional[float] = 30) -> None:
+    """Flush and stop the shared writer (registered with atexit)."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close(timeout)
+
+
+atexit.register(shutdown_snapshot_writer)
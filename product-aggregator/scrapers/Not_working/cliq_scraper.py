@@ -6,6 +6,8 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 import time
 
+from scrapers.base_scraper import scroll_until_stable
+
 def scrape_tatacliq(product_name, max_results=15):
     driver = uc.Chrome()
     results = []
@@ -55,10 +57,7 @@ def scrape_tatacliq(product_name, max_results=15):
             driver.quit()
             return []
 
-        time.sleep(2)
-        for _ in range(4):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
+        scroll_until_stable(driver, "//div[contains(@class,'ProductModule__Container')]", max_results=max_results)
 
         blocks = driver.find_elements(By.XPATH, "//div[contains(@class,'ProductModule__Container')]")
         print(f"Found {len(blocks)} Tata Cliq product cards.")
@@ -3,7 +3,8 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
+
+from scrapers.base_scraper import scroll_until_stable
 
 def scrape_croma(product_name, max_results=15):
     driver = uc.Chrome()
@@ -26,11 +27,8 @@ def scrape_croma(product_name, max_results=15):
         search_box.clear()
         search_box.send_keys(product_name)
         search_box.send_keys(Keys.RETURN)
-        time.sleep(2)
-        for i in range(6):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-        time.sleep(3) # Extra sleep for lazy images
+        # Scroll until the product list stops growing instead of fixed sleeps
+        scroll_until_stable(driver, "//a[contains(@href, '/p/')]", max_results=max_results * 2)
 
         blocks = driver.find_elements(By.XPATH, "//a[contains(@href, '/p/')]")
         print(f"Found {len(blocks)} product links with XPath.")
@@ -3,7 +3,8 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
+
+from scrapers.base_scraper import scroll_until_stable
 
 def scrape_meesho(product_name, max_results=15):
     driver = uc.Chrome()
@@ -26,24 +27,9 @@ def scrape_meesho(product_name, max_results=15):
         search_box.clear()
         search_box.send_keys(product_name)
         search_box.send_keys(Keys.RETURN)
-        time.sleep(2)
 
-        # Infinite scroll loop (keeps scrolling until no more cards appear or limit hit)
-        last_count = 0
-        scroll_attempts = 0
-        max_scroll_attempts = 20
-        while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1.2)
-            cards = driver.find_elements(By.XPATH, "//div[contains(@class, 'SearchProductCard')]")
-            if len(cards) > last_count:
-                last_count = len(cards)
-                scroll_attempts = 0
-            else:
-                scroll_attempts += 1
-            # If scraping plenty, or stuck for 3 scrolls, break out
-            if scroll_attempts >= 3 or last_count >= max_results * 2:
-                break
+        # Keep scrolling until no more cards appear or the limit is hit
+        scroll_until_stable(driver, "//div[contains(@class, 'SearchProductCard')]", max_results=max_results * 2)
 
         cards = driver.find_elements(By.XPATH, "//div[contains(@class, 'SearchProductCard')]")
         print(f"Found {len(cards)} product cards.")
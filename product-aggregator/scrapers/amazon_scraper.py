@@ -1,74 +1,320 @@
-import requests
-from bs4 import BeautifulSoup
+import itertools
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from scrapers.http_client import forget_cached, http_get, is_cached
+from scrapers.rate_limit import get_rate_limiter, looks_blocked
+from utils.deadline import DeadlineExceeded
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def scrape_amazon(product_name, max_results=10, timeout: int = 10, retries: int = 1):
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/128.0.0.0 Safari/537.36"
-        ),
-        "Accept-Language": "en-US,en;q=0.9",
-        "Connection": "keep-alive"
+# Parser used by `parse_amazon` (PRODUCT_AGG_AMAZON_PARSER):
+#   lxml        lxml.html tree + compiled XPath (default when lxml is installed)
+#   restricted  BeautifulSoup/html.parser building only the result subtrees
+#   selectolax  selectolax's Lexbor parser, if installed
+#   html.parser full BeautifulSoup tree (the original implementation)
+# All backends return identical rows; tools/bench_amazon_parser.py compares
+# their speed.
+PARSER_BACKEND = os.getenv("PRODUCT_AGG_AMAZON_PARSER", "lxml")
+
+RESULT_SELECTOR = "div.s-result-item[data-component-type='s-search-result']"
+TITLE_SELECTOR = "h2 span"
+PRICE_SELECTOR = "span.a-price-whole"
+LINK_SELECTOR = "a.a-link-normal.s-no-outline"
+IMAGE_SELECTOR = "img.s-image"
+RATING_SELECTOR = "span.a-icon-alt"
+
+
+def _build_row(title, price_text, href, image_url, rating):
+    """Turn one result's raw fields into a product dict (None = skip it)."""
+    if title is None or price_text is None or href is None:
+        return None
+    try:
+        price_val = float(price_text.replace(",", ""))
+    except ValueError:
+        return None
+    return {
+        "title": title,
+        "price": price_val,
+        "rating": rating if rating is not None else "N/A",
+        "link": "https://www.amazon.in" + href,
+        "image": image_url,
+        "source": "Amazon",
+        "fetched_via": "http",
     }
 
-    query = product_name.replace(" ", "+")
-    url = f"https://www.amazon.in/s?k={query}"
 
+def _soup_items(soup):
+    for item in soup.select(RESULT_SELECTOR):
+        name_tag = item.select_one(TITLE_SELECTOR)
+        price_tag = item.select_one(PRICE_SELECTOR)
+        link_tag = item.select_one(LINK_SELECTOR)
+        img_tag = item.select_one(IMAGE_SELECTOR)
+        rating_tag = item.select_one(RATING_SELECTOR)
+        yield (
+            name_tag.get_text(strip=True) if name_tag else None,
+            price_tag.get_text(strip=True) if price_tag else None,
+            link_tag.get("href") if link_tag else None,
+            img_tag.get("src") if img_tag else None,
+            rating_tag.get_text(strip=True) if rating_tag else None,
+        )
+
+
+def _items_html_parser(html):
+    yield from _soup_items(BeautifulSoup(html, "html.parser"))
+
+
+def _items_restricted(html):
+    # Only the result <div>s (and their children) are turned into objects;
+    # the rest of the ~1 MB page is tokenized and dropped.
+    only_results = SoupStrainer("div", attrs={"data-component-type": "s-search-result"})
+    yield from _soup_items(BeautifulSoup(html, "html.parser", parse_only=only_results))
+
+
+def _class_xpath(tag, *classes):
+    return "%s[%s]" % (tag, " and ".join(
+        "contains(concat(' ', normalize-space(@class), ' '), ' %s ')" % c for c in classes
+    ))
+
+
+_LXML_XPATHS = None
+
+
+def _lxml_xpaths():
+    global _LXML_XPATHS
+    if _LXML_XPATHS is None:
+        from lxml import etree
+
+        first = lambda path: etree.XPath("(%s)[1]" % path)
+        _LXML_XPATHS = {
+            "items": etree.XPath("//" + _class_xpath("div", "s-result-item") + "[@data-component-type='s-search-result']"),
+            "title": first(".//h2//span"),
+            "price": first(".//" + _class_xpath("span", "a-price-whole")),
+            "link": first(".//" + _class_xpath("a", "a-link-normal", "s-no-outline")),
+            "image": first(".//" + _class_xpath("img", "s-image")),
+            "rating": first(".//" + _class_xpath("span", "a-icon-alt")),
+            # get_text() skips script/style contents; so does this
+            "text": etree.XPath(".//text()[not(ancestor::script) and not(ancestor::style)]"),
+        }
+    return _LXML_XPATHS
+
+
+def _items_lxml(html):
+    from lxml import etree, html as lxml_html
+
+    xp = _lxml_xpaths()
+
+    def node(item, key):
+        found = xp[key](item)
+        return found[0] if found else None
+
+    def text(el):
+        # Same as BeautifulSoup's get_text(strip=True)
+        return "".join(t.strip() for t in xp["text"](el)) if el is not None else None
+
+    def attr(el, name):
+        return el.get(name) if el is not None else None
+
+    try:
+        root = lxml_html.fromstring(html)
+    except etree.ParserError:
+        # blank body ("Document is empty"); html.parser just finds no items
+        return
+    for item in xp["items"](root):
+        yield (
+            text(node(item, "title")),
+            text(node(item, "price")),
+            attr(node(item, "link"), "href"),
+            attr(node(item, "image"), "src"),
+            text(node(item, "rating")),
+        )
+
+
+def _items_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    def text(el):
+        return el.text(deep=True, separator="", strip=True) if el is not None else None
+
+    def attr(el, name):
+        return el.attributes.get(name) if el is not None else None
+
+    tree = LexborHTMLParser(html)
+    for item in tree.css(RESULT_SELECTOR):
+        yield (
+            text(item.css_first(TITLE_SELECTOR)),
+            text(item.css_first(PRICE_SELECTOR)),
+            attr(item.css_first(LINK_SELECTOR), "href"),
+            attr(item.css_first(IMAGE_SELECTOR), "src"),
+            text(item.css_first(RATING_SELECTOR)),
+        )
+
+
+PARSER_BACKENDS = {
+    "html.parser": _items_html_parser,
+    "restricted": _items_restricted,
+    "lxml": _items_lxml,
+    "selectolax": _items_selectolax,
+}
+
+
+def parse_amazon(html, max_results=None, backend=None):
+    """Parse an Amazon search results page into product dicts.
+
+    Pure function of the page source (no network), so it can run on saved
+    pages or in a worker process. `max_results=None` returns every product.
+    `backend` picks an entry of PARSER_BACKENDS (default PARSER_BACKEND);
+    if the name is unknown or its library isn't installed the original
+    html.parser path is used.
+    """
+    backend = backend or PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        logger.warning("Unknown Amazon parser backend %r; using html.parser", backend)
+        backend = "html.parser"
+    try:
+        fields = PARSER_BACKENDS[backend](html)
+        first = next(fields, None)
+    except ImportError:
+        logger.debug("Amazon parser backend %r unavailable; using html.parser", backend)
+        fields = _items_html_parser(html)
+        first = next(fields, None)
+
+    results = []
+    for raw in itertools.chain([first], fields) if first is not None else ():
+        row = _build_row(*raw)
+        if row is None:
+            continue
+        results.append(row)
+        # Sponsored/placeholder cards are skipped, so count valid products.
+        if max_results and len(results) >= max_results:
+            break
+    return results
+
+
+SEARCH_URL = "https://www.amazon.in/s?k={query}"
+
+# Upper bound on result pages per search (PRODUCT_AGG_AMAZON_MAX_PAGES) and
+# on pages fetched at the same time; the rate limiter still spaces them.
+MAX_PAGES = int(os.getenv("PRODUCT_AGG_AMAZON_MAX_PAGES", "5"))
+PAGE_WORKERS = 4
+
+_ASIN_RE = re.compile(r"/dp/([A-Z0-9]{10})")
+
+
+def _fetch_page(url, timeout, retries, deadline, limiter):
+    """GET one results page with retries; returns the HTML or None."""
     resp = None
     last_exc = None
     for attempt in range(1, retries + 2):
+        if deadline is not None:
+            # No time left for (another) attempt: give up without retrying.
+            deadline.check()
+        if not is_cached(url):
+            limiter.acquire(deadline)
+            if deadline is not None:
+                deadline.check()
         try:
-            resp = requests.get(url, headers=headers, timeout=timeout)
-            break
+            resp = http_get(url, timeout=deadline.clamp(timeout) if deadline is not None else timeout)
         except Exception as e:
             last_exc = e
             logger.warning("Amazon request attempt %d failed: %s", attempt, e)
+            continue
+        if looks_blocked(resp.status_code):
+            # 429/503: slow down before the retry (and for everyone else)
+            limiter.penalize(f"Amazon returned status {resp.status_code}")
+            continue
+        break
     if resp is None:
         logger.error("Amazon request failed after retries: %s", last_exc)
-        return []
+        return None
 
     if resp.status_code != 200:
         logger.error("Amazon returned status %d", resp.status_code)
-        return []
+        return None
+    return resp.text
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    items = soup.select("div.s-result-item[data-component-type='s-search-result']")
 
+def _parse(html, max_results, parse_executor):
+    if parse_executor is not None:
+        # CPU-bound parse runs in a worker process (see core.aggregator).
+        return parse_executor.submit(parse_amazon, html, max_results).result()
+    return parse_amazon(html, max_results)
+
+
+def _product_key(row):
+    # The same product shows up on several pages with different ref= links.
+    match = _ASIN_RE.search(row["link"])
+    return match.group(1) if match else row["link"]
+
+
+def merge_pages(pages, max_results=None):
+    """Merge per-page rows in page order, dropping repeats of a product."""
     results = []
-    for item in items[:max_results]:
-        name_tag = item.select_one("h2 span")
-        price_tag = item.select_one("span.a-price-whole")
-        link_tag = item.select_one("a.a-link-normal.s-no-outline")
-        img_tag = item.select_one("img.s-image")
-        rating_tag = item.select_one("span.a-icon-alt")
-
-        if not name_tag or not price_tag or not link_tag:
-            continue
+    seen = set()
+    for rows in pages:
+        for row in rows:
+            key = _product_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append(row)
+            if max_results and len(results) >= max_results:
+                return results
+    return results
 
-        title = name_tag.get_text(strip=True)
-        try:
-            price_val = float(price_tag.get_text(strip=True).replace(",", ""))
-        except ValueError:
-            continue
 
-        full_link = "https://www.amazon.in" + link_tag.get("href")
-        image_url = img_tag.get("src") if img_tag else None
-        rating = rating_tag.get_text(strip=True) if rating_tag else "N/A"
+def scrape_amazon(product_name, max_results=10, timeout: int = 10, retries: int = 1, deadline=None,
+                  parse_executor=None, max_pages=None):
+    """Scrape Amazon search results over HTTP, reading as many pages as needed.
 
-        results.append({
-            "title": title,
-            "price": price_val,
-            "rating": rating,
-            "link": full_link,
-            "image": image_url,
-            "source": "Amazon"
-        })
+    Page 1 is fetched first (it also tells us whether we're being blocked);
+    if it holds fewer than `max_results` products the remaining pages
+    (`&page=N`, at most `max_pages`) are fetched concurrently through the
+    shared session and rate limiter, then merged in page order without
+    duplicates.
+    """
+    # Browser-like headers and keep-alive come from the shared HTTP session.
+    query = product_name.replace(" ", "+")
+    url = SEARCH_URL.format(query=query)
+    max_pages = MAX_PAGES if max_pages is None else max_pages
+
+    limiter = get_rate_limiter("Amazon")
+    html = _fetch_page(url, timeout, retries, deadline, limiter)
+    if html is None:
+        return []
+
+    first = _parse(html, max_results, parse_executor)
+    if not first and looks_blocked(text=html):
+        forget_cached(url)
+        limiter.penalize("Amazon served a captcha page")
+        return []
+    limiter.reward()
+
+    # Page 1 stopped short of the limit, so it holds every product it has;
+    # later pages are assumed to hold about as many.
+    first = merge_pages([first])
+    missing = max_results - len(first)
+    if not first or missing <= 0 or max_pages <= 1 or (deadline is not None and deadline.expired()):
+        return first[:max_results]
+    extra = min(max_pages - 1, math.ceil(missing / len(first)))
+
+    def page(n):
+        try:
+            page_html = _fetch_page(f"{url}&page={n}", timeout, retries, deadline, limiter)
+            return _parse(page_html, None, parse_executor) if page_html else []
+        except DeadlineExceeded:
+            return []
 
+    with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, extra), thread_name_prefix="amazon-page") as pool:
+        pages = list(pool.map(page, range(2, extra + 2)))
+    results = merge_pages([first] + pages, max_results)
+    logger.info("Amazon: %d products from %d pages", len(results), extra + 1)
     return results
 
 # Example
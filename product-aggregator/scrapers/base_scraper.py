@@ -1,22 +1,59 @@
-"""Common scraper helpers: driver creation and simple retry helper.
+"""Common scraper helpers: driver creation, a warm driver pool, a
+readiness-driven scroll helper, bulk DOM extraction and a simple retry helper.
 
 This keeps the individual scraper modules small and provides consistent
 error messages, retries and headless configuration.
 """
+import atexit
+import json
+import os
+import threading
 import time
-from typing import Callable
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
 
 import undetected_chromedriver as uc
 from selenium.common.exceptions import SessionNotCreatedException
 
+from scrapers.rate_limit import looks_blocked
+from utils.deadline import Deadline
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# undetected_chromedriver patches the chromedriver binary on startup; starting
+# several instances at once (e.g. from the aggregator's thread pool) can race
+# on that file, so driver creation is serialized.
+_DRIVER_START_LOCK = threading.Lock()
 
-def make_driver(headless: bool = True):
+
+# Content settings for the lean profile: the scrapers read image URLs from
+# the DOM but never need the image bytes, notifications or media devices.
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.geolocation": 2,
+}
+
+# Requests dropped via the DevTools protocol in lean mode: web fonts, video
+# and common third-party analytics / ad tags.
+BLOCKED_URL_PATTERNS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.m3u8",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*connect.facebook.com*",
+    "*hotjar.com*", "*clarity.ms*", "*criteo.com*", "*adservice.google.*",
+]
+
+
+def make_driver(headless: bool = True, lean: bool = False):
     """Create and return an undetected_chromedriver.Chrome instance.
 
+    With `lean=True` the browser doesn't download images, fonts, video or
+    trackers and uses the "eager" page-load strategy, so `driver.get` returns
+    once the DOM is ready instead of waiting for every subresource.
+
     Raises SessionNotCreatedException with a helpful message when Chrome/driver
     can't start.
     """
@@ -27,12 +64,476 @@ def make_driver(headless: bool = True):
     opts.add_argument("--no-sandbox")
     opts.add_argument("--disable-gpu")
     opts.add_argument("--disable-dev-shm-usage")
+    if lean:
+        opts.page_load_strategy = "eager"
+        opts.add_experimental_option("prefs", LEAN_PREFS)
     try:
-        return uc.Chrome(options=opts)
+        with _DRIVER_START_LOCK:
+            driver = uc.Chrome(options=opts)
     except SessionNotCreatedException as e:
         raise SessionNotCreatedException(
             f"Could not start Chrome. Ensure Chrome is installed and compatible with undetected_chromedriver. Original: {e}"
         )
+    if lean:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            # Still usable, just not as lean; don't fail the search over it.
+            logger.warning("Could not set blocked URLs via DevTools: %s", e)
+    return driver
+
+
+# Selenium's own page-load limit, restored whenever no deadline applies so a
+# pooled driver doesn't keep the previous search's shorter limit.
+DEFAULT_PAGE_LOAD_TIMEOUT = 300.0
+
+
+def wait_budget(timeout: float, deadline: Optional[Deadline] = None) -> float:
+    """`timeout` clamped to what is left of `deadline` (unchanged without one).
+
+    Call it at each wait rather than once per search: the HTTP attempt, the
+    rate limiter and the driver checkout all spend budget in between.
+    """
+    return timeout if deadline is None else deadline.clamp(timeout)
+
+
+def load_page(driver, url: str, deadline: Optional[Deadline] = None) -> None:
+    """`driver.get(url)` with the page load limited to the time left.
+
+    Raises DeadlineExceeded when the budget is already gone; a load that
+    runs out of time raises Selenium's TimeoutException.
+    """
+    limit = DEFAULT_PAGE_LOAD_TIMEOUT
+    if deadline is not None:
+        deadline.check()
+        limit = deadline.clamp(limit)
+    driver.set_page_load_timeout(limit)
+    driver.get(url)
+
+
+def _quit_driver(driver) -> None:
+    try:
+        driver.quit()
+    except Exception:
+        logger.debug("Exception while quitting driver")
+
+
+def _reset_driver(driver) -> bool:
+    """Bring a used driver back to a clean state for the next search.
+
+    Closes extra tabs, clears cookies and navigates to a blank page. Returns
+    False when the driver doesn't respond (crashed browser / dead session).
+    """
+    try:
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+        driver.set_page_load_timeout(DEFAULT_PAGE_LOAD_TIMEOUT)
+        driver.get("about:blank")
+        return True
+    except Exception as e:
+        logger.debug("Driver reset failed, recycling it: %s", e)
+        return False
+
+
+# One warm driver per Selenium site (Flipkart, JioMart, Snapdeal), so a
+# concurrent search never has a site waiting for another site's browser.
+DEFAULT_POOL_SIZE = 3
+
+
+class DriverPool:
+    """A bounded pool of reusable Chrome drivers.
+
+    Starting Chrome (and uc's driver patching) costs seconds per search, so
+    drivers are kept warm between scraper calls. Use `checkout()`/`checkin()`
+    or the `driver()` context manager. At most `max_size` drivers exist at
+    once; `checkout` blocks until one is free. A driver is reset (tabs,
+    cookies) on checkin and recycled after `max_uses` searches or when it no
+    longer responds.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_POOL_SIZE,
+        headless: bool = True,
+        max_uses: int = 20,
+        factory: Optional[Callable] = None,
+        lean: bool = True,
+    ):
+        self.max_size = max(1, max_size)
+        self._base_size = self.max_size
+        self._reservations: Dict[int, int] = {}
+        self._next_token = 0
+        self.headless = headless
+        self.lean = lean
+        self.max_uses = max_uses
+        self._factory = factory or (lambda: make_driver(headless=headless, lean=lean))
+        self._idle: List = []
+        self._uses: Dict[int, int] = {}
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def warm(self, count: Optional[int] = None) -> None:
+        """Pre-launch idle drivers until `count` exist (default: fill the pool)."""
+        target = self.max_size if count is None else min(count, self.max_size)
+        with self._cond:
+            missing = max(0, target - self._created)
+            self._created += missing
+        started = 0
+        try:
+            for _ in range(missing):
+                started += 1
+                driver = self._create()
+                with self._cond:
+                    if not self._closed:
+                        self._idle.append(driver)
+                        self._cond.notify()
+                        continue
+                    self._uses.pop(id(driver), None)
+                    self._created -= 1
+                _quit_driver(driver)
+        finally:
+            # `_create` gives back its own slot on failure; the slots of the
+            # drivers never attempted are given back here.
+            with self._cond:
+                self._created -= missing - started
+                self._cond.notify_all()
+
+    def checkout(self, timeout: Optional[float] = None):
+        """Borrow a driver, creating one if the pool isn't full yet.
+
+        Raises TimeoutError if no driver becomes free within `timeout` seconds.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("DriverPool is shut down")
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.max_size:
+                    self._created += 1
+                    break
+                if not self._cond.wait(timeout):
+                    raise TimeoutError("No Chrome driver became available in the pool")
+        # Start Chrome outside the lock so other borrowers aren't blocked.
+        return self._create()
+
+    def _create(self):
+        """Start a driver for a slot already reserved in `_created`."""
+        try:
+            driver = self._factory()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def checkin(self, driver, broken: bool = False) -> None:
+        """Return a driver to the pool; broken or worn-out drivers are quit."""
+        with self._cond:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            # also drop drivers left over from a released reservation
+            recycle = broken or self._closed or uses >= self.max_uses or self._created > self.max_size
+
+        if not recycle and not _reset_driver(driver):
+            recycle = True
+
+        with self._cond:
+            if recycle:
+                self._uses.pop(id(driver), None)
+                self._created -= 1
+            else:
+                self._idle.append(driver)
+            self._cond.notify()
+        if recycle:
+            logger.debug("Recycling Chrome driver after %d uses (broken=%s)", uses, broken)
+            _quit_driver(driver)
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """Context manager that checks a driver out and always checks it in."""
+        d = self.checkout(timeout=timeout)
+        try:
+            yield d
+        finally:
+            self.checkin(d)
+
+    def reserve(self, size: int) -> int:
+        """Raise `max_size` to at least `size` until `release(token)` is called.
+
+        Used by batch runs so a large batch doesn't leave a long-running
+        process with that many idle browsers. Returns the token.
+        """
+        with self._cond:
+            token = self._next_token
+            self._next_token += 1
+            self._reservations[token] = size
+            self._resize()
+            return token
+
+    def release(self, token: int) -> None:
+        """Drop a reservation; idle drivers above the remaining size are quit."""
+        with self._cond:
+            self._reservations.pop(token, None)
+            doomed = self._resize()
+        for d in doomed:
+            _quit_driver(d)
+
+    def _resize(self) -> List:
+        # Caller holds the lock. Returns idle drivers to quit (outside it);
+        # busy drivers above the new size are recycled on checkin.
+        self.max_size = max([self._base_size, *self._reservations.values()])
+        doomed = []
+        while self._created > self.max_size and self._idle:
+            d = self._idle.pop(0)
+            self._uses.pop(id(d), None)
+            self._created -= 1
+            doomed.append(d)
+        self._cond.notify_all()
+        return doomed
+
+    def close(self) -> None:
+        """Quit all idle drivers; drivers still checked out are quit on checkin."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            for d in idle:
+                self._uses.pop(id(d), None)
+            self._cond.notify_all()
+        for d in idle:
+            _quit_driver(d)
+
+
+_POOLS: Dict[Tuple[bool, bool], DriverPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _warm_in_background(pool: DriverPool) -> None:
+    def run():
+        try:
+            pool.warm()
+        except Exception as e:
+            logger.warning("Could not pre-launch Chrome drivers: %s", e)
+
+    threading.Thread(target=run, name="driver-pool-warm", daemon=True).start()
+
+
+def get_driver_pool(headless: bool = True, lean: Optional[bool] = None) -> DriverPool:
+    """Return the process-wide driver pool for the given driver settings.
+
+    Size and recycling are controlled with PRODUCT_AGG_DRIVER_POOL_SIZE
+    (default DEFAULT_POOL_SIZE) and PRODUCT_AGG_DRIVER_MAX_USES (default 20). Pooled drivers
+    use the lean profile (see `make_driver`) unless `lean=False` is passed
+    or PRODUCT_AGG_LEAN_DRIVER=0 is set. With PRODUCT_AGG_DRIVER_PREWARM=1
+    a new pool starts launching its drivers in the background right away.
+    """
+    if lean is None:
+        lean = os.getenv("PRODUCT_AGG_LEAN_DRIVER", "1") != "0"
+    key = (headless, lean)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = DriverPool(
+                max_size=int(os.getenv("PRODUCT_AGG_DRIVER_POOL_SIZE", str(DEFAULT_POOL_SIZE))),
+                headless=headless,
+                max_uses=int(os.getenv("PRODUCT_AGG_DRIVER_MAX_USES", "20")),
+                lean=lean,
+            )
+            _POOLS[key] = pool
+            if os.getenv("PRODUCT_AGG_DRIVER_PREWARM", "0") == "1":
+                _warm_in_background(pool)
+        return pool
+
+
+def shutdown_driver_pools() -> None:
+    """Quit every pooled driver. Registered to run at interpreter exit."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(shutdown_driver_pools)
+
+
+# Upper bound (seconds) for scroll_until_stable when a scraper doesn't pass one.
+SCROLL_DEADLINE = float(os.getenv("PRODUCT_AGG_SCROLL_DEADLINE", "8"))
+
+# Scrolls to the bottom and returns how many nodes match the XPath, in a
+# single WebDriver round trip.
+_SCROLL_AND_COUNT_JS = """
+var count = document.evaluate('count(' + arguments[0] + ')', document, null,
+                              XPathResult.NUMBER_TYPE, null).numberValue;
+if (!arguments[1] || count < arguments[1])
+    window.scrollTo(0, document.body ? document.body.scrollHeight : 0);
+return count;
+"""
+
+
+def scroll_until_stable(
+    driver,
+    card_xpath: str,
+    max_results: Optional[int] = None,
+    deadline: Optional[float] = None,
+    poll: float = 0.25,
+    settle_polls: int = 3,
+    budget: Optional[Deadline] = None,
+) -> int:
+    """Scroll the results page until it is ready, instead of sleeping.
+
+    Keeps scrolling to the bottom and counting nodes matching `card_xpath`
+    until either `max_results` cards are present (a page that already has
+    them is not scrolled at all), the count has stopped
+    growing for `settle_polls` consecutive polls (including a page that stays
+    at zero cards, e.g. no results or a bot wall), or `deadline` seconds have
+    passed. `budget` is the search-wide
+    Deadline: the loop also stops as soon as it expires or is cancelled.
+    Returns the last card count.
+    """
+    deadline = SCROLL_DEADLINE if deadline is None else deadline
+    if budget is not None:
+        deadline = budget.clamp(deadline)
+    end = time.monotonic() + deadline
+    last = -1
+    stable = 0
+    count = 0
+    while True:
+        try:
+            count = int(driver.execute_script(_SCROLL_AND_COUNT_JS, card_xpath, max_results or 0) or 0)
+        except Exception as e:
+            logger.debug("Scroll/count script failed: %s", e)
+        if max_results and count >= max_results:
+            break
+        if count == last:
+            stable += 1
+            if stable >= settle_polls:
+                break
+        else:
+            stable = 0
+        last = count
+        if time.monotonic() >= end or (budget is not None and budget.expired()):
+            logger.debug("Scroll deadline reached with %d cards", count)
+            break
+        time.sleep(poll)
+    return count
+
+
+# Evaluates the card XPath and, for every card, the first matching node of
+# each field's relative XPaths; returns all rows as one JSON string so a whole
+# page is extracted in a single WebDriver round trip. Attributes are read as
+# DOM properties when available (absolute href/src, like get_attribute).
+_EXTRACT_CARDS_JS = """
+var cardXPath = arguments[0], fields = arguments[1], limit = arguments[2],
+    required = arguments[3] || [], unique = arguments[4];
+function first(ctx, xpaths) {
+    if (!xpaths.length) return ctx;
+    for (var k = 0; k < xpaths.length; k++) {
+        try {
+            var n = document.evaluate(xpaths[k], ctx, null,
+                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+            if (n) return n;
+        } catch (e) {}
+    }
+    return null;
+}
+var cards = document.evaluate(cardXPath, document, null,
+    XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+var out = [], seen = {};
+for (var i = 0; i < cards.snapshotLength && !(limit && out.length >= limit); i++) {
+    var card = cards.snapshotItem(i), row = {};
+    for (var f = 0; f < fields.length; f++) {
+        var spec = fields[f], node = first(card, spec.xpaths), value = null;
+        if (node) {
+            if (!spec.attr) value = node.innerText || node.textContent || '';
+            else if (spec.attr in node) value = node[spec.attr];
+            else value = node.getAttribute(spec.attr);
+        }
+        row[spec.name] = value;
+    }
+    var ok = true;
+    for (var r = 0; r < required.length; r++)
+        if (!row[required[r]] || !String(row[required[r]]).trim()) ok = false;
+    if (!ok) continue;
+    if (unique) {
+        var key = String(row[unique] || '').trim();
+        if (seen.hasOwnProperty(key)) continue;
+        seen[key] = true;
+    }
+    out.push(row);
+}
+return JSON.stringify(out);
+"""
+
+
+def card_field(name: str, xpaths: Optional[List[str]] = None, attr: Optional[str] = None) -> Dict:
+    """Describe one value to pull from each card for `extract_cards`.
+
+    `xpaths` are tried in order relative to the card (empty = the card node
+    itself); `attr` selects an attribute, otherwise the node's text is used.
+    """
+    return {"name": name, "xpaths": list(xpaths or []), "attr": attr}
+
+
+def extract_cards(
+    driver,
+    card_xpath: str,
+    fields: List[Dict],
+    limit: Optional[int] = None,
+    required: Optional[List[str]] = None,
+    unique: Optional[str] = None,
+) -> List[Dict]:
+    """Extract all product cards on the page with one `execute_script` call.
+
+    Returns one dict per card keyed by field name (None when a field's node
+    wasn't found). Replaces per-card find_element/.text/get_attribute calls,
+    each of which is a separate WebDriver HTTP round trip.
+
+    Cards missing any `required` field, or repeating an earlier card's
+    `unique` field, are skipped in the browser; extraction stops once
+    `limit` cards have been kept, so small searches don't walk the page.
+    """
+    raw = driver.execute_script(_EXTRACT_CARDS_JS, card_xpath, fields, limit or 0, list(required or []), unique)
+    rows = json.loads(raw) if isinstance(raw, str) else raw
+    return rows or []
+
+
+def parse_price(text: Optional[str], strip=("₹",)) -> Optional[float]:
+    """Parse the leading number from a price label such as '₹1,299 ₹1,999'."""
+    if not text:
+        return None
+    txt = text.replace(",", "")
+    for token in strip:
+        txt = txt.replace(token, "")
+    parts = txt.strip().split()
+    if not parts:
+        return None
+    price_txt = parts[0]
+    if price_txt.replace(".", "", 1).isdigit():
+        return float(price_txt)
+    return None
+
+
+def page_looks_blocked(driver) -> bool:
+    """True when the current page is a captcha / bot wall rather than results."""
+    try:
+        title = driver.title or ""
+        body = driver.execute_script(
+            "return document.body ? document.body.innerText.slice(0, 5000) : '';"
+        ) or ""
+    except Exception:
+        return False
+    return looks_blocked(text=title + "\n" + body)
 
 
 def retry_call(func: Callable, retries: int = 2, delay: float = 1.0, *args, **kwargs):
@@ -0,0 +1,215 @@
+"""On-disk cache for HTTP responses fetched by the requests-based scrapers.
+
+Entries live in a SQLite file (default `data/http_cache.db`) keyed on the
+URL plus the request headers that change what a site sends back. Bodies are
+stored zlib-compressed. A fresh entry (younger than the TTL) is served
+without touching the network. A stale one is revalidated with
+If-None-Match / If-Modified-Since when the site sent an ETag or
+Last-Modified, so an unchanged page costs a 304 instead of a full download.
+The file is kept under a byte budget by evicting least recently used
+entries.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+# Request headers that change the response body; everything else (keep-alive,
+# conditional headers, ...) is left out of the key.
+VARY_HEADERS = ("Accept", "Accept-Language", "User-Agent", "Cookie")
+
+# Response headers that describe the transfer, not the stored body.
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# Headers a 304 may update on the stored response.
+_REVALIDATION_HEADERS = {"etag", "last-modified", "cache-control", "expires"}
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "http_cache.db")
+
+
+def response_key(url: str, headers: Optional[Dict[str, str]] = None) -> str:
+    """Cache key for a GET of `url` sent with `headers`."""
+    lowered = {k.lower(): v for k, v in (headers or {}).items()}
+    varying = [(h.lower(), lowered.get(h.lower(), "")) for h in VARY_HEADERS]
+    return hashlib.sha256(json.dumps([url, varying]).encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """What the cache stores for one response."""
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes, encoding: Optional[str],
+                 created_at: float):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding
+        self.created_at = created_at
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self._header("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self._header("last-modified")
+
+    def _header(self, name: str) -> Optional[str]:
+        for k, v in self.headers.items():
+            if k.lower() == name:
+                return v
+        return None
+
+
+class HttpCache:
+    """SQLite-backed response cache with TTL, revalidators and an LRU byte cap.
+
+    `get` returns (entry, fresh) so the caller can serve fresh entries
+    directly and revalidate stale ones; `refresh` restarts an entry's TTL
+    after a 304. Hit/miss/revalidation counters are available from `stats()`.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = 600.0, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _init_db(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers_json TEXT,
+                encoding TEXT,
+                body BLOB,
+                size INTEGER,
+                created_at REAL,
+                accessed_at REAL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_accessed ON http_cache (accessed_at)")
+        conn.commit()
+        conn.close()
+
+    def get(self, key: str) -> Tuple[Optional[CachedResponse], bool]:
+        """Return (entry, is_fresh); (None, False) when nothing is cached."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT url, status, headers_json, encoding, body, created_at FROM http_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE http_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+            conn.close()
+            if row is None:
+                self._stats["misses"] += 1
+                return None, False
+            url, status, headers_json, encoding, body, created_at = row
+            entry = CachedResponse(url, status, json.loads(headers_json), zlib.decompress(body), encoding, created_at)
+            fresh = created_at + self.ttl > now
+            if fresh:
+                self._stats["hits"] += 1
+            return entry, fresh
+
+    def is_fresh(self, key: str) -> bool:
+        """True when `get(key)` would be served without a request."""
+        conn = self._connect()
+        row = conn.execute("SELECT created_at FROM http_cache WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return row is not None and row[0] + self.ttl > time.time()
+
+    def store(self, key: str, url: str, status: int, headers: Dict[str, str], body: bytes,
+              encoding: Optional[str] = None) -> None:
+        headers = {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+        blob = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(key, url, status, headers_json, encoding, body, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(headers), encoding, blob, len(blob), now, now),
+            )
+            self._stats["stores"] += 1
+            self._evict(conn)
+            conn.commit()
+            conn.close()
+
+    def refresh(self, key: str, headers: Optional[Dict[str, str]] = None) -> None:
+        """Restart an entry's TTL after a 304, merging updated validators."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            updated = {k: v for k, v in (headers or {}).items() if k.lower() in _REVALIDATION_HEADERS}
+            if updated:
+                row = conn.execute("SELECT headers_json FROM http_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    replaced = {k.lower() for k in updated}
+                    merged = {k: v for k, v in json.loads(row[0]).items() if k.lower() not in replaced}
+                    merged.update(updated)
+                    conn.execute("UPDATE http_cache SET headers_json = ? WHERE key = ?", (json.dumps(merged), key))
+            conn.execute("UPDATE http_cache SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            conn.commit()
+            conn.close()
+            self._stats["revalidated"] += 1
+
+    def discard(self, key: str) -> None:
+        """Drop one entry (e.g. a captcha page that came back as 200)."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+            conn.commit()
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Caller holds the lock. Drop least recently used entries until the
+        # compressed bodies fit in max_bytes.
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM http_cache ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM http_cache WHERE key = ?", doomed)
+        self._stats["evictions"] += len(doomed)
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM http_cache")
+            conn.commit()
+            conn.close()
+            for k in self._stats:
+                self._stats[k] = 0
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache").fetchone()
+        conn.close()
+        with self._lock:
+            out = dict(self._stats)
+        out["entries"] = entries
+        out["bytes"] = size
+        return out
@@ -0,0 +1,178 @@
+"""Shared HTTP client for the requests-based scrapers.
+
+All scrapers go through one `requests.Session` so repeated and concurrent
+searches reuse warm keep-alive connections (TCP + TLS) instead of opening a
+new one per call. Connection pools are kept per host and sized with
+PRODUCT_AGG_HTTP_POOL_SIZE (default 16 connections per host).
+
+With PRODUCT_AGG_HTTP_CACHE=1, GETs also go through an on-disk response
+cache (`scrapers.http_cache`): fresh pages are served from disk and stale
+ones are revalidated with ETag/Last-Modified. PRODUCT_AGG_HTTP_CACHE_DB,
+PRODUCT_AGG_HTTP_CACHE_TTL (seconds, default 600) and
+PRODUCT_AGG_HTTP_CACHE_MB (default 64) tune it.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from scrapers.http_cache import DEFAULT_PATH, CachedResponse, HttpCache, response_key
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = 10
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/128.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_cache: Optional[HttpCache] = None
+_cache_configured = False
+_cache_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    pool_size = int(os.getenv("PRODUCT_AGG_HTTP_POOL_SIZE", "16"))
+    # Retries stay with the callers (they know what is worth retrying), so
+    # the adapter itself doesn't retry.
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def configure_http_cache(
+    enabled: bool = True,
+    path: str = DEFAULT_PATH,
+    ttl: float = 600.0,
+    max_bytes: int = 64 * 1024 * 1024,
+) -> Optional[HttpCache]:
+    """Turn the response cache on (with these settings) or off."""
+    global _cache, _cache_configured
+    with _cache_lock:
+        _cache = HttpCache(path, ttl=ttl, max_bytes=max_bytes) if enabled else None
+        _cache_configured = True
+        return _cache
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    """Return the response cache, or None when it is disabled (the default)."""
+    if not _cache_configured:
+        configure_http_cache(
+            enabled=os.getenv("PRODUCT_AGG_HTTP_CACHE", "0") == "1",
+            path=os.getenv("PRODUCT_AGG_HTTP_CACHE_DB") or DEFAULT_PATH,
+            ttl=float(os.getenv("PRODUCT_AGG_HTTP_CACHE_TTL", "600")),
+            max_bytes=int(float(os.getenv("PRODUCT_AGG_HTTP_CACHE_MB", "64")) * 1024 * 1024),
+        )
+    return _cache
+
+
+def _cache_key(url: str, headers: Optional[Dict[str, str]]) -> str:
+    return response_key(url, {**get_session().headers, **(headers or {})})
+
+
+def _from_cache(entry: CachedResponse) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = entry.status
+    resp._content = entry.body
+    resp.headers = CaseInsensitiveDict(entry.headers)
+    resp.url = entry.url
+    resp.encoding = entry.encoding
+    resp.from_cache = True
+    return resp
+
+
+def is_cached(url: str, headers: Optional[Dict[str, str]] = None) -> bool:
+    """True when `http_get(url)` would be answered from the cache without a request.
+
+    Callers use this to skip rate-limit waits for pages they already have.
+    """
+    cache = get_http_cache()
+    return cache is not None and cache.is_fresh(_cache_key(url, headers))
+
+
+def forget_cached(url: str, headers: Optional[Dict[str, str]] = None) -> None:
+    """Drop a cached page, e.g. a bot-check page that came back as 200."""
+    cache = get_http_cache()
+    if cache is not None:
+        cache.discard(_cache_key(url, headers))
+
+
+def http_get(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    **kwargs,
+) -> requests.Response:
+    """GET `url` over the shared session.
+
+    `headers` are merged over DEFAULT_HEADERS; `timeout` defaults to
+    DEFAULT_TIMEOUT seconds. Extra keyword arguments go to `Session.get`.
+
+    When the response cache is enabled (and `use_cache` is true and no
+    extra arguments are given) a fresh cached page is returned without a
+    request (its `from_cache` attribute is True); a stale one is sent with
+    If-None-Match/If-Modified-Since and reused on 304. 200 responses are
+    stored unless marked `Cache-Control: no-store`.
+    """
+    session = get_session()
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    cache = get_http_cache() if use_cache and not kwargs else None
+    if cache is None:
+        return session.get(url, headers=headers, timeout=timeout, **kwargs)
+
+    key = _cache_key(url, headers)
+    entry, fresh = cache.get(key)
+    if entry is not None and fresh:
+        return _from_cache(entry)
+
+    send_headers = dict(headers or {})
+    if entry is not None:
+        if entry.etag:
+            send_headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            send_headers["If-Modified-Since"] = entry.last_modified
+    resp = session.get(url, headers=send_headers or None, timeout=timeout)
+    if resp.status_code == 304 and entry is not None:
+        cache.refresh(key, dict(resp.headers))
+        return _from_cache(entry)
+    if resp.status_code == 200 and "no-store" not in resp.headers.get("Cache-Control", "").lower():
+        cache.store(key, url, resp.status_code, dict(resp.headers), resp.content, resp.encoding)
+    return resp
+
+
+def close_session() -> None:
+    """Close pooled connections; the next call starts a fresh session."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
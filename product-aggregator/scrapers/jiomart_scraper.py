@@ -1,91 +1,267 @@
+from urllib.parse import quote
+
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 
-from scrapers.base_scraper import make_driver
+from scrapers.base_scraper import (
+    card_field,
+    extract_cards,
+    get_driver_pool,
+    load_page,
+    page_looks_blocked,
+    parse_price,
+    scroll_until_stable,
+    wait_budget,
+)
+from scrapers.rate_limit import get_rate_limiter
+from scrapers.static_html import (
+    HTTP_FIRST,
+    collect_products,
+    enough_products,
+    extract_cards_html,
+    run_parse,
+    scrape_static,
+    tag_results,
+)
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Product page anchors; a card may link the product more than once.
+PRODUCT_XPATH = "//a[contains(@href, '/p/') or contains(@href, '/product/')]"
+
+# Results page for a query (query is a path segment); the homepage search
+# box is only a fallback.
+SEARCH_URL = "https://www.jiomart.com/search/{query}"
+
+# Relative links in server-rendered pages resolve against the site root.
+BASE_URL = "https://www.jiomart.com/"
+
+# Price label near a product anchor: inside the card details block, or
+# failing that anywhere three levels up.
+PRICE_XPATHS = [
+    "ancestor::div[contains(@class, 'plp-card-details')]//*[contains(text(),'₹') or contains(text(),'Rs')]",
+    "../../..//*[contains(text(),'₹') or contains(text(),'Rs')]",
+]
+
+BULK_FIELDS = [
+    card_field("title"),
+    card_field("link", attr="href"),
+    card_field("price", PRICE_XPATHS),
+    card_field("image", [".//img"], attr="src"),
+]
+
+# Cards without these are ads, placeholders or duplicate image links.
+REQUIRED_FIELDS = ["title", "link", "price"]
 
-def scrape_jiomart(product_name, max_results=15, headless: bool = True):
-    driver = make_driver(headless=headless)
+
+def _products_from_rows(rows, max_results):
+    """Validate and normalize extracted rows, stopping at `max_results`."""
     results = []
-    try:
-        driver.get("https://www.jiomart.com/")
+    used_titles = set()
+    for row in rows:
+        title = (row.get("title") or "").strip()
+        link = row.get("link")
+        if not title or title in used_titles or not link:
+            continue
+        used_titles.add(title)
 
-        # Search for product
-        search_box = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "autocomplete-0-input"))
-        )
-        search_box.clear()
-        search_box.send_keys(product_name)
-        search_box.send_keys(Keys.RETURN)
-        time.sleep(2)
-
-        # Scroll for AJAX content
-        for i in range(4):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-
-        # Find product blocks (each product link, usually /p/ or /product/)
-        blocks = driver.find_elements(By.XPATH, "//a[contains(@href, '/p/') or contains(@href, '/product/')]")
-        logger.debug("Found %d product links with XPath.", len(blocks))
-
-        used_titles = set()
-        for item in blocks:
+        price_val = parse_price(row.get("price"), strip=("₹", "Rs"))
+        if not price_val:
+            continue
+
+        results.append({
+            "title": title,
+            "price": price_val,
+            "link": link,
+            "image": row.get("image"),
+            "source": "JioMart"
+        })
+        if max_results and len(results) >= max_results:
+            break
+    return results
+
+
+def _extract_bulk(driver, max_results):
+    """Extract products from the live page with a single execute_script call.
+
+    Only the first `max_results` cards that have a title, link and price
+    are read; the rest of the page is scanned only if some of those turn
+    out to have unparseable prices.
+    """
+    return collect_products(
+        lambda limit: extract_cards(
+            driver, PRODUCT_XPATH, BULK_FIELDS, limit=limit, required=REQUIRED_FIELDS, unique="title"
+        ),
+        _products_from_rows,
+        max_results,
+    )
+
+
+def parse_jiomart(html, max_results=None):
+    """Parse a JioMart results page (server-rendered or `driver.page_source`).
+
+    Pure function of the HTML, so it can run on saved pages or in a worker
+    process. `max_results=None` returns every product on the page.
+    """
+    return collect_products(
+        lambda limit: extract_cards_html(
+            html, PRODUCT_XPATH, BULK_FIELDS, BASE_URL, limit=limit, required=REQUIRED_FIELDS, unique="title"
+        ),
+        _products_from_rows,
+        max_results,
+    )
+
+
+def _extract_webdriver(driver, max_results):
+    """Extract products with per-element WebDriver calls (slower fallback)."""
+    results = []
+    # Find product blocks (each product link, usually /p/ or /product/)
+    blocks = driver.find_elements(By.XPATH, PRODUCT_XPATH)
+    logger.debug("Found %d product links with XPath.", len(blocks))
+
+    used_titles = set()
+    for item in blocks:
+        try:
+            title = item.text.strip()
+            link = item.get_attribute("href")
+            if not title or title in used_titles or not link:
+                continue
+            used_titles.add(title)
+
+            # Find nearest price (looks for ₹, Rs)
+            price_val = None
+            price_tag = None
             try:
-                title = item.text.strip()
-                link = item.get_attribute("href")
-                if not title or title in used_titles or not link:
-                    continue
-                used_titles.add(title)
-
-                # Find nearest price (looks for ₹, Rs)
-                price_val = None
-                price_tag = None
-                try:
-                    price_tag = item.find_element(By.XPATH, "ancestor::div[contains(@class, 'plp-card-details')]//*[contains(text(),'₹') or contains(text(),'Rs')]")
-                except Exception:
-                    try:
-                        price_tag = item.find_element(By.XPATH, "../../..//*[contains(text(),'₹') or contains(text(),'Rs')]")
-                    except Exception:
-                        pass
-                if price_tag:
-                    price_txt = price_tag.text.replace(",", "").replace("₹", "").replace("Rs", "").strip().split()[0]
-                    if price_txt.replace('.', '', 1).isdigit():
-                        price_val = float(price_txt)
-                if not price_val:
-                    continue
-
-                # Get image
-                image = None
+                price_tag = item.find_element(By.XPATH, PRICE_XPATHS[0])
+            except Exception:
                 try:
-                    img_tag = item.find_element(By.XPATH, ".//img")
-                    image = img_tag.get_attribute("src")
+                    price_tag = item.find_element(By.XPATH, PRICE_XPATHS[1])
                 except Exception:
                     pass
+            if price_tag:
+                price_txt = price_tag.text.replace(",", "").replace("₹", "").replace("Rs", "").strip().split()[0]
+                if price_txt.replace('.', '', 1).isdigit():
+                    price_val = float(price_txt)
+            if not price_val:
+                continue
+
+            # Get image
+            image = None
+            try:
+                img_tag = item.find_element(By.XPATH, ".//img")
+                image = img_tag.get_attribute("src")
+            except Exception:
+                pass
+
+            results.append({
+                "title": title,
+                "price": price_val,
+                "link": link,
+                "image": image,
+                "source": "JioMart"
+            })
+            if len(results) >= max_results:
+                break
+        except Exception as e:
+            logger.debug("Skip product due to error: %s", e)
+    return results
+
+
+def _search_via_homepage(driver, product_name, timeout=10, deadline=None):
+    """Load the homepage and submit the query through the search box."""
+    get_rate_limiter("JioMart").acquire(deadline)
+    load_page(driver, "https://www.jiomart.com/", deadline)
+
+    # Search for product
+    search_box = WebDriverWait(driver, wait_budget(timeout, deadline)).until(
+        EC.presence_of_element_located((By.ID, "autocomplete-0-input"))
+    )
+    search_box.clear()
+    search_box.send_keys(product_name)
+    search_box.send_keys(Keys.RETURN)
+    # Wait for the results page to replace the page we searched from
+    try:
+        WebDriverWait(driver, wait_budget(timeout, deadline)).until(EC.staleness_of(search_box))
+    except Exception:
+        pass
+
+
+def _open_results(driver, product_name, timeout=10, deadline=None):
+    """Navigate straight to the search results page.
+
+    Falls back to typing into the homepage search box when the direct URL
+    doesn't show any product cards (e.g. the site changed its URL scheme).
+    Returns True when the site served a bot-check page (already penalized).
+    """
+    limiter = get_rate_limiter("JioMart")
+    limiter.acquire(deadline)
+    try:
+        load_page(driver, SEARCH_URL.format(query=quote(product_name, safe="")), deadline)
+        WebDriverWait(driver, wait_budget(timeout, deadline)).until(
+            EC.presence_of_element_located((By.XPATH, PRODUCT_XPATH))
+        )
+        return False
+    except Exception as e:
+        if page_looks_blocked(driver):
+            # The homepage would get the same bot wall; back off instead.
+            limiter.penalize("JioMart served a bot-check page")
+            return True
+        logger.info("[JioMart] Direct search URL failed (%s); using the search box.", e)
+    if deadline is not None:
+        deadline.check()
+    _search_via_homepage(driver, product_name, timeout, deadline)
+    return False
+
+
+def scrape_jiomart(product_name, max_results=15, headless: bool = True, bulk_extract: bool = True,
+                   timeout: float = 10, deadline=None, http_first=None,
+                   parse_executor=None):
+    # Server-rendered results over plain HTTP are far cheaper than Chrome.
+    if HTTP_FIRST if http_first is None else http_first:
+        url = SEARCH_URL.format(query=quote(product_name, safe=""))
+        results = scrape_static("JioMart", url, parse_jiomart, max_results, timeout, deadline, parse_executor)
+        if enough_products(len(results), max_results) or (deadline is not None and deadline.expired()):
+            logger.info("[JioMart] Parsed %d unique products over HTTP.", len(results))
+            return tag_results(results, "http")
+        logger.info("[JioMart] HTTP path found %d products; using Chrome.", len(results))
+
+    # Borrow a warm driver from the shared pool instead of starting Chrome.
+    pool = get_driver_pool(headless=headless)
+    driver = pool.checkout(timeout=deadline.remaining() if deadline is not None else None)
+    results = []
+    try:
+        if _open_results(driver, product_name, timeout, deadline):
+            # Nothing to scroll or extract on a bot wall, and it's been
+            # penalized once already.
+            return tag_results(results, "selenium")
+
+        # Scroll until the product list stops growing (for AJAX)
+        scroll_until_stable(driver, PRODUCT_XPATH, max_results=max_results * 2, budget=deadline)
 
-                results.append({
-                    "title": title,
-                    "price": price_val,
-                    "link": link,
-                    "image": image,
-                    "source": "JioMart"
-                })
-                if len(results) >= max_results:
-                    break
+        if bulk_extract:
+            try:
+                results = _extract_bulk(driver, max_results)
             except Exception as e:
-                logger.debug("Skip product due to error: %s", e)
+                logger.warning("[JioMart] Bulk extraction failed, parsing the page source: %s", e)
+                try:
+                    results = run_parse(parse_jiomart, driver.page_source, max_results, parse_executor)
+                except Exception as e:
+                    logger.warning("[JioMart] Page source parse failed, using per-element extraction: %s", e)
+                    results = _extract_webdriver(driver, max_results)
+        else:
+            results = _extract_webdriver(driver, max_results)
         logger.info("[JioMart] Parsed %d unique products.", len(results))
+        limiter = get_rate_limiter("JioMart")
+        if results:
+            limiter.reward()
+        elif page_looks_blocked(driver):
+            limiter.penalize("JioMart served a bot-check page")
     finally:
-        try:
-            driver.quit()
-        except Exception:
-            logger.debug("Exception while quitting driver")
-    return results
+        pool.checkin(driver)
+    return tag_results(results, "selenium")
 
 # Example:
 # print(scrape_jiomart("laptop"))
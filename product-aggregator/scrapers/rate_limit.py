@@ -0,0 +1,162 @@
+"""Per-source rate limiting and politeness for the scrapers.
+
+Every scraper calls `get_rate_limiter(<source>).acquire()` before it hits the
+site (HTTP request or page load), so parallel searches, batch runs and
+retries all share one budget per domain. Limiters slow down automatically
+when a site answers 429/503 or serves a captcha page (`penalize`) and speed
+back up as requests succeed again (`reward`).
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Page text that means we got a bot wall instead of results.
+BLOCK_MARKERS = (
+    "captcha",
+    "robot check",
+    "are you a human",
+    "unusual traffic",
+    "access denied",
+    "request blocked",
+    "api-services-support@amazon.com",
+)
+
+
+def looks_blocked(status_code: Optional[int] = None, text: Optional[str] = None) -> bool:
+    """True for rate-limit/unavailable responses or captcha-style pages."""
+    if status_code in (429, 503):
+        return True
+    if text:
+        lowered = text[:20000].lower()
+        return any(marker in lowered for marker in BLOCK_MARKERS)
+    return False
+
+
+class RateLimiter:
+    """Token bucket with minimum spacing, jitter and adaptive backoff.
+
+    - `rate`: sustained requests per second; `burst`: bucket size.
+    - `min_interval`: minimum seconds between two requests.
+    - `jitter`: up to this many random seconds added to each wait.
+    - `penalize()` multiplies spacing and divides the rate by a backoff
+      factor (doubling, capped at `max_backoff`) and imposes a cool-down;
+      `reward()` decays the factor back towards 1.
+
+    `acquire` reserves a slot under the lock and sleeps outside it, so
+    concurrent callers queue up fairly without holding each other up.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 2,
+        min_interval: float = 0.0,
+        jitter: float = 0.0,
+        max_backoff: float = 16.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.backoff = 1.0
+        self.penalties = 0  # bot walls / 429s seen; the circuit breaker reads this
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._next_slot = 0.0
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, deadline: Optional[Deadline] = None) -> Optional[float]:
+        """Reserve the next request slot; returns seconds to wait for it.
+
+        Returns None, reserving nothing, if the slot would come up after
+        `deadline`.
+        """
+        with self._lock:
+            now = self._clock()
+            rate = self.rate / self.backoff
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            # Tokens may go negative: that's the debt later callers wait off.
+            tokens = self._tokens - 1
+            start = now + (-tokens / rate if tokens < 0 else 0.0)
+            start = max(start, self._next_slot, self._cooldown_until)
+            if self.jitter:
+                start += random.uniform(0, self.jitter)
+            if deadline is not None and deadline.clamp(start - now) < start - now:
+                return None
+            self._tokens = tokens
+            self._next_slot = start + self.min_interval * self.backoff
+            return start - now
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> float:
+        """Block until the caller may send a request; returns seconds waited.
+
+        Raises DeadlineExceeded straight away, without taking a slot, when
+        the slot would only come up after `deadline`.
+        """
+        wait = self._reserve(deadline)
+        if wait is None:
+            raise DeadlineExceeded("rate limit slot is past the search deadline")
+        if wait > 0:
+            self._sleep(wait)
+        return max(0.0, wait)
+
+    def penalize(self, reason: str = "") -> None:
+        """Back off after a 429/503/captcha: slower rate plus a cool-down."""
+        with self._lock:
+            self.penalties += 1
+            self.backoff = min(self.max_backoff, self.backoff * 2)
+            base = max(self.min_interval, 1.0 / self.rate)
+            self._cooldown_until = max(self._cooldown_until, self._clock() + base * self.backoff)
+            backoff = self.backoff
+        logger.warning("Rate limiter backing off (x%.0f)%s", backoff, f": {reason}" if reason else "")
+
+    def reward(self) -> None:
+        """Record a successful request; gradually undo earlier backoff."""
+        with self._lock:
+            self.backoff = max(1.0, self.backoff * 0.75)
+
+
+# Conservative defaults per source; Selenium sites load a whole page (plus
+# its XHRs) per request, so they get a lower rate and wider spacing.
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    "Amazon": {"rate": 1.0, "burst": 3, "min_interval": 0.3, "jitter": 0.3},
+    "Flipkart": {"rate": 0.5, "burst": 2, "min_interval": 1.0, "jitter": 0.5},
+    "JioMart": {"rate": 0.5, "burst": 2, "min_interval": 1.0, "jitter": 0.5},
+    "Snapdeal": {"rate": 0.5, "burst": 2, "min_interval": 1.0, "jitter": 0.5},
+}
+
+_LIMITERS: Dict[str, RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(source: str) -> RateLimiter:
+    """Return the process-wide limiter for `source`, creating it on first use."""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(source)
+        if limiter is None:
+            limiter = RateLimiter(**DEFAULT_LIMITS.get(source, {"rate": 1.0, "burst": 2}))
+            _LIMITERS[source] = limiter
+        return limiter
+
+
+def configure_rate_limiter(source: str, **kwargs) -> RateLimiter:
+    """Replace the limiter for `source` (e.g. rate=2, burst=4, jitter=0)."""
+    params = dict(DEFAULT_LIMITS.get(source, {"rate": 1.0, "burst": 2}))
+    params.update(kwargs)
+    limiter = RateLimiter(**params)
+    with _LIMITERS_LOCK:
+        _LIMITERS[source] = limiter
+    return limiter
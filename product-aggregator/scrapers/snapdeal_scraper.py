@@ -1,95 +1,267 @@
+from urllib.parse import quote_plus
+
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 
-from scrapers.base_scraper import make_driver
+from scrapers.base_scraper import (
+    card_field,
+    extract_cards,
+    get_driver_pool,
+    load_page,
+    page_looks_blocked,
+    parse_price,
+    scroll_until_stable,
+    wait_budget,
+)
+from scrapers.rate_limit import get_rate_limiter
+from scrapers.static_html import (
+    HTTP_FIRST,
+    collect_products,
+    enough_products,
+    extract_cards_html,
+    run_parse,
+    scrape_static,
+    tag_results,
+)
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# One listing div per product card.
+PRODUCT_XPATH = "//div[contains(@class, 'product-tuple-listing')]"
+
+# Results page for a query; the homepage search box is only a fallback.
+SEARCH_URL = "https://www.snapdeal.com/search?keyword={query}"
+
+# Relative links in server-rendered pages resolve against the site root.
+BASE_URL = "https://www.snapdeal.com/"
+
+# By.CLASS_NAME equivalent for XPath: match a whole class token.
+_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' %s ')"
+
+BULK_FIELDS = [
+    card_field("title", [".//*[%s]" % (_CLASS % "product-title"), ".//*[%s]" % (_CLASS % "product-desc-rating")]),
+    card_field("link", [".//a"], attr="href"),
+    card_field("price", [".//*[%s]" % (_CLASS % "product-price")]),
+    card_field("image", [".//img"], attr="src"),
+    # Sometimes snapdeal uses data-src for lazy load
+    card_field("image_lazy", [".//img"], attr="data-src"),
+]
+
+# Cards without these are ads, placeholders or duplicate image links.
+REQUIRED_FIELDS = ["title", "link", "price"]
+
 
-def scrape_snapdeal(product_name, max_results=15, headless: bool = True):
-    driver = make_driver(headless=headless)
+def _products_from_rows(rows, max_results):
+    """Validate and normalize extracted rows, stopping at `max_results`."""
     results = []
-    try:
-        driver.get("https://www.snapdeal.com/")
-        # Search for product
-        search_box = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "inputValEnter"))
-        )
-        search_box.clear()
-        search_box.send_keys(product_name)
-        search_box.send_keys(Keys.RETURN)
-        time.sleep(2)
-        for i in range(4):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-        time.sleep(2) # let images load
-
-        # Product cards: look for listing divs with product links (/product/)
-        blocks = driver.find_elements(By.XPATH, "//div[contains(@class, 'product-tuple-listing')]")
-        logger.debug("Found %d product blocks.", len(blocks))
-
-        for block in blocks:
+    for row in rows:
+        title = (row.get("title") or "").strip()
+        link = row.get("link")
+        price_val = parse_price(row.get("price"), strip=("Rs.", "₹"))
+        if not (title and link and price_val):
+            continue
+        image = row.get("image")
+        if (not image or image.strip() == "" or image.startswith("data:")):
+            image = row.get("image_lazy")
+
+        results.append({
+            "title": title,
+            "price": price_val,
+            "link": link,
+            "image": image,
+            "source": "Snapdeal"
+        })
+        if max_results and len(results) >= max_results:
+            break
+    return results
+
+
+def _extract_bulk(driver, max_results):
+    """Extract products from the live page with a single execute_script call.
+
+    Only the first `max_results` cards that have a title, link and price
+    are read; the rest of the page is scanned only if some of those turn
+    out to have unparseable prices.
+    """
+    return collect_products(
+        lambda limit: extract_cards(
+            driver, PRODUCT_XPATH, BULK_FIELDS, limit=limit, required=REQUIRED_FIELDS
+        ),
+        _products_from_rows,
+        max_results,
+    )
+
+
+def parse_snapdeal(html, max_results=None):
+    """Parse a Snapdeal results page (server-rendered or `driver.page_source`).
+
+    Pure function of the HTML, so it can run on saved pages or in a worker
+    process. `max_results=None` returns every product on the page.
+    """
+    return collect_products(
+        lambda limit: extract_cards_html(
+            html, PRODUCT_XPATH, BULK_FIELDS, BASE_URL, limit=limit, required=REQUIRED_FIELDS
+        ),
+        _products_from_rows,
+        max_results,
+    )
+
+
+def _extract_webdriver(driver, max_results):
+    """Extract products with per-element WebDriver calls (slower fallback)."""
+    results = []
+    # Product cards: look for listing divs with product links (/product/)
+    blocks = driver.find_elements(By.XPATH, PRODUCT_XPATH)
+    logger.debug("Found %d product blocks.", len(blocks))
+
+    for block in blocks:
+        try:
+            # Title
+            title = ""
             try:
-                # Title
-                title = ""
-                try:
-                    title = block.find_element(By.CLASS_NAME, "product-title").text.strip()
-                except Exception:
-                    try:
-                        title = block.find_element(By.CLASS_NAME, "product-desc-rating").text.strip()
-                    except Exception:
-                        continue
-                # Product link
-                link = None
-                try:
-                    anchor = block.find_element(By.TAG_NAME, "a")
-                    link = anchor.get_attribute("href")
-                except Exception:
-                    continue
-                # Price
-                price_val = None
+                title = block.find_element(By.CLASS_NAME, "product-title").text.strip()
+            except Exception:
                 try:
-                    price_tag = block.find_element(By.CLASS_NAME, "product-price")
-                    price_txt = price_tag.text.replace(",", "").replace("Rs.", "").replace("₹", "").strip().split()[0]
-                    if price_txt.replace('.', '', 1).isdigit():
-                        price_val = float(price_txt)
+                    title = block.find_element(By.CLASS_NAME, "product-desc-rating").text.strip()
                 except Exception:
                     continue
-                if not (title and link and price_val):
-                    continue
-                # Image
+            # Product link
+            link = None
+            try:
+                anchor = block.find_element(By.TAG_NAME, "a")
+                link = anchor.get_attribute("href")
+            except Exception:
+                continue
+            # Price
+            price_val = None
+            try:
+                price_tag = block.find_element(By.CLASS_NAME, "product-price")
+                price_txt = price_tag.text.replace(",", "").replace("Rs.", "").replace("₹", "").strip().split()[0]
+                if price_txt.replace('.', '', 1).isdigit():
+                    price_val = float(price_txt)
+            except Exception:
+                continue
+            if not (title and link and price_val):
+                continue
+            # Image
+            image = None
+            try:
+                img_tag = block.find_element(By.TAG_NAME, "img")
+                image = img_tag.get_attribute("src")
+                # Sometimes snapdeal uses data-src for lazy load
+                if (not image or image.strip() == "" or image.startswith("data:")):
+                    image = img_tag.get_attribute("data-src")
+            except Exception:
                 image = None
-                try:
-                    img_tag = block.find_element(By.TAG_NAME, "img")
-                    image = img_tag.get_attribute("src")
-                    # Sometimes snapdeal uses data-src for lazy load
-                    if (not image or image.strip() == "" or image.startswith("data:")):
-                        image = img_tag.get_attribute("data-src")
-                except Exception:
-                    image = None
-
-                results.append({
-                    "title": title,
-                    "price": price_val,
-                    "link": link,
-                    "image": image,
-                    "source": "Snapdeal"
-                })
-                if len(results) >= max_results:
-                    break
+
+            results.append({
+                "title": title,
+                "price": price_val,
+                "link": link,
+                "image": image,
+                "source": "Snapdeal"
+            })
+            if len(results) >= max_results:
+                break
+        except Exception as e:
+            logger.debug("Skip product due to error: %s", e)
+    return results
+
+
+def _search_via_homepage(driver, product_name, timeout=10, deadline=None):
+    """Load the homepage and submit the query through the search box."""
+    get_rate_limiter("Snapdeal").acquire(deadline)
+    load_page(driver, "https://www.snapdeal.com/", deadline)
+    # Search for product
+    search_box = WebDriverWait(driver, wait_budget(timeout, deadline)).until(
+        EC.presence_of_element_located((By.ID, "inputValEnter"))
+    )
+    search_box.clear()
+    search_box.send_keys(product_name)
+    search_box.send_keys(Keys.RETURN)
+    # Wait for the results page to replace the page we searched from
+    try:
+        WebDriverWait(driver, wait_budget(timeout, deadline)).until(EC.staleness_of(search_box))
+    except Exception:
+        pass
+
+
+def _open_results(driver, product_name, timeout=10, deadline=None):
+    """Navigate straight to the search results page.
+
+    Falls back to typing into the homepage search box when the direct URL
+    doesn't show any product cards (e.g. the site changed its URL scheme).
+    Returns True when the site served a bot-check page (already penalized).
+    """
+    limiter = get_rate_limiter("Snapdeal")
+    limiter.acquire(deadline)
+    try:
+        load_page(driver, SEARCH_URL.format(query=quote_plus(product_name)), deadline)
+        WebDriverWait(driver, wait_budget(timeout, deadline)).until(
+            EC.presence_of_element_located((By.XPATH, PRODUCT_XPATH))
+        )
+        return False
+    except Exception as e:
+        if page_looks_blocked(driver):
+            # The homepage would get the same bot wall; back off instead.
+            limiter.penalize("Snapdeal served a bot-check page")
+            return True
+        logger.info("[Snapdeal] Direct search URL failed (%s); using the search box.", e)
+    if deadline is not None:
+        deadline.check()
+    _search_via_homepage(driver, product_name, timeout, deadline)
+    return False
+
+
+def scrape_snapdeal(product_name, max_results=15, headless: bool = True, bulk_extract: bool = True,
+                    timeout: float = 10, deadline=None, http_first=None,
+                    parse_executor=None):
+    # Server-rendered results over plain HTTP are far cheaper than Chrome.
+    if HTTP_FIRST if http_first is None else http_first:
+        url = SEARCH_URL.format(query=quote_plus(product_name))
+        results = scrape_static("Snapdeal", url, parse_snapdeal, max_results, timeout, deadline, parse_executor)
+        if enough_products(len(results), max_results) or (deadline is not None and deadline.expired()):
+            logger.info("[Snapdeal] Parsed %d unique products over HTTP.", len(results))
+            return tag_results(results, "http")
+        logger.info("[Snapdeal] HTTP path found %d products; using Chrome.", len(results))
+
+    # Borrow a warm driver from the shared pool instead of starting Chrome.
+    pool = get_driver_pool(headless=headless)
+    driver = pool.checkout(timeout=deadline.remaining() if deadline is not None else None)
+    results = []
+    try:
+        if _open_results(driver, product_name, timeout, deadline):
+            # Nothing to scroll or extract on a bot wall, and it's been
+            # penalized once already.
+            return tag_results(results, "selenium")
+
+        # Scroll until the product list stops growing (for AJAX)
+        scroll_until_stable(driver, PRODUCT_XPATH, max_results=max_results, budget=deadline)
+
+        if bulk_extract:
+            try:
+                results = _extract_bulk(driver, max_results)
             except Exception as e:
-                logger.debug("Skip product due to error: %s", e)
+                logger.warning("[Snapdeal] Bulk extraction failed, parsing the page source: %s", e)
+                try:
+                    results = run_parse(parse_snapdeal, driver.page_source, max_results, parse_executor)
+                except Exception as e:
+                    logger.warning("[Snapdeal] Page source parse failed, using per-element extraction: %s", e)
+                    results = _extract_webdriver(driver, max_results)
+        else:
+            results = _extract_webdriver(driver, max_results)
         logger.info("[Snapdeal] Parsed %d unique products.", len(results))
+        limiter = get_rate_limiter("Snapdeal")
+        if results:
+            limiter.reward()
+        elif page_looks_blocked(driver):
+            limiter.penalize("Snapdeal served a bot-check page")
     finally:
-        try:
-            driver.quit()
-        except Exception:
-            logger.debug("Exception while quitting driver")
-    return results
+        pool.checkin(driver)
+    return tag_results(results, "selenium")
 
 # Example usage:
 # print(scrape_snapdeal("power bank"))
@@ -0,0 +1,211 @@
+"""HTTP-first path for the Selenium scrapers.
+
+Flipkart, JioMart and Snapdeal often serve the first page of results as
+server-rendered HTML. Fetching that with the shared `requests` session and
+reading it with lxml costs a fraction of a Chrome page load, so the
+scrapers try it first and only borrow a browser when it comes back short
+or hits a bot wall.
+
+`extract_cards_html` mirrors `base_scraper.extract_cards` (same
+`card_field` specs, same required/unique/limit semantics), so a scraper
+describes its cards once and reads them from either a live page or a
+plain HTML document.
+"""
+import os
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+from scrapers.rate_limit import get_rate_limiter, looks_blocked
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Try plain HTTP before starting Chrome (PRODUCT_AGG_HTTP_FIRST=0 disables).
+HTTP_FIRST = os.getenv("PRODUCT_AGG_HTTP_FIRST", "1") != "0"
+
+# Fraction of max_results the HTTP path must deliver to skip the browser.
+# The default 1.0 means any shortfall falls back to Selenium, so HTTP-first
+# never returns fewer rows than the browser would; lower it to trade rows
+# for speed.
+HTTP_MIN_FILL = float(os.getenv("PRODUCT_AGG_HTTP_MIN_FILL", "1.0"))
+
+# Attributes the browser exposes as absolute URLs (DOM properties).
+_URL_ATTRS = ("href", "src")
+
+
+def enough_products(count: int, max_results: int) -> bool:
+    """True when the HTTP path found enough products to skip Selenium."""
+    return count > 0 and count >= max_results * HTTP_MIN_FILL
+
+
+def fetch_html(source: str, url: str, timeout: float = 10, deadline=None) -> Optional[str]:
+    """GET a results page through the source's rate limiter.
+
+    Returns the page text, or None when the request failed or returned a
+    non-200 status (429/503 also penalize the limiter). Raises
+    DeadlineExceeded when no budget is left for the request.
+    """
+    from scrapers.http_client import http_get, is_cached
+
+    limiter = get_rate_limiter(source)
+    if not is_cached(url):
+        limiter.acquire(deadline)
+    if deadline is not None:
+        # the limiter may have used up the rest of the budget
+        deadline.check()
+    try:
+        resp = http_get(url, timeout=deadline.clamp(timeout) if deadline is not None else timeout)
+    except Exception as e:
+        logger.info("[%s] HTTP fetch failed: %s", source, e)
+        return None
+    if looks_blocked(resp.status_code):
+        limiter.penalize(f"{source} returned status {resp.status_code}")
+        return None
+    if resp.status_code != 200:
+        logger.info("[%s] HTTP fetch returned status %d", source, resp.status_code)
+        return None
+    return resp.text
+
+
+def scrape_static(
+    source: str,
+    url: str,
+    parse: Callable[[str, int], List[Dict]],
+    max_results: int,
+    timeout: float = 10,
+    deadline=None,
+    parse_executor=None,
+) -> List[Dict]:
+    """Fetch `url` and run `parse(html, max_results)` on it.
+
+    The parse goes through `run_parse`, so it can run on `parse_executor`.
+    An empty parse of a captcha-looking page penalizes the source's rate
+    limiter (page text is only checked when nothing parsed: product pages
+    can mention "captcha" in their scripts).
+    """
+    html = fetch_html(source, url, timeout, deadline)
+    if html is None:
+        return []
+    results = run_parse(parse, html, max_results, parse_executor)
+    limiter = get_rate_limiter(source)
+    if results:
+        limiter.reward()
+    elif looks_blocked(text=html):
+        from scrapers.http_client import forget_cached
+
+        forget_cached(url)
+        limiter.penalize(f"{source} served a bot-check page over HTTP")
+    return results
+
+
+def run_parse(parse: Callable[[str, int], List[Dict]], html: str, max_results, executor=None) -> List[Dict]:
+    """Call a module-level `parse_<site>(html, max_results)`, on `executor` if given.
+
+    With a ProcessPoolExecutor the parse runs in another process, so many
+    pages parse in parallel instead of taking turns on the GIL.
+    """
+    if executor is None:
+        return parse(html, max_results)
+    return executor.submit(parse, html, max_results).result()
+
+
+def _node_text(node) -> str:
+    # Closest plain-HTML stand-in for innerText: text pieces separated by
+    # whitespace so adjacent labels ("₹1,299" "₹1,999") don't run together.
+    if not hasattr(node, "itertext"):
+        return str(node).strip()
+    return " ".join(t.strip() for t in node.itertext() if t.strip())
+
+
+def _first(card, xpaths: List[str]):
+    if not xpaths:
+        return card
+    for xpath in xpaths:
+        try:
+            found = card.xpath(xpath)
+        except Exception:
+            continue
+        if found:
+            return found[0]
+    return None
+
+
+def extract_cards_html(
+    html: str,
+    card_xpath: str,
+    fields: List[Dict],
+    base_url: str = "",
+    limit: Optional[int] = None,
+    required: Optional[List[str]] = None,
+    unique: Optional[str] = None,
+) -> List[Dict]:
+    """Read product cards from an HTML document with lxml.
+
+    Same contract as `base_scraper.extract_cards`: one dict per kept card
+    keyed by field name, skipping cards missing a `required` field or
+    repeating a `unique` one, stopping after `limit` cards. href/src values
+    are made absolute against `base_url`, as the browser does.
+    """
+    from lxml import etree, html as lxml_html
+
+    if not html:
+        return []
+    try:
+        root = lxml_html.fromstring(html)
+    except etree.ParserError:
+        # whitespace- or comment-only body ("Document is empty")
+        return []
+    out: List[Dict] = []
+    seen = set()
+    for card in root.xpath(card_xpath):
+        if limit and len(out) >= limit:
+            break
+        row = {}
+        for spec in fields:
+            node = _first(card, spec["xpaths"])
+            value = None
+            if node is not None:
+                attr = spec.get("attr")
+                if not attr:
+                    value = _node_text(node)
+                else:
+                    value = node.get(attr)
+                    if value is not None and attr in _URL_ATTRS:
+                        value = urljoin(base_url, value)
+            row[spec["name"]] = value
+        if any(not (row.get(name) or "").strip() for name in required or []):
+            continue
+        if unique:
+            key = (row.get(unique) or "").strip()
+            if key in seen:
+                continue
+            seen.add(key)
+        out.append(row)
+    return out
+
+
+def collect_products(
+    extract: Callable[[Optional[int]], List[Dict]],
+    to_products: Callable[[List[Dict], int], List[Dict]],
+    max_results: int,
+) -> List[Dict]:
+    """Extract at most `max_results` cards, validate, rescan if short.
+
+    `max_results=None` extracts and validates every card.
+
+    `extract(limit)` returns raw card rows (from the browser or from HTML);
+    `to_products(rows, max_results)` validates and normalizes them. The
+    whole page is only read again if some of the first cards were rejected.
+    """
+    rows = extract(max_results)
+    results = to_products(rows, max_results)
+    if max_results and len(results) < max_results and len(rows) >= max_results:
+        results = to_products(extract(None), max_results)
+    return results
+
+
+def tag_results(results: List[Dict], via: str) -> List[Dict]:
+    """Record which fetch path ("http" or "selenium") served each row."""
+    for row in results:
+        row["fetched_via"] = via
+    return results
@@ -1,6 +1,7 @@
 import sys
 import os
 import pandas as pd
+import pytest
 
 # ensure package import works
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -10,6 +11,19 @@ if ROOT not in sys.path:
 import core.aggregator as aggregator
 
 
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    # scraper fakes differ per test; don't let cached results or breaker
+    # state leak between them
+    from core.breaker import reset_breakers
+
+    aggregator.result_cache.clear()
+    reset_breakers()
+    yield
+    aggregator.result_cache.clear()
+    reset_breakers()
+
+
 def test_fetch_combined_calls_save_snapshot(monkeypatch):
     # prepare fake scraper outputs
     fake_amazon = [
@@ -44,3 +58,510 @@ def test_fetch_combined_calls_save_snapshot(monkeypatch):
     assert saved_query == "test-query"
     assert 'title' in saved_df.columns
     assert len(df) >= 2
+
+
+def _wait_until(cond, timeout=5.0):
+    import time
+
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.001)
+
+
+def _patch_scrapers(monkeypatch, amazon, flipkart, jiomart, snapdeal):
+    monkeypatch.setitem(sys.modules, 'scrapers.amazon_scraper', type('M', (), {'scrape_amazon': staticmethod(amazon)}))
+    monkeypatch.setitem(sys.modules, 'scrapers.flipkart_scraper', type('M', (), {'scrape_flipkart': staticmethod(flipkart)}))
+    monkeypatch.setitem(sys.modules, 'scrapers.jiomart_scraper', type('M', (), {'scrape_jiomart': staticmethod(jiomart)}))
+    monkeypatch.setitem(sys.modules, 'scrapers.snapdeal_scraper', type('M', (), {'scrape_snapdeal': staticmethod(snapdeal)}))
+
+
+def test_fetch_combined_concurrent_runs_sources_in_parallel(monkeypatch):
+    import threading
+
+    # Every scraper waits for all four to be running at once; this only
+    # succeeds when the sources are actually executed concurrently.
+    barrier = threading.Barrier(4, timeout=5)
+
+    def make(source, title):
+        def scrape(q, max_results=10, headless=True):
+            barrier.wait()
+            return [{"title": title, "price": 1, "link": f"http://{title}", "source": source}]
+        return scrape
+
+    _patch_scrapers(
+        monkeypatch,
+        make("Amazon", "a"),
+        make("Flipkart", "b"),
+        make("JioMart", "c"),
+        make("Snapdeal", "d"),
+    )
+
+    df = aggregator.fetch_combined("q", save_snapshot_to_db=False, concurrent=True, max_workers=4)
+
+    # merged in source order regardless of completion order
+    assert list(df["source"]) == ["Amazon", "Flipkart", "JioMart", "Snapdeal"]
+
+
+def test_fetch_combined_concurrent_isolates_failures(monkeypatch):
+    def boom(q, max_results=10, headless=True):
+        raise RuntimeError("site down")
+
+    _patch_scrapers(
+        monkeypatch,
+        lambda q, max_results=10: [{"title": "A", "price": 10, "link": "http://a", "source": "Amazon"}],
+        boom,
+        lambda q, max_results=10, headless=True: [
+            {"title": "A", "price": 12, "link": "http://a", "source": "JioMart"},
+            {"title": "C", "price": 30, "link": "http://c", "source": "JioMart"},
+        ],
+        lambda q, max_results=10, headless=True: [],
+    )
+
+    sequential = aggregator.fetch_combined("q", save_snapshot_to_db=False, use_cache=False)
+    parallel = aggregator.fetch_combined("q", save_snapshot_to_db=False, concurrent=True, max_workers=2, use_cache=False)
+
+    assert list(parallel["title"]) == ["A", "C"]
+    pd.testing.assert_frame_equal(sequential.reset_index(drop=True), parallel.reset_index(drop=True))
+
+
+def test_iter_combined_yields_fast_sources_first(monkeypatch):
+    import threading
+
+    release = threading.Event()
+
+    def slow(q, max_results=10, headless=True):
+        release.wait(timeout=5)
+        return [{"title": "F", "price": 2, "link": "http://f", "source": "Flipkart"}]
+
+    _patch_scrapers(
+        monkeypatch,
+        lambda q, max_results=10: [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}],
+        slow,
+        lambda q, max_results=10, headless=True: [],
+        lambda q, max_results=10, headless=True: [],
+    )
+
+    it = aggregator.iter_combined("q", sources=["Amazon", "Flipkart"], concurrent=True)
+    first = next(it)
+    # Amazon arrives while Flipkart is still blocked
+    assert first["source"] == "Amazon"
+    assert first["results"][0]["title"] == "A"
+    release.set()
+    batches = [first] + list(it)
+
+    assert {b["source"] for b in batches} == {"Amazon", "Flipkart"}
+    df = aggregator.combine_batches(batches)
+    assert list(df["title"]) == ["A", "F"]
+
+
+def test_aiter_combined_collects_all_sources(monkeypatch):
+    import asyncio
+
+    _patch_scrapers(
+        monkeypatch,
+        lambda q, max_results=10: [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}],
+        lambda q, max_results=10, headless=True: [{"title": "B", "price": 2, "link": "http://b", "source": "Flipkart"}],
+        lambda q, max_results=10, headless=True: [],
+        lambda q, max_results=10, headless=True: [],
+    )
+
+    async def collect():
+        return [b async for b in aggregator.aiter_combined("q", max_per_site=3)]
+
+    batches = asyncio.run(collect())
+    assert sorted(b["source"] for b in batches) == ["Amazon", "Flipkart", "JioMart", "Snapdeal"]
+    assert list(aggregator.combine_batches(batches)["title"]) == ["A", "B"]
+
+
+def test_fetch_combined_caches_per_source_results(monkeypatch):
+    calls = {"amazon": 0}
+
+    def amazon(q, max_results=10):
+        calls["amazon"] += 1
+        return [{"title": f"A{calls['amazon']}", "price": 1, "link": "http://a", "source": "Amazon"}]
+
+    empty = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, amazon, empty, empty, empty)
+
+    first = aggregator.fetch_combined("Nike  Shoes", sources=["Amazon"], save_snapshot_to_db=False)
+    # normalized query -> same key, served from cache
+    second = aggregator.fetch_combined("nike shoes", sources=["Amazon"], save_snapshot_to_db=False)
+    assert calls["amazon"] == 1
+    assert list(second["title"]) == list(first["title"]) == ["A1"]
+
+    # different limit is a different key
+    aggregator.fetch_combined("nike shoes", max_per_site=5, sources=["Amazon"], save_snapshot_to_db=False)
+    assert calls["amazon"] == 2
+
+    bypass = aggregator.fetch_combined("nike shoes", sources=["Amazon"], save_snapshot_to_db=False, use_cache=False)
+    assert list(bypass["title"]) == ["A3"]
+    refreshed = aggregator.fetch_combined("nike shoes", sources=["Amazon"], save_snapshot_to_db=False, refresh=True)
+    assert list(refreshed["title"]) == ["A4"]
+    cached = aggregator.fetch_combined("nike shoes", sources=["Amazon"], save_snapshot_to_db=False)
+    assert list(cached["title"]) == ["A4"]
+
+    stats = aggregator.cache_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+
+def test_identical_concurrent_searches_share_one_scrape(monkeypatch):
+    import threading
+
+    calls = {"n": 0}
+    started = threading.Event()
+    release = threading.Event()
+
+    def amazon(q, max_results=10):
+        calls["n"] += 1
+        started.set()
+        release.wait(timeout=5)
+        return [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}]
+
+    empty = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, amazon, empty, empty, empty)
+
+    results = []
+
+    def search():
+        results.append(aggregator.fetch_combined("phone", sources=["Amazon"], save_snapshot_to_db=False))
+
+    threads = [threading.Thread(target=search) for _ in range(3)]
+    threads[0].start()
+    started.wait(timeout=5)
+    before = aggregator.inflight.coalesced
+    for t in threads[1:]:
+        t.start()
+    _wait_until(lambda: aggregator.inflight.coalesced >= before + 2)
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert calls["n"] == 1
+    assert [list(df["title"]) for df in results] == [["A"]] * 3
+
+
+def test_coalesced_follower_waits_no_longer_than_its_deadline(monkeypatch):
+    import threading
+    import time
+    from utils.deadline import Deadline
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def amazon(q, max_results=10):
+        started.set()
+        release.wait(timeout=5)
+        return [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}]
+
+    none = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, amazon, none, none, none)
+
+    leader = threading.Thread(target=lambda: aggregator._fetch_source("Amazon", "q", 10, True))
+    leader.start()
+    started.wait(timeout=5)
+
+    start = time.monotonic()
+    rows, status = aggregator._fetch_source("Amazon", "q", 10, True, deadline=Deadline(0.2))
+    elapsed = time.monotonic() - start
+    release.set()
+    leader.join(timeout=5)
+
+    assert (rows, status) == ([], aggregator.STATUS_TIMEOUT)
+    assert elapsed < 1
+
+
+def test_coalesced_follower_does_not_inherit_leader_timeout(monkeypatch):
+    import threading
+    from utils.deadline import Deadline
+
+    started = threading.Event()
+
+    def amazon(q, max_results=10, deadline=None):
+        if deadline is not None:
+            # the leader's short budget runs out before the page arrives
+            started.set()
+            while not deadline.expired():
+                threading.Event().wait(0.005)
+            return []
+        return [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}]
+
+    none = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, amazon, none, none, none)
+
+    leader_out = []
+    leader = threading.Thread(
+        target=lambda: leader_out.append(aggregator._fetch_source("Amazon", "q", 10, True, deadline=Deadline(0.3)))
+    )
+    leader.start()
+    started.wait(timeout=5)
+    before = aggregator.inflight.coalesced
+
+    follower_out = []
+    follower = threading.Thread(target=lambda: follower_out.append(aggregator._fetch_source("Amazon", "q", 10, True)))
+    follower.start()
+    _wait_until(lambda: aggregator.inflight.coalesced > before)
+    leader.join(timeout=5)
+    follower.join(timeout=5)
+
+    assert leader_out == [([], aggregator.STATUS_TIMEOUT)]
+    rows, status = follower_out[0]
+    assert status == aggregator.STATUS_OK
+    assert [r["title"] for r in rows] == ["A"]
+
+
+def test_fetch_combined_many_returns_per_query_frames(monkeypatch):
+    import threading
+
+    active = {"Amazon": 0, "Flipkart": 0}
+    peak = {"Amazon": 0, "Flipkart": 0}
+    lock = threading.Lock()
+
+    def make(source):
+        def scrape(q, max_results=10, headless=True):
+            with lock:
+                active[source] += 1
+                peak[source] = max(peak[source], active[source])
+            try:
+                return [{"title": f"{q}-{source}", "price": 1, "link": f"http://{source}/{q}", "source": source}]
+            finally:
+                with lock:
+                    active[source] -= 1
+        return scrape
+
+    empty = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, make("Amazon"), make("Flipkart"), empty, empty)
+
+    saved = []
+    monkeypatch.setattr('database.db_helper.save_snapshot', lambda df, q: saved.append(q), raising=False)
+
+    out = aggregator.fetch_combined_many(
+        ["q1", "q2", "q3", "q2"],
+        sources=["Amazon", "Flipkart"],
+        max_workers=2,
+        save_snapshot_to_db=True,
+    )
+
+    assert list(out) == ["q1", "q2", "q3"]
+    for q, df in out.items():
+        assert list(df["title"]) == [f"{q}-Amazon", f"{q}-Flipkart"]
+    assert sorted(saved) == ["q1", "q2", "q3"]
+    # two workers over two sites -> one job per site at a time
+    assert peak == {"Amazon": 1, "Flipkart": 1}
+
+
+
+def test_batch_releases_driver_reservation(monkeypatch):
+    one = lambda q, max_results=10, headless=True: [{"title": q, "price": 1, "link": f"http://f/{q}", "source": "Flipkart"}]
+    empty = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, empty, one, empty, empty)
+    events = []
+    monkeypatch.setattr(
+        aggregator, "_reserve_drivers", lambda headless, count: events.append(("reserve", count)) or (lambda: events.append("release"))
+    )
+
+    out = aggregator.fetch_combined_many(["a", "b"], sources=["Flipkart"], max_workers=2)
+
+    assert list(out) == ["a", "b"]
+    assert events == [("reserve", 2), "release"]
+
+
+def test_batch_scheduler_interleaves_sites():
+    sched = aggregator._BatchScheduler(["q1", "q2"], ["Amazon", "Flipkart", "JioMart"], per_site_limit=1)
+
+    first = [sched.next_job() for _ in range(3)]
+    assert first == [("Amazon", "q1"), ("Flipkart", "q1"), ("JioMart", "q1")]
+
+    sched.done("Flipkart")
+    assert sched.next_job() == ("Flipkart", "q2")
+    for name in ("Amazon", "Flipkart", "JioMart"):
+        sched.done(name)
+    # round-robin continues after the site served last
+    assert sched.next_job() == ("JioMart", "q2")
+    assert sched.next_job() == ("Amazon", "q2")
+    assert sched.next_job() is None
+
+
+def test_circuit_breaker_skips_failing_source(monkeypatch):
+    calls = {"flipkart": 0}
+    seen_timeouts = []
+
+    def flipkart(q, max_results=10, headless=True):
+        calls["flipkart"] += 1
+        raise RuntimeError("blocked")
+
+    def amazon(q, max_results=10, timeout=10):
+        seen_timeouts.append(timeout)
+        return [{"title": q, "price": 1, "link": f"http://a/{q}", "source": "Amazon"}]
+
+    empty = lambda q, max_results=10, headless=True: [{"title": "x", "price": 1, "link": "http://x", "source": "S"}]
+    _patch_scrapers(monkeypatch, amazon, flipkart, empty, empty)
+
+    for i in range(5):
+        df = aggregator.fetch_combined(f"q{i}", sources=["Amazon", "Flipkart"], save_snapshot_to_db=False)
+        assert f"q{i}" in list(df["title"])
+
+    # tripped after 3 failures; later searches skip Flipkart entirely
+    assert calls["flipkart"] == 3
+    # scrapers that accept `timeout` get the (initially default) source timeout
+    assert seen_timeouts[0] == aggregator.SOURCE_TIMEOUT
+
+
+
+def test_clean_empty_pages_do_not_trip_the_breaker(monkeypatch):
+    from scrapers import rate_limit
+
+    monkeypatch.setattr(rate_limit, "_LIMITERS", {})
+    calls = {"jiomart": 0, "snapdeal": 0}
+
+    def jiomart(q, max_results=10, headless=True):
+        calls["jiomart"] += 1
+        return []  # rare product: a real, empty results page
+
+    def snapdeal(q, max_results=10, headless=True):
+        calls["snapdeal"] += 1
+        rate_limit.get_rate_limiter("Snapdeal").penalize("bot-check page")
+        return []
+
+    none = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, none, none, jiomart, snapdeal)
+
+    for i in range(5):
+        df = aggregator.fetch_combined(f"q{i}", sources=["JioMart", "Snapdeal"], save_snapshot_to_db=False)
+
+    assert calls == {"jiomart": 5, "snapdeal": 3}
+    assert df.attrs["source_status"] == {"JioMart": aggregator.STATUS_EMPTY, "Snapdeal": aggregator.STATUS_SKIPPED}
+
+
+def test_deadline_returns_partial_results_with_status(monkeypatch):
+    import threading
+    import time
+
+    release = threading.Event()
+
+    def amazon(q, max_results=10):
+        return [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}]
+
+    def flipkart(q, max_results=10, headless=True, deadline=None):
+        # cooperative scraper: returns what it has once the budget is gone
+        while not deadline.expired():
+            time.sleep(0.005)
+        return [{"title": "F", "price": 2, "link": "http://f", "source": "Flipkart"}]
+
+    def stuck(q, max_results=10, headless=True):
+        release.wait(timeout=5)
+        return [{"title": "J", "price": 3, "link": "http://j", "source": "JioMart"}]
+
+    _patch_scrapers(monkeypatch, amazon, flipkart, stuck, lambda q, max_results=10, headless=True: [])
+
+    start = time.monotonic()
+    df = aggregator.fetch_combined(
+        "q", sources=["Amazon", "Flipkart", "JioMart"], save_snapshot_to_db=False, concurrent=True, deadline=0.2
+    )
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert elapsed < 2
+    assert df.attrs["source_status"]["Amazon"] == "ok"
+    assert df.attrs["source_status"]["JioMart"] == "timeout"
+    assert "J" not in list(df["title"])
+    assert dict(zip(df["title"], df["status"]))["A"] == "ok"
+    # Flipkart either made it back in time with partial rows or was cut off
+    assert df.attrs["source_status"]["Flipkart"] in ("partial", "timeout")
+    # budget overruns are not cached as complete results
+    assert aggregator.result_cache.get(aggregator.cache_key("q", "Flipkart", 10)) is None
+
+
+
+def test_timed_out_probe_does_not_wedge_the_breaker(monkeypatch):
+    from core import breaker as breaker_mod
+    from utils.deadline import DeadlineExceeded
+
+    b = breaker_mod.CircuitBreaker(failure_threshold=1, cooldown=0)
+    monkeypatch.setitem(breaker_mod._BREAKERS, "Amazon", b)
+    b.record_failure()  # open; the next call is the half-open probe
+    behaviour = {"timeout": True}
+
+    def amazon(q, max_results=10):
+        if behaviour["timeout"]:
+            raise DeadlineExceeded("budget spent")
+        return [{"title": q, "price": 1, "link": f"http://a/{q}", "source": "Amazon"}]
+
+    none = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, amazon, none, none, none)
+
+    df = aggregator.fetch_combined("q1", sources=["Amazon"], save_snapshot_to_db=False)
+    assert df.attrs["source_status"] == {"Amazon": aggregator.STATUS_TIMEOUT}
+
+    behaviour["timeout"] = False
+    df = aggregator.fetch_combined("q2", sources=["Amazon"], save_snapshot_to_db=False)
+    assert df.attrs["source_status"] == {"Amazon": aggregator.STATUS_OK}
+    assert b.state == breaker_mod.CLOSED
+
+
+def test_sequential_deadline_skips_remaining_sources(monkeypatch):
+    import time
+
+    calls = []
+
+    def slow(q, max_results=10):
+        calls.append("Amazon")
+        time.sleep(0.1)
+        return [{"title": "A", "price": 1, "link": "http://a", "source": "Amazon"}]
+
+    def flipkart(q, max_results=10, headless=True):
+        calls.append("Flipkart")
+        return [{"title": "F", "price": 2, "link": "http://f", "source": "Flipkart"}]
+
+    _patch_scrapers(monkeypatch, slow, flipkart, flipkart, flipkart)
+
+    batches = list(aggregator.iter_combined("q", sources=["Amazon", "Flipkart"], concurrent=False, deadline=0.05))
+
+    assert calls == ["Amazon"]
+    assert [(b["source"], b["status"]) for b in batches] == [("Amazon", "partial"), ("Flipkart", "timeout")]
+
+
+def test_parse_in_processes_hands_scrapers_a_process_pool(monkeypatch):
+    from concurrent.futures import ProcessPoolExecutor
+
+    seen = []
+
+    def amazon(q, max_results=10, parse_executor=None):
+        seen.append(parse_executor)
+        # stand-in for parse_amazon: any picklable module-level callable
+        titles = parse_executor.submit(sorted, ["b", "a"]).result() if parse_executor else ["a"]
+        return [{"title": t, "price": 1, "link": f"http://a/{t}", "source": "Amazon"} for t in titles]
+
+    no_parse = lambda q, max_results=10, headless=True: []
+    _patch_scrapers(monkeypatch, amazon, no_parse, no_parse, no_parse)
+
+    try:
+        df = aggregator.fetch_combined(
+            "q", sources=["Amazon"], save_snapshot_to_db=False, use_cache=False, parse_in_processes=True
+        )
+        plain = aggregator.fetch_combined("q", sources=["Amazon"], save_snapshot_to_db=False, use_cache=False)
+    finally:
+        aggregator.shutdown_parse_pool()
+
+    assert isinstance(seen[0], ProcessPoolExecutor)
+    assert seen[1] is None
+    assert list(df["title"]) == ["a", "b"]
+    assert list(plain["title"]) == ["a"]
+
+
+def test_background_save_queues_snapshot_instead_of_writing(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'scrapers.amazon_scraper', type('M', (), {'scrape_amazon': lambda q, max_results=10: [{"title": "A", "price": 10, "link": "http://a", "source": "Amazon"}]}))
+    saved, queued = [], []
+    monkeypatch.setattr('database.db_helper.save_snapshot', lambda df, query: saved.append(query), raising=False)
+
+    class FakeWriter:
+        def submit(self, df, query):
+            queued.append((len(df), query))
+
+    monkeypatch.setattr('database.snapshot_writer.get_snapshot_writer', lambda: FakeWriter())
+
+    aggregator.fetch_combined("q", sources=["Amazon"], background_save=True)
+
+    assert queued == [(1, "q")] and saved == []
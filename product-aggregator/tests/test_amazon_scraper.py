@@ -0,0 +1,153 @@
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+pytest.importorskip("bs4")
+pytest.importorskip("requests")
+
+from scrapers.amazon_scraper import parse_amazon
+
+RESULT = """
+<div class="s-result-item" data-component-type="s-search-result">
+  <h2><a class="a-link-normal s-no-outline" href="/dp/{asin}"><span>{title}</span></a></h2>
+  <img class="s-image" src="https://m.media-amazon.com/{asin}.jpg">
+  <span class="a-icon-alt">4.{stars} out of 5 stars</span>
+  {price}
+</div>
+"""
+
+
+def search_page(n, sponsored_every=0):
+    items = []
+    for i in range(n):
+        # sponsored placeholders come without a price
+        price = "" if sponsored_every and i % sponsored_every == 0 else '<span class="a-price-whole">1,%03d</span>' % i
+        items.append(RESULT.format(asin="B%04d" % i, title="Item %d" % i, stars=i % 10, price=price))
+    return "<html><body><div class='s-main-slot'>%s</div></body></html>" % "".join(items)
+
+
+def test_parse_amazon_extracts_valid_products():
+    rows = parse_amazon(search_page(6, sponsored_every=3))
+
+    assert [r["title"] for r in rows] == ["Item 1", "Item 2", "Item 4", "Item 5"]
+    assert rows[0] == {
+        "title": "Item 1",
+        "price": 1001.0,
+        "rating": "4.1 out of 5 stars",
+        "link": "https://www.amazon.in/dp/B0001",
+        "image": "https://m.media-amazon.com/B0001.jpg",
+        "source": "Amazon",
+        "fetched_via": "http",
+    }
+    # the limit counts valid products, not result blocks
+    assert [r["title"] for r in parse_amazon(search_page(6, sponsored_every=3), max_results=3)] == [
+        "Item 1",
+        "Item 2",
+        "Item 4",
+    ]
+
+
+def test_unknown_parser_backend_falls_back_to_html_parser():
+    html = search_page(3)
+    assert parse_amazon(html, backend="bs4") == parse_amazon(html, backend="html.parser")
+    assert len(parse_amazon(html, backend="bs4")) == 3
+
+
+def test_parse_amazon_runs_in_a_worker_process():
+    pages = [search_page(5), search_page(3)]
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        parsed = list(pool.map(parse_amazon, pages))
+    assert parsed == [parse_amazon(p) for p in pages]
+
+
+def test_parser_backends_match_html_parser():
+    from scrapers import amazon_scraper
+
+    tricky = RESULT.format(
+        asin="B9999",
+        title=" Cable <!-- promo --> &amp; <b>Charger</b>\n ",
+        stars=5,
+        price='<span class="a-price"><span class="a-price-whole extra">2,499<span class="a-price-decimal">.</span></span></span>',
+    )
+    html = search_page(5, sponsored_every=2).replace("</div></body>", tricky + "</div></body>")
+    expected = parse_amazon(html, backend="html.parser")
+    assert expected[-1]["title"] == "Cable&Charger"
+
+    # backends whose library is missing fall back to html.parser
+    for name in amazon_scraper.PARSER_BACKENDS:
+        assert parse_amazon(html, backend=name) == expected, name
+        # an empty 200 body parses to no products, not an exception
+        for blank in ("", "  \n"):
+            assert parse_amazon(blank, backend=name) == [], name
+
+
+def _results_page(indices):
+    return "<html><body>%s</body></html>" % "".join(
+        RESULT.format(
+            asin="B%09d" % i, title="Item %d" % i, stars=i % 10, price='<span class="a-price-whole">%d</span>' % (100 + i)
+        )
+        for i in indices
+    )
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+@pytest.fixture
+def paged_amazon(monkeypatch):
+    import threading
+
+    from scrapers import amazon_scraper
+    from scrapers.rate_limit import configure_rate_limiter
+
+    configure_rate_limiter("Amazon", rate=1000, burst=100, min_interval=0, jitter=0)
+    # pages of 4 products; page 3 repeats a product from page 2
+    pages = {1: range(0, 4), 2: range(4, 8), 3: [7, 8, 9, 10], 4: range(11, 15)}
+    requested = []
+    lock = threading.Lock()
+
+    def fake_get(url, timeout=None):
+        n = int(url.rsplit("&page=", 1)[1]) if "&page=" in url else 1
+        with lock:
+            requested.append(n)
+        return FakeResponse(_results_page(pages.get(n, [])))
+
+    monkeypatch.setattr(amazon_scraper, "http_get", fake_get)
+    return amazon_scraper, requested
+
+
+def test_small_limit_reads_one_page(paged_amazon):
+    amazon_scraper, requested = paged_amazon
+
+    rows = amazon_scraper.scrape_amazon("cable", max_results=3)
+
+    assert requested == [1]
+    assert [r["title"] for r in rows] == ["Item 0", "Item 1", "Item 2"]
+
+
+def test_large_limit_fetches_pages_and_merges_in_order(paged_amazon):
+    amazon_scraper, requested = paged_amazon
+
+    rows = amazon_scraper.scrape_amazon("cable", max_results=12)
+
+    # 8 more products needed at 4 per page -> pages 2 and 3
+    assert sorted(requested) == [1, 2, 3]
+    assert [r["title"] for r in rows] == ["Item %d" % i for i in range(11)]
+
+
+def test_pagination_respects_max_pages(paged_amazon):
+    amazon_scraper, requested = paged_amazon
+
+    rows = amazon_scraper.scrape_amazon("cable", max_results=50, max_pages=2)
+
+    assert sorted(requested) == [1, 2]
+    assert len(rows) == 8
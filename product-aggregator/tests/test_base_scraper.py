@@ -0,0 +1,338 @@
+import sys
+import os
+import types
+import threading
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def base_scraper(monkeypatch):
+    """Import scrapers.base_scraper without needing Chrome/uc installed."""
+    faked = False
+    try:
+        import undetected_chromedriver  # noqa: F401
+        import selenium  # noqa: F401
+    except ImportError:
+        faked = True
+        exc_mod = types.ModuleType("selenium.common.exceptions")
+        exc_mod.SessionNotCreatedException = type("SessionNotCreatedException", (Exception,), {})
+        monkeypatch.setitem(sys.modules, "undetected_chromedriver", types.ModuleType("undetected_chromedriver"))
+        monkeypatch.setitem(sys.modules, "selenium", types.ModuleType("selenium"))
+        monkeypatch.setitem(sys.modules, "selenium.common", types.ModuleType("selenium.common"))
+        monkeypatch.setitem(sys.modules, "selenium.common.exceptions", exc_mod)
+        monkeypatch.delitem(sys.modules, "scrapers.base_scraper", raising=False)
+    import scrapers.base_scraper as mod
+
+    yield mod
+    if faked:
+        # don't leak the module bound to the fake packages into other tests
+        sys.modules.pop("scrapers.base_scraper", None)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.window_handles = ["main"]
+        self.cookies_cleared = 0
+        self.quit_called = False
+        self.dead = False
+        self.switch_to = types.SimpleNamespace(window=lambda h: None)
+
+    def close(self):
+        pass
+
+    def delete_all_cookies(self):
+        if self.dead:
+            raise RuntimeError("session deleted")
+        self.cookies_cleared += 1
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeout = seconds
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_pool_reuses_and_resets_drivers(base_scraper):
+    created = []
+
+    def factory():
+        created.append(FakeDriver())
+        return created[-1]
+
+    pool = base_scraper.DriverPool(max_size=2, factory=factory)
+    d1 = pool.checkout()
+    pool.checkin(d1)
+    d2 = pool.checkout()
+
+    assert d2 is d1
+    assert len(created) == 1
+    assert d1.cookies_cleared == 1
+    pool.checkin(d2)
+    pool.close()
+    assert d1.quit_called
+
+
+def test_pool_recycles_after_max_uses_and_on_crash(base_scraper):
+    pool = base_scraper.DriverPool(max_size=1, max_uses=2, factory=FakeDriver)
+
+    d = pool.checkout()
+    pool.checkin(d)
+    assert pool.checkout() is d
+    pool.checkin(d)  # second use -> recycled
+    assert d.quit_called
+
+    crashed = pool.checkout()
+    assert crashed is not d
+    crashed.dead = True
+    pool.checkin(crashed)  # reset fails -> recycled
+    assert crashed.quit_called
+    assert pool.checkout() is not crashed
+
+
+def test_pool_blocks_at_max_size(base_scraper):
+    pool = base_scraper.DriverPool(max_size=1, factory=FakeDriver)
+    d = pool.checkout()
+
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.checkout(timeout=5)))
+    t.start()
+    pool.checkin(d)
+    t.join(timeout=5)
+    assert got == [d]
+
+
+
+def test_default_pool_serves_every_selenium_site_at_once(base_scraper, monkeypatch):
+    import core.aggregator as aggregator
+
+    monkeypatch.delenv("PRODUCT_AGG_DRIVER_POOL_SIZE", raising=False)
+    monkeypatch.setattr(base_scraper, "_POOLS", {})
+    pool = base_scraper.get_driver_pool()
+    pool._factory = FakeDriver
+    selenium_sites = [name for name, spec in aggregator.SOURCES.items() if spec[2]]
+
+    # a concurrent search checks out one driver per Selenium site
+    drivers = [pool.checkout(timeout=0.05) for _ in selenium_sites]
+    assert len(set(map(id, drivers))) == len(selenium_sites)
+
+
+
+def test_pool_reservation_is_given_back(base_scraper):
+    pool = base_scraper.DriverPool(max_size=1, factory=FakeDriver)
+    token = pool.reserve(3)
+    drivers = [pool.checkout(timeout=0.05) for _ in range(3)]
+    pool.checkin(drivers[0])
+
+    pool.release(token)
+    assert pool.max_size == 1
+    # idle extras are quit now, busy ones when they come back
+    assert drivers[0].quit_called
+    pool.checkin(drivers[1])
+    assert drivers[1].quit_called
+    pool.checkin(drivers[2])
+    assert not drivers[2].quit_called and pool.checkout(timeout=0.05) is drivers[2]
+
+
+def test_pool_warm_gives_back_slots_when_a_launch_fails(base_scraper):
+    launches = []
+
+    def factory():
+        launches.append(1)
+        if len(launches) == 2:
+            raise RuntimeError("chrome failed to start")
+        return FakeDriver()
+
+    pool = base_scraper.DriverPool(max_size=3, factory=factory)
+    with pytest.raises(RuntimeError):
+        pool.warm()
+
+    # the driver that did start is idle; the failed and unattempted slots are free
+    assert pool._created == 1 and len(pool._idle) == 1
+    drivers = [pool.checkout(timeout=0.05) for _ in range(3)]
+    assert len(set(map(id, drivers))) == 3
+
+
+def test_prewarm_flag_launches_drivers_at_pool_creation(base_scraper, monkeypatch):
+    monkeypatch.setenv("PRODUCT_AGG_DRIVER_PREWARM", "1")
+    monkeypatch.setenv("PRODUCT_AGG_DRIVER_POOL_SIZE", "2")
+    monkeypatch.setattr(base_scraper, "_POOLS", {})
+    monkeypatch.setattr(base_scraper, "make_driver", lambda headless=True, lean=False: FakeDriver())
+
+    pool = base_scraper.get_driver_pool()
+    for _ in range(100):
+        if len(pool._idle) == 2:
+            break
+        threading.Event().wait(0.01)
+    assert len(pool._idle) == 2
+
+
+class ScrollDriver:
+    """Fake driver whose card count grows by `step` per scroll up to `total`."""
+
+    def __init__(self, step, total):
+        self.step = step
+        self.total = total
+        self.count = 0
+        self.scrolls = 0
+
+    def execute_script(self, script, *args):
+        self.scrolls += 1
+        self.count = min(self.total, self.count + self.step)
+        return self.count
+
+
+def test_scroll_until_stable_stops_at_max_results(base_scraper):
+    driver = ScrollDriver(step=5, total=100)
+    count = base_scraper.scroll_until_stable(driver, "//div", max_results=12, poll=0)
+    assert count >= 12
+    assert driver.scrolls == 3
+
+
+def test_scroll_until_stable_stops_when_count_settles(base_scraper):
+    driver = ScrollDriver(step=4, total=8)
+    count = base_scraper.scroll_until_stable(driver, "//div", max_results=50, poll=0, settle_polls=2)
+    assert count == 8
+    # counts 4, 8, 8, 8: two polls without growth end the loop
+    assert driver.scrolls == 4
+
+
+def test_scroll_until_stable_respects_deadline(base_scraper):
+    driver = ScrollDriver(step=0, total=0)  # page never shows cards
+    count = base_scraper.scroll_until_stable(driver, "//div", max_results=5, deadline=0.05, poll=0.01)
+    assert count == 0
+    assert driver.scrolls >= 2
+
+
+def test_scroll_until_stable_gives_up_on_empty_page(base_scraper):
+    driver = ScrollDriver(step=0, total=0)  # no results / bot wall
+    count = base_scraper.scroll_until_stable(driver, "//div", max_results=5, deadline=30, poll=0, settle_polls=3)
+    assert count == 0
+    # counts 0, 0, 0, 0: settles like a page whose count stopped growing
+    assert driver.scrolls == 4
+
+
+def test_extract_cards_single_round_trip(base_scraper):
+    import json
+
+    calls = []
+
+    class BulkDriver:
+        def execute_script(self, script, *args):
+            calls.append(args)
+            return json.dumps([{"title": "Phone", "price": "₹1,299 ₹1,999"}, {"title": "Case", "price": None}])
+
+    fields = [base_scraper.card_field("title"), base_scraper.card_field("price", ["..//div"])]
+    rows = base_scraper.extract_cards(BulkDriver(), "//a", fields)
+
+    assert len(calls) == 1
+    assert calls[0][0] == "//a"
+    assert calls[0][1][1] == {"name": "price", "xpaths": ["..//div"], "attr": None}
+    assert [r["title"] for r in rows] == ["Phone", "Case"]
+    assert base_scraper.parse_price(rows[0]["price"]) == 1299.0
+    assert base_scraper.parse_price(rows[1]["price"]) is None
+
+
+def test_extract_cards_pushes_limit_and_filters_into_page(base_scraper):
+    calls = []
+
+    class BulkDriver:
+        def execute_script(self, script, *args):
+            calls.append(args)
+            return []
+
+    base_scraper.extract_cards(BulkDriver(), "//a", [], limit=3, required=("title", "price"), unique="title")
+
+    assert calls[0][2:] == (3, ["title", "price"], "title")
+
+
+def test_scroll_until_stable_passes_target_to_page(base_scraper):
+    seen = []
+
+    class TargetDriver(ScrollDriver):
+        def execute_script(self, script, *args):
+            seen.append(args)
+            return super().execute_script(script, *args)
+
+    base_scraper.scroll_until_stable(TargetDriver(step=10, total=10), "//a", max_results=4, poll=0)
+    # the page skips scrolling once it already has the target count
+    assert seen == [("//a", 4)]
+
+
+def test_parse_price_strips_currency_tokens(base_scraper):
+    assert base_scraper.parse_price("Rs. 499") is None
+    assert base_scraper.parse_price("Rs. 499", strip=("Rs.", "₹")) == 499.0
+    assert base_scraper.parse_price("₹ 12.50 onwards") == 12.5
+    assert base_scraper.parse_price("") is None
+
+
+def test_make_driver_lean_profile(base_scraper, monkeypatch):
+    class FakeOptions:
+        def __init__(self):
+            self.arguments = []
+            self.experimental = {}
+            self.page_load_strategy = "normal"
+
+        def add_argument(self, arg):
+            self.arguments.append(arg)
+
+        def add_experimental_option(self, name, value):
+            self.experimental[name] = value
+
+    class FakeChrome:
+        def __init__(self, options):
+            self.options = options
+            self.cdp = []
+
+        def execute_cdp_cmd(self, cmd, params):
+            self.cdp.append((cmd, params))
+
+    monkeypatch.setattr(base_scraper, "uc", types.SimpleNamespace(ChromeOptions=FakeOptions, Chrome=FakeChrome))
+
+    plain = base_scraper.make_driver(headless=True)
+    assert plain.options.page_load_strategy == "normal"
+    assert plain.cdp == []
+
+    lean = base_scraper.make_driver(headless=True, lean=True)
+    assert lean.options.page_load_strategy == "eager"
+    assert lean.options.experimental["prefs"]["profile.managed_default_content_settings.images"] == 2
+    blocked = dict(lean.cdp)["Network.setBlockedURLs"]["urls"]
+    assert "*.woff2" in blocked and "*google-analytics.com*" in blocked
+
+
+def test_scroll_until_stable_stops_on_cancelled_budget(base_scraper):
+    from utils.deadline import Deadline
+
+    budget = Deadline(30)
+    budget.cancel()
+    driver = ScrollDriver(step=0, total=0)
+    count = base_scraper.scroll_until_stable(driver, "//div", max_results=5, deadline=30, poll=0.01, budget=budget)
+    assert count == 0
+    assert driver.scrolls == 1
+
+
+def test_page_loads_and_waits_are_clamped_to_the_deadline(base_scraper):
+    from utils.deadline import Deadline, DeadlineExceeded
+
+    driver = FakeDriver()
+    assert base_scraper.wait_budget(10) == 10
+    assert base_scraper.wait_budget(10, Deadline(0.5)) <= 0.5
+
+    base_scraper.load_page(driver, "https://example.com", Deadline(0.5))
+    assert driver.page_load_timeout <= 0.5
+    # a pooled driver gets the default limit back on reset
+    base_scraper._reset_driver(driver)
+    assert driver.page_load_timeout == base_scraper.DEFAULT_PAGE_LOAD_TIMEOUT
+
+    with pytest.raises(DeadlineExceeded):
+        base_scraper.load_page(driver, "https://example.com", Deadline(0))
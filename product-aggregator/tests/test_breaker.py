@@ -0,0 +1,66 @@
+import sys
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from core.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_trips_after_threshold_and_probes_after_cooldown():
+    clock = FakeClock()
+    b = CircuitBreaker(failure_threshold=3, cooldown=30, clock=clock)
+
+    for _ in range(2):
+        assert b.allow()
+        b.record_failure()
+    assert b.state == CLOSED
+    b.record_failure()
+    assert b.state == OPEN
+    assert not b.allow()
+
+    clock.now = 31
+    assert b.allow()  # the single half-open probe
+    assert b.state == HALF_OPEN
+    assert not b.allow()  # second caller waits for the probe's outcome
+
+    b.record_failure()  # probe failed -> open again
+    assert b.state == OPEN
+    assert not b.allow()
+
+    clock.now = 62
+    assert b.allow()
+    b.record_success(1.0)
+    assert b.state == CLOSED
+    assert b.allow() and b.allow()
+
+
+def test_success_resets_consecutive_failures():
+    b = CircuitBreaker(failure_threshold=2)
+    b.record_failure()
+    b.record_success()
+    b.record_failure()
+    assert b.state == CLOSED
+
+
+def test_timeout_adapts_to_p95_latency():
+    b = CircuitBreaker(min_samples=5)
+    assert b.timeout(10) == 10  # not enough samples yet
+
+    for latency in [1.0, 1.2, 1.1, 0.9, 2.0]:
+        b.record_success(latency)
+    assert b.timeout(10, minimum=1) == 3.0  # 1.5 x p95 (2.0)
+    assert b.timeout(10, minimum=4) == 4  # clamped up to minimum
+
+    for _ in range(20):
+        b.record_success(30.0)
+    assert b.timeout(10) == 10  # never above the default
@@ -0,0 +1,60 @@
+import sys
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from core.cache import ResultCache, cache_key, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  Nike   SHOES ") == "nike shoes"
+    assert cache_key("Nike Shoes", "Amazon", "10") == ("nike shoes", "Amazon", 10)
+
+
+def test_result_cache_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    key = cache_key("Phone", "Amazon", 10)
+    ResultCache(disk_path=path).set(key, [{"title": "p"}])
+
+    fresh = ResultCache(disk_path=path)
+    assert fresh.get(key) == [{"title": "p"}]
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.get(key) == [{"title": "p"}]
+    assert fresh.stats()["memory_hits"] == 1
+
+    expired = ResultCache(disk_path=path, ttl=0)
+    assert expired.get(key) is None
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.set(("a", "S", 1), [{"t": 1}])
+    cache.set(("b", "S", 1), [{"t": 2}])
+    cache.get(("a", "S", 1))
+    cache.set(("c", "S", 1), [{"t": 3}])
+
+    assert cache.get(("b", "S", 1)) is None
+    assert cache.get(("a", "S", 1)) == [{"t": 1}]
+
+
+def test_result_cache_deletes_expired_disk_rows(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "cache.db")
+    old = ResultCache(disk_path=path, ttl=0)
+    old.set(cache_key("a", "S", 1), [{"t": 1}])
+    old.set(cache_key("b", "S", 1), [{"t": 2}])
+
+    def disk_keys():
+        conn = sqlite3.connect(path)
+        try:
+            return {k for (k,) in conn.execute("SELECT key FROM result_cache")}
+        finally:
+            conn.close()
+
+    # writing "b" pruned the expired "a"; reading "b" once expired drops it
+    assert disk_keys() == {'["b", "S", 1]'}
+    assert ResultCache(disk_path=path, ttl=0).get(cache_key("b", "S", 1)) is None
+    assert disk_keys() == set()
@@ -0,0 +1,62 @@
+import sys
+import os
+import threading
+
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from database import connection, db_helper
+
+
+def test_connections_are_per_thread_and_schema_runs_once(tmp_path):
+    db_file = str(tmp_path / "conn.db")
+    calls = []
+
+    def init(conn):
+        calls.append(threading.current_thread().name)
+        conn.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+
+    first = connection.get_connection(db_file, init=init)
+    assert connection.get_connection(db_file, init=init) is first
+    assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert first.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(connection.get_connection(db_file, init=init)))
+    t.start()
+    t.join()
+    assert other[0] is not first
+    assert len(calls) == 1
+
+    connection.close_connection(db_file)
+    assert connection.get_connection(db_file, init=init) is not first
+    assert len(calls) == 1
+
+
+def test_readers_are_not_blocked_by_an_open_write(tmp_path):
+    db_file = str(tmp_path / "wal.db")
+    db_helper.save_snapshot(pd.DataFrame([{"title": "a", "price": 1}]), "q", db_path=db_file)
+
+    writer = db_helper._connect(db_file)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("DELETE FROM offers")
+    try:
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(db_helper.list_snapshots(db_path=db_file)))
+        t.start()
+        t.join(timeout=3)
+        assert [s["row_count"] for s in seen[0]] == [1]
+    finally:
+        writer.rollback()
+
+
+def test_close_all_connections_resets_schema_init(tmp_path):
+    db_file = str(tmp_path / "reset.db")
+    calls = []
+    connection.get_connection(db_file, init=calls.append)
+    connection.close_all_connections()
+    connection.get_connection(db_file, init=calls.append)
+    assert len(calls) == 2
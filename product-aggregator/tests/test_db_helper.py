@@ -1,6 +1,7 @@
 import sys
 import os
 import pandas as pd
+import pytest
 
 # Ensure product-aggregator is on sys.path so 'database' package can be imported
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -41,3 +42,152 @@ def test_delete_snapshot(tmp_path):
 
     snaps_after = db_helper.load_snapshots("del_query", db_path=db_file)
     assert len(snaps_after) == 0
+
+
+def test_snapshot_rows_become_indexed_offers(tmp_path):
+    import sqlite3
+
+    db_file = str(tmp_path / "test_schema.db")
+    df = pd.DataFrame([
+        {"title": "Lamp", "price": 499.0, "link": "https://a/lamp", "source": "Amazon", "status": "ok"},
+        {"title": "Desk", "price": None, "link": "https://a/desk", "source": "Amazon", "status": "ok"},
+    ])
+    db_helper.save_snapshot(df, "lamp", db_path=db_file)
+    db_helper.save_snapshot(df.assign(price=[450.0, 1299.0]), "lamp", db_path=db_file)
+
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM offers").fetchone()[0] == 4
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert {"idx_runs_query_created", "idx_offers_product", "idx_offers_source_price"} <= indexes
+
+    latest = db_helper.load_snapshots("lamp", db_path=db_file)[0]["df"]
+    assert list(latest.columns) == ["title", "price", "link", "source", "status"]
+    assert latest["price"].tolist() == [450.0, 1299.0] and latest["status"].tolist() == ["ok", "ok"]
+
+    cheapest = db_helper.cheapest_offers("lamp", db_path=db_file)
+    assert list(zip(cheapest["title"], cheapest["price"])) == [("Lamp", 450.0), ("Desk", 1299.0)]
+
+
+def test_legacy_snapshots_are_migrated(tmp_path):
+    import json
+    import sqlite3
+
+    db_file = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_file)
+    conn.execute(
+        "CREATE TABLE snapshots (id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT, created_at TEXT, data_json TEXT)"
+    )
+    conn.execute(
+        "INSERT INTO snapshots (id, query, created_at, data_json) VALUES (7, 'old', '2024-01-01T00:00:00', ?)",
+        (json.dumps([{"title": "x", "price": 3}]),),
+    )
+    conn.commit()
+    conn.close()
+
+    snaps = db_helper.load_snapshots(db_path=db_file)
+    assert [(s["id"], s["query"], s["created_at"]) for s in snaps] == [(7, "old", "2024-01-01T00:00:00")]
+    assert snaps[0]["df"].iloc[0]["title"] == "x"
+    # migration runs once; new ids continue after the migrated ones
+    assert db_helper.save_snapshot(pd.DataFrame([{"title": "y"}]), "new", db_path=db_file) == 8
+    assert len(db_helper.load_snapshots(db_path=db_file)) == 2
+
+
+def test_list_snapshots_returns_metadata_pages(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "test_list.db")
+    for i in range(5):
+        source = "Amazon" if i % 2 else "Flipkart"
+        df = pd.DataFrame([{"title": f"t{i}", "price": i, "source": source}] * (i + 1))
+        db_helper.save_snapshot(df, "phone" if i < 4 else "lamp", db_path=db_file)
+
+    built = []
+    real = db_helper._run_dataframe
+    monkeypatch.setattr(db_helper, "_run_dataframe", lambda *a: built.append(a[1]) or real(*a))
+
+    page = db_helper.list_snapshots(query="phone", limit=2, offset=1, db_path=db_file)
+    assert [(s["id"], s["row_count"]) for s in page] == [(3, 3), (2, 2)]
+    assert "df" not in page[0]
+    assert db_helper.count_snapshots(query="phone", db_path=db_file) == 4
+    assert [s["id"] for s in db_helper.list_snapshots(source="Amazon", db_path=db_file)] == [4, 2]
+    assert built == []
+
+    snap = db_helper.load_snapshot(3, db_path=db_file)
+    assert built == [3]
+    assert snap["query"] == "phone" and len(snap["df"]) == 3
+    assert db_helper.load_snapshot(99, db_path=db_file) is None
+
+
+def test_parquet_storage_dedups_identical_row_sets(tmp_path):
+    pytest.importorskip("pyarrow")
+    import sqlite3
+
+    db_file = str(tmp_path / "parquet.db")
+    df = pd.DataFrame([{"title": f"item {i}", "price": 100.0 + i, "source": "Amazon"} for i in range(50)])
+
+    first = db_helper.save_snapshot(df, "phone", db_path=db_file, storage="parquet")
+    second = db_helper.save_snapshot(df.copy(), "phone", db_path=db_file, storage="parquet")
+    db_helper.save_snapshot(df.head(10), "phone", db_path=db_file, storage="parquet")
+
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM snapshot_blobs").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM offers").fetchone()[0] == 0
+    conn.close()
+
+    loaded = db_helper.load_snapshot(second, db_path=db_file)["df"]
+    pd.testing.assert_frame_equal(loaded, df)
+    assert [s["row_count"] for s in db_helper.list_snapshots(db_path=db_file)] == [10, 50, 50]
+
+    # the shared blob survives until its last run is deleted
+    assert db_helper.delete_snapshot(first, db_path=db_file)
+    pd.testing.assert_frame_equal(db_helper.load_snapshots(db_path=db_file)[1]["df"], df)
+    assert db_helper.delete_snapshot(second, db_path=db_file)
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM snapshot_blobs").fetchone()[0] == 1
+    conn.close()
+
+
+def test_parquet_dedup_keeps_lookalike_frames_apart(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    db_file = str(tmp_path / "lookalike.db")
+    as_int = pd.DataFrame({"title": ["a"], "sku": pd.Series([1], dtype=object)})
+    as_str = pd.DataFrame({"title": ["a"], "sku": pd.Series(["1"], dtype=object)})
+
+    int_id = db_helper.save_snapshot(as_int, "q", db_path=db_file, storage="parquet")
+    str_id = db_helper.save_snapshot(as_str, "q", db_path=db_file, storage="parquet")
+
+    assert db_helper.load_snapshot(int_id, db_path=db_file)["df"]["sku"].tolist() == [1]
+    assert db_helper.load_snapshot(str_id, db_path=db_file)["df"]["sku"].tolist() == ["1"]
+
+
+def test_parquet_storage_falls_back_without_pyarrow(tmp_path, monkeypatch):
+    def missing():
+        raise ImportError("No module named 'pyarrow'")
+
+    monkeypatch.setattr(db_helper, "_parquet", missing)
+    db_file = str(tmp_path / "fallback.db")
+
+    rid = db_helper.save_snapshot(pd.DataFrame([{"title": "a", "price": 1.0}]), "q", db_path=db_file, storage="parquet")
+
+    assert db_helper.load_snapshot(rid, db_path=db_file)["df"].iloc[0]["title"] == "a"
+    with pytest.raises(ValueError):
+        db_helper.save_snapshot(pd.DataFrame(), "q", db_path=db_file, storage="feather")
+
+
+def test_later_runs_do_not_rewrite_earlier_snapshots(tmp_path):
+    db_file = str(tmp_path / "history.db")
+    first = pd.DataFrame([
+        {"title": "Phone 64GB", "description": "old", "link": "https://a/p", "image": "https://i/1.jpg", "source": "Amazon"},
+        {"title": "Phone 64GB (renewed)", "description": "other", "link": "https://a/p", "image": None, "source": "Amazon"},
+    ])
+    rid = db_helper.save_snapshot(first, "phone", db_path=db_file)
+    db_helper.save_snapshot(
+        pd.DataFrame([{"title": "Phone 128GB", "description": "new", "link": "https://a/p", "image": "https://i/2.jpg",
+                       "source": "Amazon"}]),
+        "phone",
+        db_path=db_file,
+    )
+
+    loaded = db_helper.load_snapshot(rid, db_path=db_file)["df"]
+    assert loaded.to_dict("records") == first.to_dict("records")
@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+def test_unlimited_deadline_never_expires():
+    d = Deadline()
+    assert d.remaining() is None
+    assert not d.expired()
+    assert d.clamp(7) == 7
+    d.check()
+
+
+def test_deadline_expires_and_clamps():
+    d = Deadline(0.05)
+    assert d.clamp(10) <= 0.05
+    time.sleep(0.06)
+    assert d.expired()
+    assert d.clamp(10) == 0
+    with pytest.raises(DeadlineExceeded):
+        d.check()
+
+
+def test_cancel_expires_immediately():
+    d = Deadline(60)
+    d.cancel()
+    assert d.remaining() == 0
+    assert d.expired()
@@ -0,0 +1,116 @@
+import sys
+import os
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scrapers.http_cache import HttpCache, response_key
+
+
+def test_key_depends_on_url_and_varying_headers_only():
+    base = response_key("https://a/s?k=x", {"User-Agent": "UA", "Accept-Language": "en"})
+    assert base == response_key("https://a/s?k=x", {"user-agent": "UA", "accept-language": "en", "Connection": "close"})
+    assert base != response_key("https://a/s?k=x", {"User-Agent": "UA", "Accept-Language": "hi"})
+    assert base != response_key("https://a/s?k=y", {"User-Agent": "UA", "Accept-Language": "en"})
+
+
+def test_store_get_and_ttl(tmp_path):
+    cache = HttpCache(str(tmp_path / "http.db"), ttl=60)
+    body = ("<html>" + "x" * 10000 + "</html>").encode()
+    cache.store("k", "https://a/", 200, {"ETag": '"v1"', "Content-Encoding": "gzip"}, body, "utf-8")
+
+    entry, fresh = cache.get("k")
+    assert fresh and entry.body == body and entry.etag == '"v1"'
+    assert "Content-Encoding" not in entry.headers
+    # compressed on disk
+    assert cache.stats()["bytes"] < len(body) / 10
+
+    cache.ttl = 0
+    entry, fresh = cache.get("k")
+    assert entry is not None and not fresh
+    cache.refresh("k", {"ETag": '"v2"'})
+    cache.ttl = 60
+    entry, fresh = cache.get("k")
+    assert fresh and entry.etag == '"v2"'
+
+
+def test_lru_eviction_keeps_within_byte_budget(tmp_path):
+    cache = HttpCache(str(tmp_path / "http.db"), ttl=60, max_bytes=2500)
+    pages = {k: os.urandom(1000) for k in ("a", "b", "c")}  # incompressible
+    cache.store("a", "u", 200, {}, pages["a"])
+    time.sleep(0.01)
+    cache.store("b", "u", 200, {}, pages["b"])
+    time.sleep(0.01)
+    cache.get("a")  # a is now more recently used than b
+    time.sleep(0.01)
+    cache.store("c", "u", 200, {}, pages["c"])
+
+    assert cache.get("b") == (None, False)
+    assert cache.get("a")[0].body == pages["a"]
+    assert cache.get("c")[0].body == pages["c"]
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.fixture
+def cached_client(tmp_path, monkeypatch):
+    pytest.importorskip("requests")
+    from scrapers import http_client
+
+    monkeypatch.setattr(http_client, "_cache", None)
+    monkeypatch.setattr(http_client, "_cache_configured", False)
+    http_client.close_session()
+    cache = http_client.configure_http_cache(path=str(tmp_path / "http.db"), ttl=60)
+    sent = []
+
+    def fake_get(url, headers=None, timeout=None, **kw):
+        import requests
+
+        sent.append(dict(headers or {}))
+        resp = requests.Response()
+        resp.url = url
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            resp.status_code = 304
+            resp._content = b""
+        else:
+            resp.status_code = 200
+            resp._content = b"<html>results</html>"
+            resp.headers["ETag"] = '"v1"'
+        return resp
+
+    monkeypatch.setattr(http_client.get_session(), "get", fake_get)
+    yield http_client, cache, sent
+    http_client.close_session()
+
+
+def test_http_get_serves_fresh_pages_from_disk(cached_client):
+    http_client, cache, sent = cached_client
+
+    first = http_client.http_get("https://www.amazon.in/s?k=cable")
+    assert not getattr(first, "from_cache", False)
+    assert http_client.is_cached("https://www.amazon.in/s?k=cable")
+    second = http_client.http_get("https://www.amazon.in/s?k=cable")
+
+    assert len(sent) == 1
+    assert second.from_cache and second.status_code == 200 and second.text == "<html>results</html>"
+
+
+def test_http_get_revalidates_stale_pages(cached_client):
+    http_client, cache, sent = cached_client
+    http_client.http_get("https://www.amazon.in/s?k=cable")
+    cache.ttl = 0
+
+    resp = http_client.http_get("https://www.amazon.in/s?k=cable")
+
+    assert sent[1]["If-None-Match"] == '"v1"'
+    assert resp.status_code == 200 and resp.text == "<html>results</html>"
+    assert cache.stats()["revalidated"] == 1
+
+    cache.ttl = 60
+    assert http_client.is_cached("https://www.amazon.in/s?k=cable")
+    http_client.forget_cached("https://www.amazon.in/s?k=cable")
+    assert not http_client.is_cached("https://www.amazon.in/s?k=cable")
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,54 @@
+import sys
+import os
+import threading
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+pytest.importorskip("requests")
+
+from scrapers import http_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    monkeypatch.setenv("PRODUCT_AGG_HTTP_POOL_SIZE", "4")
+    http_client.close_session()
+    yield
+    http_client.close_session()
+
+
+def test_session_is_shared_across_threads():
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(http_client.get_session())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len({id(s) for s in seen}) == 1
+    session = seen[0]
+    adapter = session.get_adapter("https://www.amazon.in/")
+    assert adapter._pool_maxsize == 4
+    assert session.headers["Connection"] == "keep-alive"
+    assert "gzip" in session.headers["Accept-Encoding"]
+
+
+def test_http_get_uses_shared_session_and_default_timeout(monkeypatch):
+    calls = []
+    session = http_client.get_session()
+    monkeypatch.setattr(session, "get", lambda url, **kw: calls.append((url, kw)) or "resp")
+
+    assert http_client.http_get("https://example.com/a") == "resp"
+    assert http_client.http_get("https://example.com/b", timeout=3, headers={"X": "1"}) == "resp"
+
+    assert calls[0][1]["timeout"] == http_client.DEFAULT_TIMEOUT
+    assert calls[1][1]["timeout"] == 3
+    assert calls[1][1]["headers"] == {"X": "1"}
+
+    # a spent budget is not turned back into the default
+    http_client.http_get("https://example.com/c", timeout=0.0)
+    assert calls[2][1]["timeout"] == 0.0
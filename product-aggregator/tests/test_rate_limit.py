@@ -0,0 +1,85 @@
+import sys
+import os
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+from scrapers.rate_limit import RateLimiter, configure_rate_limiter, get_rate_limiter, looks_blocked
+from utils.deadline import Deadline, DeadlineExceeded
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_burst_then_sustained_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2.0, burst=2, clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    # bucket empty: next token after 1 / rate seconds
+    assert limiter.acquire() == 0.5
+    assert limiter.acquire() == 0.5
+
+
+def test_min_interval_spacing():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=100.0, burst=10, min_interval=1.0, clock=clock, sleep=clock.sleep)
+
+    waits = [limiter.acquire() for _ in range(3)]
+    assert waits == [0, 1.0, 1.0]
+
+
+def test_penalize_backs_off_and_reward_recovers():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1.0, burst=1, min_interval=1.0, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+
+    limiter.penalize("503")
+    assert limiter.backoff == 2.0
+    # cool-down of base interval * backoff
+    assert limiter.acquire() >= 2.0
+
+    for _ in range(10):
+        limiter.reward()
+    assert limiter.backoff == 1.0
+
+
+def test_acquire_gives_up_past_deadline():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=0.1, burst=1, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(Deadline(0.5))
+    # gave up without sleeping and without holding on to the slot
+    assert clock.sleeps == []
+    assert limiter.acquire(Deadline(20)) == 10.0
+
+
+def test_looks_blocked():
+    assert looks_blocked(503)
+    assert looks_blocked(429)
+    assert not looks_blocked(200, "<html>results</html>")
+    assert looks_blocked(200, "<title>Robot Check</title> Enter the characters you see")
+
+
+def test_limiters_are_shared_per_source():
+    assert get_rate_limiter("Amazon") is get_rate_limiter("Amazon")
+    assert get_rate_limiter("Amazon") is not get_rate_limiter("Flipkart")
+    custom = configure_rate_limiter("TestSite", rate=5, burst=1)
+    assert get_rate_limiter("TestSite") is custom
+    assert custom.rate == 5
@@ -0,0 +1,120 @@
+import sys
+import os
+import threading
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from core.singleflight import SingleFlight
+
+
+def _wait_until(cond, timeout=5.0):
+    import time
+
+    end = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.001)
+
+
+def _run_concurrently(n, target):
+    out = [None] * n
+    errors = [None] * n
+
+    def worker(i):
+        try:
+            out[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, out, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    sf = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return ["result"]
+
+    leader = threading.Thread(target=lambda: sf.do("k", work))
+    leader.start()
+    started.wait(timeout=5)
+
+    threads, out, errors = _run_concurrently(4, lambda: sf.do("k", work))
+    # wait until all followers are parked on the in-flight call
+    _wait_until(lambda: sf.coalesced >= 4)
+    release.set()
+    for t in threads + [leader]:
+        t.join(timeout=5)
+
+    assert len(calls) == 1
+    assert out == [["result"]] * 4
+    assert sf.in_flight() == 0
+
+    # once finished, a new call runs again
+    assert sf.do("k", lambda: "again") == "again"
+
+
+def test_followers_receive_leader_exception():
+    sf = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def boom():
+        started.set()
+        release.wait(timeout=5)
+        raise RuntimeError("blocked")
+
+    leader_errors = []
+    leader = threading.Thread(target=lambda: leader_errors.append(pytest.raises(RuntimeError, sf.do, "k", boom)))
+    leader.start()
+    started.wait(timeout=5)
+
+    threads, out, errors = _run_concurrently(2, lambda: sf.do("k", boom))
+    _wait_until(lambda: sf.coalesced >= 2)
+    release.set()
+    for t in threads + [leader]:
+        t.join(timeout=5)
+
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert leader_errors
+
+
+def test_follower_wait_is_bounded_and_can_refuse_a_result():
+    sf = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(timeout=5)
+        return "timeout"
+
+    leader = threading.Thread(target=lambda: sf.do("k", slow))
+    leader.start()
+    started.wait(timeout=5)
+
+    with pytest.raises(TimeoutError):
+        sf.do("k", slow, follower_timeout=0.05)
+
+    threads, out, errors = _run_concurrently(
+        1, lambda: sf.do("k", lambda: "own", shareable=lambda result: result != "timeout")
+    )
+    _wait_until(lambda: sf.coalesced >= 2)
+    release.set()
+    for t in threads + [leader]:
+        t.join(timeout=5)
+
+    assert out == ["own"] and errors == [None]
@@ -0,0 +1,96 @@
+import sys
+import os
+import queue
+import threading
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from database import db_helper
+from database.snapshot_writer import SnapshotWriter
+
+
+def test_writer_saves_snapshots_in_batches(tmp_path):
+    db_file = str(tmp_path / "writer.db")
+    writer = SnapshotWriter(db_path=db_file, max_queue=100, batch_size=10)
+    for i in range(25):
+        writer.submit(pd.DataFrame([{"title": f"t{i}", "price": i}]), f"q{i}")
+
+    assert writer.flush(timeout=10)
+    stats = writer.stats()
+    assert stats["written"] == 25 and stats["failed"] == 0 and stats["batches"] <= 25
+    assert db_helper.count_snapshots(db_path=db_file) == 25
+    assert db_helper.list_snapshots(limit=1, db_path=db_file)[0]["query"] == "q24"
+    assert writer.close(timeout=5)
+
+
+def test_full_queue_applies_backpressure_and_close_flushes(monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    batches = []
+
+    def slow_save(items, db_path=None):
+        entered.set()
+        release.wait(5)
+        batches.append([q for _, q, _ in items])
+        return list(range(len(items)))
+
+    monkeypatch.setattr(db_helper, "save_snapshots", slow_save)
+    writer = SnapshotWriter(max_queue=2, batch_size=10)
+    df = pd.DataFrame([{"title": "a"}])
+    writer.submit(df, "held")
+    assert entered.wait(5)  # the writer thread is now blocked in slow_save
+    writer.submit(df, "b")
+    writer.submit(df, "c")
+
+    with pytest.raises(queue.Full):
+        writer.submit(df, "d", timeout=0.05)
+
+    release.set()
+    assert writer.close(timeout=5)
+    assert batches == [["held"], ["b", "c"]]
+    assert writer.stats()["written"] == 3
+    with pytest.raises(RuntimeError):
+        writer.submit(df, "late")
+
+
+def test_failed_batches_are_counted_not_raised(monkeypatch):
+    def broken(items, db_path=None):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(db_helper, "save_snapshots", broken)
+    writer = SnapshotWriter()
+    writer.submit(pd.DataFrame([{"title": "a"}]), "q")
+    assert writer.flush(timeout=5)
+    assert writer.stats()["failed"] == 1
+    writer.close()
+
+
+def test_one_bad_snapshot_does_not_lose_its_batch(tmp_path, monkeypatch):
+    from decimal import Decimal
+
+    db_file = str(tmp_path / "retry.db")
+    real = db_helper.save_snapshots
+
+    def picky(items, db_path=None):
+        if any(q == "bad" for _, q, _ in items):
+            raise RuntimeError("unsaveable snapshot")
+        return real(items, db_path=db_path)
+
+    monkeypatch.setattr(db_helper, "save_snapshots", picky)
+    writer = SnapshotWriter(db_path=db_file, batch_size=10)
+    writer.submit(pd.DataFrame([{"title": "first"}]), "first")
+    for q in ("good1", "bad", "good2"):
+        writer.submit(pd.DataFrame([{"title": q, "price": Decimal("9.99"), "mrp": Decimal("12.50")}]), q)
+
+    assert writer.flush(timeout=10)
+    stats = writer.stats()
+    assert stats["written"] == 3 and stats["failed"] == 1
+    saved = {s["query"] for s in db_helper.list_snapshots(db_path=db_file)}
+    assert saved == {"first", "good1", "good2"}
+    good = db_helper.load_snapshots("good1", db_path=db_file)[0]["df"]
+    assert good.iloc[0]["price"] == "9.99" and good.iloc[0]["mrp"] == "12.50"
+    writer.close()
@@ -0,0 +1,246 @@
+import sys
+import os
+import types
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+pytest.importorskip("lxml")
+pytest.importorskip("requests")
+
+from scrapers import static_html
+from scrapers.rate_limit import configure_rate_limiter
+
+CARD = """
+<div class="product-tuple-listing">
+  <a href="/product/{slug}"><p class="product-title">{title}</p></a>
+  <span class="lfloat product-price">Rs. {price}</span>
+  <img src="//img.example/{slug}.jpg">
+</div>
+"""
+
+
+def _page(*cards):
+    return "<html><body>%s</body></html>" % "".join(
+        CARD.format(slug=slug, title=title, price=price) for slug, title, price in cards
+    )
+
+
+def test_extract_cards_html_matches_browser_semantics():
+    fields = [
+        {"name": "title", "xpaths": [".//p"], "attr": None},
+        {"name": "link", "xpaths": [".//a"], "attr": "href"},
+        {"name": "price", "xpaths": [".//span"], "attr": None},
+    ]
+    html = _page(("a", "Lamp", "499"), ("b", "Lamp", "599"), ("c", "", "10"), ("d", "Desk", "1,299"))
+
+    rows = static_html.extract_cards_html(
+        html, "//div", fields, "https://www.snapdeal.com/", limit=5, required=["title"], unique="title"
+    )
+
+    assert [r["title"] for r in rows] == ["Lamp", "Desk"]
+    assert rows[0]["link"] == "https://www.snapdeal.com/product/a"
+    assert rows[1]["price"] == "Rs. 1,299"
+    assert len(static_html.extract_cards_html(html, "//div", fields, limit=1)) == 1
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+@pytest.fixture
+def snapdeal(monkeypatch):
+    """Import the Snapdeal scraper with selenium faked and no real HTTP/Chrome."""
+    faked = False
+    try:
+        import undetected_chromedriver  # noqa: F401
+        import selenium.webdriver  # noqa: F401
+    except ImportError:
+        faked = True
+        for name in (
+            "undetected_chromedriver", "selenium", "selenium.common", "selenium.webdriver",
+            "selenium.webdriver.common", "selenium.webdriver.common.by", "selenium.webdriver.common.keys",
+            "selenium.webdriver.support", "selenium.webdriver.support.ui",
+            "selenium.webdriver.support.expected_conditions",
+        ):
+            monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+        exc_mod = types.ModuleType("selenium.common.exceptions")
+        exc_mod.SessionNotCreatedException = type("SessionNotCreatedException", (Exception,), {})
+        monkeypatch.setitem(sys.modules, "selenium.common.exceptions", exc_mod)
+        sys.modules["selenium.webdriver.common.by"].By = types.SimpleNamespace(XPATH="xpath")
+        sys.modules["selenium.webdriver.common.keys"].Keys = types.SimpleNamespace(RETURN="\n")
+        sys.modules["selenium.webdriver.support.ui"].WebDriverWait = object
+        for mod in ("scrapers.base_scraper", "scrapers.snapdeal_scraper"):
+            monkeypatch.delitem(sys.modules, mod, raising=False)
+    import scrapers.snapdeal_scraper as mod
+
+    configure_rate_limiter("Snapdeal", rate=1000, burst=100, min_interval=0, jitter=0)
+    checkouts = []
+
+    class FakePool:
+        def checkout(self, timeout=None):
+            checkouts.append(timeout)
+            raise RuntimeError("no Chrome in tests")
+
+    monkeypatch.setattr(mod, "get_driver_pool", lambda headless=True: FakePool())
+    yield mod, checkouts
+    if faked:
+        # don't leak modules bound to the fake packages into other tests
+        for name in ("scrapers.base_scraper", "scrapers.snapdeal_scraper"):
+            sys.modules.pop(name, None)
+
+
+def test_http_path_serves_results_without_chrome(snapdeal, monkeypatch):
+    mod, checkouts = snapdeal
+    html = _page(("a", "Lamp", "499"), ("b", "Desk", "1,299"))
+    monkeypatch.setattr("scrapers.http_client.http_get", lambda url, timeout=None: FakeResponse(html))
+
+    results = mod.scrape_snapdeal("lamp", max_results=2, http_first=True)
+
+    assert checkouts == []
+    assert [(r["title"], r["price"], r["fetched_via"]) for r in results] == [
+        ("Lamp", 499.0, "http"),
+        ("Desk", 1299.0, "http"),
+    ]
+    assert results[0]["link"] == "https://www.snapdeal.com/product/a"
+
+
+
+def test_short_http_page_falls_back_to_chrome(snapdeal, monkeypatch):
+    mod, checkouts = snapdeal
+    html = _page(("a", "Lamp", "499"), ("b", "Desk", "1,299"))
+    monkeypatch.setattr("scrapers.http_client.http_get", lambda url, timeout=None: FakeResponse(html))
+
+    # 2 of 4 requested products: don't silently return half the rows
+    with pytest.raises(RuntimeError, match="no Chrome"):
+        mod.scrape_snapdeal("lamp", max_results=4, http_first=True)
+    assert len(checkouts) == 1
+
+
+def test_bot_wall_falls_back_to_chrome(snapdeal, monkeypatch):
+    mod, checkouts = snapdeal
+    monkeypatch.setattr(
+        "scrapers.http_client.http_get",
+        lambda url, timeout=None: FakeResponse("<html>Please complete the captcha</html>"),
+    )
+
+    with pytest.raises(RuntimeError, match="no Chrome"):
+        mod.scrape_snapdeal("lamp", max_results=2, http_first=True)
+    assert len(checkouts) == 1
+
+
+@pytest.mark.parametrize("body", ["  \n", "<!-- c -->"])
+def test_blank_http_body_falls_back_to_chrome(snapdeal, monkeypatch, body):
+    mod, checkouts = snapdeal
+    monkeypatch.setattr("scrapers.http_client.http_get", lambda url, timeout=None: FakeResponse(body))
+
+    assert static_html.extract_cards_html(body, "//div", []) == []
+    with pytest.raises(RuntimeError, match="no Chrome"):
+        mod.scrape_snapdeal("lamp", max_results=2, http_first=True)
+    assert len(checkouts) == 1
+
+
+def test_parse_snapdeal_is_pure_and_unbounded_by_default(snapdeal):
+    mod, checkouts = snapdeal
+    html = _page(("a", "Lamp", "499"), ("b", "Desk", "1,299"), ("c", "Chair", "n/a"))
+
+    assert [r["title"] for r in mod.parse_snapdeal(html)] == ["Lamp", "Desk"]
+    assert [r["title"] for r in mod.parse_snapdeal(html, max_results=1)] == ["Lamp"]
+    assert checkouts == []
+
+
+class CaptchaDriver:
+    """Fake Chrome that always shows a bot-check page."""
+
+    title = "Captcha"
+
+    def __init__(self):
+        self.scripts = 0
+        self.page_load_timeouts = []
+
+    def get(self, url):
+        pass
+
+    def set_page_load_timeout(self, seconds):
+        self.page_load_timeouts.append(seconds)
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        return "Please complete the captcha"
+
+
+def test_selenium_bot_wall_is_penalized_once(snapdeal, monkeypatch):
+    mod, checkouts = snapdeal
+    driver = CaptchaDriver()
+    checked_in = []
+
+    class Pool:
+        def checkout(self, timeout=None):
+            return driver
+
+        def checkin(self, d, broken=False):
+            checked_in.append(d)
+
+    def no_cards(*args, **kwargs):
+        raise TimeoutError("no product cards")
+
+    monkeypatch.setattr(mod, "get_driver_pool", lambda headless=True: Pool())
+    monkeypatch.setattr(mod, "WebDriverWait", no_cards)
+    limiter = configure_rate_limiter("Snapdeal", rate=1000, burst=100, min_interval=0, jitter=0)
+
+    assert mod.scrape_snapdeal("lamp", max_results=2, http_first=False) == []
+    assert limiter.penalties == 1
+    # only page_looks_blocked's check ran: no scrolling or extraction
+    assert driver.scripts == 1
+    assert checked_in == [driver]
+
+
+def test_selenium_waits_use_the_budget_left_after_http(snapdeal, monkeypatch):
+    import time
+    from utils.deadline import Deadline
+
+    mod, checkouts = snapdeal
+    driver = CaptchaDriver()
+    waits = []
+
+    class Pool:
+        def checkout(self, timeout=None):
+            return driver
+
+        def checkin(self, d, broken=False):
+            pass
+
+    def slow_http(url, timeout=None):
+        time.sleep(0.2)
+        return FakeResponse(_page(("a", "Lamp", "499")))
+
+    def no_cards(d, timeout):
+        waits.append(timeout)
+        raise TimeoutError("no product cards")
+
+    monkeypatch.setattr("scrapers.http_client.http_get", slow_http)
+    monkeypatch.setattr(mod, "get_driver_pool", lambda headless=True: Pool())
+    monkeypatch.setattr(mod, "WebDriverWait", no_cards)
+
+    mod.scrape_snapdeal("lamp", max_results=2, http_first=True, timeout=10, deadline=Deadline(0.5))
+
+    # the HTTP attempt spent ~0.2 s of the 0.5 s budget before Chrome started
+    assert len(driver.page_load_timeouts) == 1 and driver.page_load_timeouts[0] <= 0.3
+    assert len(waits) == 1 and waits[0] <= 0.3
+
+
+def test_fetch_html_does_not_request_past_the_deadline(monkeypatch):
+    from utils.deadline import Deadline, DeadlineExceeded
+
+    requests_made = []
+    monkeypatch.setattr("scrapers.http_client.http_get", lambda url, timeout=None: requests_made.append(timeout))
+    configure_rate_limiter("Snapdeal", rate=1000, burst=100, min_interval=0, jitter=0)
+
+    with pytest.raises(DeadlineExceeded):
+        static_html.fetch_html("Snapdeal", "https://www.snapdeal.com/search?keyword=x", deadline=Deadline(0))
+    assert requests_made == []
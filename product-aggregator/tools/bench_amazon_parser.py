@@ -0,0 +1,89 @@
+"""Benchmark the Amazon parser backends against the original html.parser path.
+
+Run with: python tools/bench_amazon_parser.py [--file saved_page.html] [--repeat 5]
+
+Without --file a synthetic search page is generated (48 results plus the
+navigation, scripts and filler that make real pages ~1 MB). Every backend's
+output is checked against html.parser before its time is reported.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scrapers.amazon_scraper import PARSER_BACKENDS, parse_amazon
+
+RESULT = """
+<div data-asin="B{i:05d}" data-component-type="s-search-result" class="sg-col-4-of-24 s-result-item s-asin sg-col-4-of-12">
+  <div class="sg-col-inner"><div class="s-widget-container s-spacing-small">
+    <span class="rush-component"><a class="a-link-normal s-no-outline" href="/Item-{i}/dp/B{i:05d}/ref=sr_1_{i}">
+      <div class="a-section aok-relative s-image-square-aspect">
+        <img class="s-image" src="https://m.media-amazon.com/images/I/{i}.jpg" alt="Item {i}">
+      </div></a></span>
+    <div class="a-section a-spacing-none"><h2 class="a-size-mini a-spacing-none">
+      <a class="a-link-normal s-underline-text" href="/Item-{i}/dp/B{i:05d}">
+        <span class="a-size-base-plus a-color-base a-text-normal">Item {i} &amp; accessories, {i} GB</span></a></h2></div>
+    <div class="a-row a-size-small"><span aria-label="4.{r} out of 5 stars">
+      <span class="a-icon-alt">4.{r} out of 5 stars</span></span></div>
+    {price}
+    <div class="a-row">{filler}</div>
+  </div></div>
+</div>
+"""
+
+PRICE = '<span class="a-price"><span class="a-offscreen">&#8377;{p:,}</span><span class="a-price-whole">{p:,}</span></span>'
+
+
+def synthetic_page(results: int = 48) -> str:
+    filler = "".join('<span class="a-size-small a-color-secondary">Delivery by tomorrow %d</span>' % k for k in range(20))
+    items = []
+    for i in range(results):
+        price = "" if i % 7 == 0 else PRICE.format(p=499 + 37 * i)
+        items.append(RESULT.format(i=i, r=i % 10, price=price, filler=filler))
+    nav = "".join('<li><a href="/nav/%d">Category %d</a></li>' % (k, k) for k in range(2000))
+    script = "<script>var state = %s;</script>" % ("{\"k\": [%s]}" % ",".join(str(k) for k in range(40000)))
+    return (
+        "<html><head><title>Amazon.in : phone</title>%s</head><body><ul id='nav'>%s</ul>"
+        "<div class='s-main-slot s-result-list'>%s</div></body></html>" % (script, nav, "".join(items))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--file", help="Saved Amazon search page to parse", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_page()
+    print(f"Page size: {len(html) / 1024:.0f} KiB")
+
+    expected = parse_amazon(html, backend="html.parser")
+    baseline = None
+    for name in PARSER_BACKENDS:
+        try:
+            rows = PARSER_BACKENDS[name](html)
+            next(rows, None)
+        except ImportError:
+            print(f"{name:12s}  not installed")
+            continue
+        if parse_amazon(html, backend=name) != expected:
+            print(f"{name:12s}  OUTPUT DIFFERS from html.parser")
+            continue
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            parse_amazon(html, backend=name)
+        per_page = (time.perf_counter() - start) / args.repeat
+        baseline = baseline or per_page
+        print(f"{name:12s}  {per_page * 1000:8.1f} ms/page  x{baseline / per_page:5.1f}  ({len(expected)} products)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 """Utility to list and preview saved snapshots from the SQLite DB used by db_helper.
 
-Run with: python tools/inspect_snapshots.py [--query QUERY]
+Run with: python tools/inspect_snapshots.py [--query QUERY] [--source SITE] [--limit N]
 """
 import argparse
 import os
@@ -16,15 +16,17 @@ from database import db_helper
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--query", help="Filter snapshots by query", default=None)
+    parser.add_argument("--source", help="Only snapshots with results from this site", default=None)
+    parser.add_argument("--limit", type=int, default=20, help="Newest N snapshots to show")
     args = parser.parse_args()
 
-    snaps = db_helper.load_snapshots(query=args.query)
+    snaps = db_helper.list_snapshots(query=args.query, source=args.source, limit=args.limit)
     if not snaps:
         print("No snapshots found.")
         return
     for s in snaps:
-        print(f"ID: {s['id']}  Query: {s['query']}  Created: {s['created_at']}")
-        df = s.get("df")
+        print(f"ID: {s['id']}  Query: {s['query']}  Created: {s['created_at']}  Rows: {s['row_count']}")
+        df = db_helper.load_snapshot(s["id"])["df"]
         if df is None or df.empty:
             print("  (empty snapshot)")
         else:
@@ -14,11 +14,11 @@ if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
 
-def try_import_aggregator():
+def try_import_aggregator(name: str = "fetch_combined"):
     try:
-        from core.aggregator import fetch_combined
+        from core import aggregator
 
-        return fetch_combined
+        return getattr(aggregator, name)
     except Exception as e:
         # Return a stub that raises a clear error when called
         def _stub(*args, **kwargs):
@@ -30,6 +30,9 @@ def try_import_aggregator():
 
 
 fetch_combined = try_import_aggregator()
+iter_combined = try_import_aggregator("iter_combined")
+combine_batches = try_import_aggregator("combine_batches")
+persist_snapshot = try_import_aggregator("persist_snapshot")
 
 
 st.set_page_config(page_title="Product Aggregator", layout="wide")
@@ -62,6 +65,9 @@ def main():
         )
         max_per_site = st.slider("Max results per site", 1, 50, 10)
         headless = st.checkbox("Headless (Selenium)", value=True)
+        parallel = st.checkbox("Search sites in parallel", value=True)
+        refresh = st.checkbox("Ignore cached results", value=False)
+        time_budget = st.slider("Time budget (seconds, 0 = no limit)", 0, 120, 30)
         save_snapshot = st.checkbox("Save snapshot to DB", value=False)
         submit = st.form_submit_button("Search")
 
@@ -92,15 +98,25 @@ def main():
 
     # Snapshot management (M3)
     with st.sidebar.expander("Saved snapshots", expanded=False):
+        snap_page_size = 25
         try:
-            from database.db_helper import load_snapshots, delete_snapshot
+            from database.db_helper import count_snapshots, list_snapshots, load_snapshot, delete_snapshot
 
+            # metadata only; the DataFrame is built for the selected snapshot below
             q_filter = query.strip() if isinstance(query, str) and query.strip() else None
-            _snapshots = load_snapshots(query=q_filter)
+            snap_total = count_snapshots(query=q_filter)
+            snap_pages = max(1, -(-snap_total // snap_page_size))
+            snap_page = 1
+            if snap_pages > 1:
+                snap_page = int(st.number_input(f"Page (of {snap_pages})", min_value=1, max_value=snap_pages,
+                                                value=1, step=1, key="snap_page"))
+            _snapshots = list_snapshots(query=q_filter, limit=snap_page_size, offset=(snap_page - 1) * snap_page_size)
         except Exception:
             _snapshots = []
 
-        snap_options = ["-- none --"] + [f"{s['id']} | {s['query']} | {s['created_at']}" for s in _snapshots]
+        snap_options = ["-- none --"] + [
+            f"{s['id']} | {s['query']} | {s['created_at']} | {s['row_count']} rows" for s in _snapshots
+        ]
         sel = st.selectbox("Select a snapshot", snap_options, key="snap_select")
 
         if sel and sel != "-- none --":
@@ -111,10 +127,10 @@ def main():
 
             snap = None
             if sid is not None:
-                for s in _snapshots:
-                    if s.get("id") == sid:
-                        snap = s
-                        break
+                try:
+                    snap = load_snapshot(sid)
+                except Exception:
+                    snap = None
 
             if snap is not None:
                 st.write(f"**Snapshot {snap['id']}** — Query: {snap['query']}")
@@ -175,12 +191,37 @@ def main():
 
     if submitted and isinstance(query, str) and query.strip():
         q = query.strip()
+        # Stream per-site batches so fast sources (Amazon) show up while the
+        # Selenium sites are still loading.
+        status_box = st.empty()
+        partial_box = st.empty()
+        batches = []
         with st.spinner(f"Searching for '{q}' across sites..."):
             try:
-                df = fetch_combined(q, max_per_site, sources=sites, headless=headless, save_snapshot_to_db=save_snapshot)
+                for batch in iter_combined(
+                    q, max_per_site, sources=sites, headless=headless, concurrent=parallel, refresh=refresh,
+                    deadline=time_budget or None,
+                ):
+                    batches.append(batch)
+                    status_box.write(
+                        f"{batch['source']}: {len(batch['results'])} results, {batch.get('status', 'ok')} "
+                        f"({len(batches)}/{len(sites)} sites done)"
+                    )
+                    partial = combine_batches(batches)
+                    if not partial.empty:
+                        partial_box.dataframe(partial[[c for c in ("source", "title", "price", "link") if c in partial.columns]])
+                df = combine_batches(batches)
             except Exception as e:
                 st.error(f"Search failed: {e}")
                 df = pd.DataFrame()
+        status_box.empty()
+        partial_box.empty()
+        incomplete = {b["source"]: b.get("status") for b in batches if b.get("status") not in ("ok", "cached")}
+        if incomplete:
+            st.caption("Incomplete sources: " + ", ".join(f"{k} ({v})" for k, v in incomplete.items()))
+
+        if save_snapshot and df is not None and not df.empty:
+            persist_snapshot(df, q)
 
         if df is None or (hasattr(df, "__len__") and len(df) == 0):
             st.info("No results found.")
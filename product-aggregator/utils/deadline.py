@@ -0,0 +1,45 @@
+"""Deadline / cancellation token shared by the aggregator and scrapers.
+
+The aggregator creates one `Deadline` per search and passes it down; the
+scrapers clamp their waits to `remaining()` and check `expired()` between
+steps, so a search can return whatever it has when its budget runs out.
+"""
+import threading
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised by a scraper that ran out of time before producing anything."""
+
+
+class Deadline:
+    def __init__(self, seconds: Optional[float] = None):
+        self._end = None if seconds is None else time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None when there is no limit."""
+        if self._cancelled.is_set():
+            return 0.0
+        if self._end is None:
+            return None
+        return max(0.0, self._end - time.monotonic())
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def cancel(self) -> None:
+        """Ask everything using this deadline to stop as soon as possible."""
+        self._cancelled.set()
+
+    def clamp(self, timeout: float) -> float:
+        """`timeout` limited to the time left."""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def check(self) -> None:
+        """Raise DeadlineExceeded if the deadline has passed or was cancelled."""
+        if self.expired():
+            raise DeadlineExceeded("search deadline exceeded")